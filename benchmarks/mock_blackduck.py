@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+'''
+Local stand-in for the Black Duck REST API, for benchmarking and end-to-end testing
+blackduck_triage_extract without touching a real Black Duck server.
+
+Implements the endpoints the tool calls: tokens/authenticate, projects, project-groups
+and their children, project versions, snippet-counts, policy-rules and
+vulnerable-bom-components, including limit/offset paging and the name, versionName,
+phase and distribution filters. The instance is synthetic and generated on demand from
+a seed, so every run against the same parameters sees the same data.
+
+Usage:
+    python benchmarks/mock_blackduck.py --projects 500 --versions 5 --components 200 --latency 0.02
+    bd-metrics --url http://127.0.0.1:8900 --token mock --json
+'''
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+PHASES = ["PLANNING", "DEVELOPMENT", "RELEASED", "DEPRECATED", "ARCHIVED", "PRERELEASE"]
+DISTRIBUTIONS = ["EXTERNAL", "SAAS", "INTERNAL", "OPENSOURCE"]
+REMEDIATION_STATUSES = ["NEW", "IGNORED", "DUPLICATE", "MITIGATED", "NEEDS_REVIEW", "PATCHED", "REMEDIATION_COMPLETE",
+                        "REMEDIATION_REQUIRED", "NOT_AFFECTED", "AFFECTED", "UNDER_INVESTIGATION"]
+SEVERITIES = ["CRITICAL", "HIGH", "MEDIUM", "LOW"]
+POLICIES = [("Banned license", "LICENSE", "BLOCKER"), ("Reciprocal license", "LICENSE", "MAJOR"),
+            ("Critical vulnerabilities", "SECURITY", "CRITICAL"), ("Old component", "COMPONENT", "MINOR"),
+            ("Unapproved component", "OPERATIONAL", "TRIVIAL"), ("Unreviewed snippet", "UNCATEGORIZED", "UNSPECIFIED")]
+# Projects per project group child level when serving project-groups
+GROUP_FANOUT = 50
+DEFAULT_PAGE_LIMIT = 10
+
+
+class MockInstance:
+    """Synthetic Black Duck instance, every object is derived from the seed and its own IDs"""
+
+    def __init__(self, projects=100, versions=3, components=50, seed=1):
+        self.projectCount = projects
+        self.versionsPerProject = versions
+        self.componentsPerVersion = components
+        self.seed = seed
+        # updatedAt of touched projects by project index
+        self.updatedAt = {}
+
+    def touch(self, projectIndex, updatedAt):
+        """Mark the project as updated at the given time"""
+        self.updatedAt[projectIndex] = updatedAt
+
+    def _random(self, *ids):
+        return random.Random("-".join(str(i) for i in (self.seed,) + ids))
+
+    def project(self, baseurl, projectIndex):
+        href = f"{baseurl}/api/projects/p{projectIndex}"
+        return {"name": f"project-{projectIndex:05d}", "updatedAt": self.updatedAt.get(projectIndex, "2026-01-01T00:00:00.000Z"),
+                "_meta": {"href": href, "links": [{"rel": "versions", "href": href + "/versions"}]}}
+
+    def projects(self, baseurl):
+        return [self.project(baseurl, projectIndex) for projectIndex in range(self.projectCount)]
+
+    def version(self, baseurl, projectIndex, versionIndex):
+        rnd = self._random(projectIndex, versionIndex)
+        href = f"{baseurl}/api/projects/p{projectIndex}/versions/p{projectIndex}v{versionIndex}"
+        return {"versionName": f"{versionIndex}.0", "phase": rnd.choice(PHASES), "distribution": rnd.choice(DISTRIBUTIONS),
+                "lastScanDate": f"2026-01-{1 + versionIndex % 28:02d}T10:00:00.000Z",
+                "settingUpdatedAt": "2026-01-01T10:00:00.000Z", "_meta": {"href": href}}
+
+    def versions(self, baseurl, projectIndex):
+        return [self.version(baseurl, projectIndex, versionIndex) for versionIndex in range(self.versionsPerProject)]
+
+    def snippetCounts(self, projectIndex, versionIndex):
+        rnd = self._random(projectIndex, versionIndex, "snippets")
+        if rnd.random() < 0.3:
+            return {"snippetScanPresent": False}
+        unreviewed, reviewed, ignored = rnd.randint(0, 20), rnd.randint(0, 20), rnd.randint(0, 5)
+        return {"snippetScanPresent": True, "unreviewedCount": unreviewed, "reviewedCount": reviewed,
+                "ignoredCount": ignored, "totalCount": unreviewed + reviewed + ignored}
+
+    def policyRules(self, projectIndex, versionIndex):
+        rnd = self._random(projectIndex, versionIndex, "policies")
+        return [{"name": name, "category": category, "severity": severity, "bomViolationCount": rnd.randint(1, 10)}
+                for name, category, severity in POLICIES if rnd.random() < 0.4]
+
+    def componentCount(self, projectIndex, versionIndex):
+        return self._random(projectIndex, versionIndex, "components").randint(0, 2 * self.componentsPerVersion)
+
+    def vulnerableComponents(self, projectIndex, versionIndex, offset, limit):
+        count = self.componentCount(projectIndex, versionIndex)
+        rnd = self._random(projectIndex, versionIndex, "components", offset)
+        return count, [{"componentName": f"component-{index}",
+                        "vulnerabilityWithRemediation": {"vulnerabilityName": f"CVE-2026-{index:05d}",
+                                                         "remediationStatus": rnd.choice(REMEDIATION_STATUSES),
+                                                         "severity": rnd.choice(SEVERITIES)}}
+                       for index in range(offset, min(count, offset + limit))]
+
+    def totalVulnerableComponents(self):
+        """Expected instance level Total when all versions are selected"""
+        return sum(self.componentCount(projectIndex, versionIndex)
+                   for projectIndex in range(self.projectCount) for versionIndex in range(self.versionsPerProject))
+
+
+class MockBlackDuckServer:
+    """Serves a MockInstance over HTTP from a background thread.
+
+    latency is added to every request (plus up to jitter seconds), errorRate is the share of
+    GET requests answered with HTTP 503 and tokenTTL the bearer token lifetime in seconds.
+    """
+
+    def __init__(self, instance, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, errorRate=0.0, tokenTTL=7200, seed=1):
+        self.instance = instance
+        self.latency = latency
+        self.jitter = jitter
+        self.errorRate = errorRate
+        self.tokenTTL = tokenTTL
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requestCount = 0
+        self.errorCount = 0
+        self.tokens = {}
+        self.httpd = ThreadingHTTPServer((host, port), self._handlerClass())
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="mock-blackduck", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handlerClass(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, Nagle would delay every keep-alive response
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                server._handle(self, "POST")
+
+            def do_GET(self):
+                server._handle(self, "GET")
+
+        return Handler
+
+    def _send(self, handler, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def _handle(self, handler, method):
+        with self.lock:
+            self.requestCount += 1
+            fail = method == "GET" and self.errorRate and self.random.random() < self.errorRate
+            if fail:
+                self.errorCount += 1
+        if self.latency or self.jitter:
+            time.sleep(self.latency + self.jitter * self.random.random())
+        url = urlsplit(handler.path)
+        path = [part for part in url.path.split("/") if part]
+        query = parse_qs(url.query)
+        if method == "POST" and path == ["api", "tokens", "authenticate"]:
+            token = f"mock-{self.requestCount}"
+            with self.lock:
+                self.tokens[token] = time.monotonic() + self.tokenTTL
+            return self._send(handler, 200, {"bearerToken": token, "expiresInMilliseconds": self.tokenTTL * 1000},
+                              {"X-CSRF-TOKEN": "mock-csrf"})
+        authorization = handler.headers.get("Authorization", "")
+        expiresAt = self.tokens.get(authorization[len("Bearer "):])
+        if expiresAt is None or expiresAt < time.monotonic():
+            return self._send(handler, 401, {"errorMessage": "Unauthorized"})
+        if fail:
+            return self._send(handler, 503, {"errorMessage": "Injected error"})
+        status, body = self._route(path, query)
+        self._send(handler, status, body)
+
+    def _route(self, path, query):
+        baseurl = self.url
+        if path[:2] == ["api", "projects"]:
+            if len(path) == 2:
+                return 200, self._page(self._sort(self._match(self.instance.projects(baseurl), query, "name"), query), query)
+            projectIndex = self._index(path[2], "p")
+            if projectIndex is None or projectIndex >= self.instance.projectCount:
+                return 404, {"errorMessage": "Project not found"}
+            if len(path) == 3:
+                return 200, self.instance.project(baseurl, projectIndex)
+            if path[3] == "versions":
+                if len(path) == 4:
+                    versions = self._filterVersions(self._match(self.instance.versions(baseurl, projectIndex), query, "versionName"), query)
+                    return 200, self._page(versions, query)
+                versionIndex = self._index(path[4], f"p{projectIndex}v")
+                if versionIndex is None or versionIndex >= self.instance.versionsPerProject:
+                    return 404, {"errorMessage": "Version not found"}
+                if len(path) == 6 and path[5] == "snippet-counts":
+                    return 200, self.instance.snippetCounts(projectIndex, versionIndex)
+                if len(path) == 6 and path[5] == "policy-rules":
+                    items = self.instance.policyRules(projectIndex, versionIndex)
+                    return 200, {"totalCount": len(items), "items": items}
+                if len(path) == 6 and path[5] == "vulnerable-bom-components":
+                    offset, limit = self._paging(query)
+                    count, items = self.instance.vulnerableComponents(projectIndex, versionIndex, offset, limit)
+                    return 200, {"totalCount": count, "items": items}
+        if path[:2] == ["api", "project-groups"]:
+            return self._projectGroups(baseurl, path, query)
+        return 404, {"errorMessage": "Not found"}
+
+    def _projectGroups(self, baseurl, path, query):
+        """One group "benchmark" holding every project, GROUP_FANOUT projects per nested sub group group-N"""
+        groupCount = (self.instance.projectCount + GROUP_FANOUT - 1) // GROUP_FANOUT
+        subGroups = [{"name": f"group-{index}", "isProject": False, "_meta": {"href": f"{baseurl}/api/project-groups/g{index}"}}
+                     for index in range(groupCount)]
+        if len(path) == 2:
+            group = {"name": "benchmark", "_meta": {"href": f"{baseurl}/api/project-groups/root"}}
+            return 200, self._page(self._match([group] + subGroups, query, "name"), query)
+        if len(path) == 4 and path[3] == "children":
+            if path[2] == "root":
+                return 200, self._page(subGroups, query)
+            groupIndex = self._index(path[2], "g")
+            if groupIndex is not None and groupIndex < groupCount:
+                children = [dict(self.instance.project(baseurl, projectIndex), isProject=True)
+                            for projectIndex in range(groupIndex * GROUP_FANOUT, min(self.instance.projectCount, (groupIndex + 1) * GROUP_FANOUT))]
+                return 200, self._page(children, query)
+        return 404, {"errorMessage": "Project group not found"}
+
+    @staticmethod
+    def _index(identifier, prefix):
+        if identifier.startswith(prefix) and identifier[len(prefix):].isdigit():
+            return int(identifier[len(prefix):])
+
+    @staticmethod
+    def _paging(query):
+        return int(query.get("offset", ["0"])[0]), int(query.get("limit", [str(DEFAULT_PAGE_LIMIT)])[0])
+
+    def _page(self, items, query):
+        offset, limit = self._paging(query)
+        return {"totalCount": len(items), "items": items[offset:offset + limit]}
+
+    @staticmethod
+    def _sort(items, query):
+        """Apply sort=field ASC|DESC, stable like the listing order"""
+        for sort in query.get("sort", []):
+            field, _, direction = sort.partition(" ")
+            items = sorted(items, key=lambda item: item.get(field, ""), reverse=direction.strip().upper() == "DESC")
+        return items
+
+    @staticmethod
+    def _match(items, query, field):
+        """Apply q=field:value as a case insensitive substring match, like Black Duck does"""
+        for q in query.get("q", []):
+            name, _, value = q.partition(":")
+            if name == field:
+                items = [item for item in items if value.lower() in item.get(field, "").lower()]
+        return items
+
+    @staticmethod
+    def _filterVersions(versions, query):
+        """Apply filter=phase:X,phase:Y and filter=distribution:Z, repeated or comma separated.
+
+        Values of the same field are OR-ed, different fields are AND-ed.
+        """
+        allowed = {}
+        for value in query.get("filter", []):
+            for condition in value.split(","):
+                field, _, fieldValue = condition.partition(":")
+                allowed.setdefault(field.strip(), set()).add(fieldValue.strip().upper())
+        return [version for version in versions
+                if all(version.get(field, "").upper() in values for field, values in allowed.items())]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock Black Duck server with a synthetic instance")
+    parser.add_argument('--host', default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8900, help="port to listen on (default: 8900)")
+    parser.add_argument('--projects', type=int, default=100, help="number of projects (default: 100)")
+    parser.add_argument('--versions', type=int, default=3, help="versions per project (default: 3)")
+    parser.add_argument('--components', type=int, default=50, help="mean vulnerable components per version (default: 50)")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every request (default: 0)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="up to this many extra seconds added at random (default: 0)")
+    parser.add_argument('--error-rate', dest='error_rate', type=float, default=0.0, help="share of GET requests answered with HTTP 503 (default: 0)")
+    parser.add_argument('--token-ttl', dest='token_ttl', type=int, default=7200, help="bearer token lifetime in seconds (default: 7200)")
+    parser.add_argument('--seed', type=int, default=1, help="seed of the synthetic instance (default: 1)")
+    args = parser.parse_args()
+    instance = MockInstance(args.projects, args.versions, args.components, args.seed)
+    server = MockBlackDuckServer(instance, args.host, args.port, args.latency, args.jitter, args.error_rate, args.token_ttl, args.seed)
+    print(f"Mock Black Duck with {args.projects} projects x {args.versions} versions listening on {server.url}, any --token works")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
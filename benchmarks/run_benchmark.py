@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+'''
+End-to-end throughput benchmark for blackduck_triage_extract.
+
+Starts the local mock Black Duck server (mock_blackduck.py) and runs main() against it
+in a child process per scenario, so that every scenario gets its own peak RSS:
+
+cold     - --cache with an emptied cache, every project is collected
+warm     - --cache again, nothing has changed so everything comes from the cache
+filtered - --cache with phase and distribution filters, served from the cache
+
+Reports wall time, requests, requests/sec, peak RSS and time per project.
+Extra arguments after -- are passed to every run, e.g. -- --workers 8
+
+Usage:
+    python benchmarks/run_benchmark.py --projects 1000 --versions 5 --latency 0.02 -- --workers 8
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from timeit import default_timer as timer
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak RSS is then not reported
+    resource = None
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from mock_blackduck import MockInstance, MockBlackDuckServer
+
+SCENARIOS = [
+    ("cold", ["--cache", "--cache_truncate"]),
+    ("warm", ["--cache"]),
+    ("filtered", ["--cache", "--phaseCategories", "DEVELOPMENT,RELEASED", "--distributionCategories", "EXTERNAL"]),
+]
+
+
+def peakRSS():
+    """Peak resident set size of this process in MB, None when unknown"""
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+
+def runChild(statsFile, toolArgs):
+    """Run main() with the given arguments and write wall time and peak RSS to statsFile"""
+    from blackduck_remediation_metrics.blackduck_triage_extract import main
+    sys.argv = ["bd-metrics"] + toolArgs
+    start = timer()
+    error = None
+    try:
+        main()
+    except BaseException as e:
+        error = str(e)
+    with open(statsFile, "w") as f:
+        json.dump({"wallTime": timer() - start, "peakRSS": peakRSS(), "error": error}, f)
+
+
+def runScenario(server, name, toolArgs, projectCount):
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as statsFile:
+        statsPath = statsFile.name
+    requestsBefore = server.requestCount
+    completed = subprocess.run([sys.executable, __file__, "--child", statsPath, "--"] + toolArgs,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    with open(statsPath) as f:
+        stats = json.load(f)
+    os.remove(statsPath)
+    if completed.returncode != 0 and not stats["error"]:
+        stats["error"] = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"exit code {completed.returncode}"
+    stats["scenario"] = name
+    stats["requests"] = server.requestCount - requestsBefore
+    stats["requestsPerSecond"] = stats["requests"] / stats["wallTime"] if stats["wallTime"] else 0
+    stats["timePerProject"] = stats["wallTime"] / projectCount if projectCount else 0
+    return stats
+
+
+def printResults(results):
+    print(f"{'scenario':<10} {'wall s':>9} {'requests':>9} {'req/s':>9} {'peak RSS MB':>12} {'ms/project':>11}  error")
+    for stats in results:
+        peak = f"{stats['peakRSS']:.1f}" if stats["peakRSS"] is not None else "n/a"
+        print(f"{stats['scenario']:<10} {stats['wallTime']:>9.2f} {stats['requests']:>9} {stats['requestsPerSecond']:>9.1f} "
+              f"{peak:>12} {stats['timePerProject'] * 1000:>11.2f}  {stats['error'] or ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark blackduck_triage_extract against a local mock Black Duck server")
+    parser.add_argument('--projects', type=int, default=200, help="number of projects (default: 200)")
+    parser.add_argument('--versions', type=int, default=3, help="versions per project (default: 3)")
+    parser.add_argument('--components', type=int, default=50, help="mean vulnerable components per version (default: 50)")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every request (default: 0)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="up to this many extra seconds added at random (default: 0)")
+    parser.add_argument('--error-rate', dest='error_rate', type=float, default=0.0, help="share of GET requests answered with HTTP 503 (default: 0)")
+    parser.add_argument('--seed', type=int, default=1, help="seed of the synthetic instance (default: 1)")
+    parser.add_argument('--scenarios', default=",".join(name for name, _ in SCENARIOS), help="comma separated scenarios to run (default: all)")
+    parser.add_argument('--output', help="also write the results as JSON to this file")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('toolArgs', nargs=argparse.REMAINDER, help="arguments after -- are passed to every run")
+    args = parser.parse_args()
+    toolArgs = args.toolArgs[1:] if args.toolArgs[:1] == ["--"] else args.toolArgs
+    if args.child:
+        return runChild(args.child, toolArgs)
+
+    instance = MockInstance(args.projects, args.versions, args.components, args.seed)
+    selected = [scenario.strip() for scenario in args.scenarios.split(",")]
+    results = []
+    with MockBlackDuckServer(instance, latency=args.latency, jitter=args.jitter, errorRate=args.error_rate, seed=args.seed) as server, \
+            tempfile.TemporaryDirectory() as outputDir:
+        print(f"Mock Black Duck: {args.projects} projects x {args.versions} versions, ~{args.components} components per version, "
+              f"latency {args.latency}s at {server.url}")
+        for name, scenarioArgs in SCENARIOS:
+            if name in selected:
+                runArgs = ["--url", server.url, "--token", "mock", "--dir", outputDir, "--json"] + scenarioArgs + toolArgs
+                results.append(runScenario(server, name, runArgs, args.projects))
+    printResults(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=3)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+'''
+Asyncio based collection backend for blackduck_triage_extract (--async).
+
+All Black Duck requests run on a single event loop in one background thread, so
+hundreds of requests can be in flight without a large thread pool. Every endpoint
+class has its own semaphore, which keeps the heavy vulnerable-bom-components pulls
+from starving the cheap snippet-counts and policy-rules calls.
+
+Needs httpx: pip install blackduck-remediation-metrics[async]
+'''
+import asyncio
+import threading
+from collections import deque
+from itertools import islice
+from time import monotonic
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+MAX_LIMIT = 1000
+# Default number of concurrent requests per endpoint class
+DEFAULT_ENDPOINT_LIMITS = {
+    "versions": 16,
+    "snippet-counts": 64,
+    "policy-rules": 32,
+    "vulnerable-bom-components": 8,
+}
+ACCEPT_HEADERS = {
+    "versions": "application/vnd.blackducksoftware.internal-1+json",
+    "snippet-counts": "application/vnd.blackducksoftware.internal-1+json",
+    "policy-rules": "application/vnd.blackducksoftware.bill-of-materials-7+json",
+    "vulnerable-bom-components": "application/vnd.blackducksoftware.bill-of-materials-6+json",
+}
+
+
+def parseEndpointLimits(limits):
+    """Parse "endpoint=N,endpoint=N" into a dict on top of DEFAULT_ENDPOINT_LIMITS"""
+    endpointLimits = dict(DEFAULT_ENDPOINT_LIMITS)
+    if limits:
+        for limit in limits.split(','):
+            endpoint, _, value = limit.partition('=')
+            endpoint = endpoint.strip()
+            if endpoint not in endpointLimits:
+                raise ValueError(f"Unknown endpoint \"{endpoint}\", options are: {', '.join(endpointLimits)}")
+            if not value.strip().isdigit() or int(value) < 1:
+                raise ValueError(f"Limit for \"{endpoint}\" must be a positive integer")
+            endpointLimits[endpoint] = int(value)
+    return endpointLimits
+
+
+class AsyncCollector:
+    """Collects project versions on an asyncio event loop running in a background thread.
+
+    submit() is thread-safe and returns a concurrent.futures.Future, so the caller can treat
+    it like a thread pool executor.
+    """
+
+    def __init__(self, endpointLimits=None, verify=True, timeout=300, transport=None, newComponentCounts=None, addComponents=None,
+                 metrics=None):
+        if not HTTPX_AVAILABLE:
+            raise RuntimeError("The async collector needs httpx. Install with: pip install httpx")
+        self.endpointLimits = endpointLimits or dict(DEFAULT_ENDPOINT_LIMITS)
+        # Vulnerable BOM components are folded page by page into newComponentCounts() with addComponents(counts, items)
+        self.newComponentCounts = newComponentCounts
+        self.addComponents = addComponents
+        # Optional telemetry.RunMetrics recording every request
+        self.metrics = metrics
+        # Enough projects in flight to keep every endpoint semaphore busy
+        self.window = sum(self.endpointLimits.values())
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="bd-async", daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._open(verify, timeout, transport), self.loop).result()
+
+    async def _open(self, verify, timeout, transport):
+        # Semaphores must be created on the loop they are used on
+        self.semaphores = {endpoint: asyncio.Semaphore(limit) for endpoint, limit in self.endpointLimits.items()}
+        self.client = httpx.AsyncClient(verify=verify, timeout=timeout, transport=transport,
+                                        limits=httpx.Limits(max_connections=self.window, max_keepalive_connections=self.window))
+
+    def submit(self, hub, project, parameters, foldVersions, lookupVersion=None):
+        """Collect all versions of the project and call foldVersions(versions, versionResults) on the loop thread.
+
+        Versions for which lookupVersion(version) returns a cached (version, snippetCounts, policyViolations,
+        vulnerableComponentCounts) result are not fetched. The future resolves to the results that were fetched.
+        """
+        return asyncio.run_coroutine_threadsafe(self._collectProject(hub, project, parameters, foldVersions, lookupVersion), self.loop)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def _close(self):
+        # Cancel whatever is still running, e.g. after an error in the caller
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.client.aclose()
+
+    async def _get(self, hub, endpoint, url, parameters=None):
+        async with self.semaphores[endpoint]:
+            for attempt in range(2):
+                if monotonic() >= hub.expiresAt:
+                    # Renewing posts to Black Duck under the session lock, which must not block the loop thread
+                    await asyncio.get_running_loop().run_in_executor(None, hub.refresh_token, hub.token)
+                headers = hub.get_headers()
+                headers['Accept'] = ACCEPT_HEADERS[endpoint]
+                start = monotonic()
+                response = await self.client.get(url, headers=headers, params=parameters)
+                if self.metrics:
+                    self.metrics.record_request(url, monotonic() - start, response.status_code, len(response.content))
+                if response.status_code == 401 and attempt == 0:
+                    if self.metrics:
+                        self.metrics.record_retry(url)
+                    # Renew the bearer token shared with the HubSession and try once more
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, hub.refresh_token, headers['Authorization'][len('Bearer '):])
+                    continue
+                return response
+
+    async def _getAllPages(self, hub, endpoint, url, parameters=None):
+        """Fetch the first page for totalCount, then the remaining offsets concurrently and merge them in order"""
+        parameters = dict(parameters or {}, limit=MAX_LIMIT)
+        response = await self._get(hub, endpoint, url, parameters)
+        jsondata = response.json()
+        if response.status_code == 200 and "totalCount" in jsondata and int(jsondata["totalCount"]) > MAX_LIMIT:
+            pages = await asyncio.gather(*(self._get(hub, endpoint, url, dict(parameters, offset=offset))
+                                           for offset in range(MAX_LIMIT, int(jsondata["totalCount"]), MAX_LIMIT)))
+            for page in pages:
+                jsondata["items"].extend(page.json().get("items", []))
+        return response, jsondata
+
+    async def _collectProject(self, hub, project, parameters, foldVersions, lookupVersion):
+        _, versions = await self._getAllPages(hub, "versions", project['_meta']['href'] + "/versions", parameters)
+        results = []
+        fetchedVersions = []
+        if versions and "totalCount" in versions and int(versions["totalCount"]) > 0:
+            results = await asyncio.gather(*(self._collectVersion(hub, version, lookupVersion, fetchedVersions)
+                                             for version in versions["items"]))
+        foldVersions(versions, results)
+        return fetchedVersions
+
+    async def _collectVersion(self, hub, version, lookupVersion, fetchedVersions):
+        cachedResult = lookupVersion(version) if lookupVersion else None
+        if cachedResult:
+            return cachedResult
+        href = version['_meta']['href']
+        snippetCounts, policyViolations, vulnerableComponents = await asyncio.gather(
+            self._get(hub, "snippet-counts", href + "/snippet-counts"),
+            self._get(hub, "policy-rules", href + "/policy-rules"),
+            self._getVulnerableComponents(hub, href))
+        result = (version, snippetCounts.json(), policyViolations.json(), vulnerableComponents)
+        fetchedVersions.append(result)
+        return result
+
+    async def _getVulnerableComponents(self, hub, href):
+        """Count the vulnerable BOM components, folding each page as soon as it arrives"""
+        url = href + "/vulnerable-bom-components"
+        parameters = {"limit": MAX_LIMIT}
+        counts = self.newComponentCounts()
+        response = await self._get(hub, "vulnerable-bom-components", url, parameters)
+        if response.status_code == 200:
+            jsondata = response.json()
+            self.addComponents(counts, jsondata.get("items", []))
+            if "totalCount" in jsondata and int(jsondata["totalCount"]) > MAX_LIMIT:
+                # At most as many pages as the endpoint runs at a time are requested ahead of the fold,
+                # another page is requested for every page folded
+                offsets = iter(range(MAX_LIMIT, int(jsondata["totalCount"]), MAX_LIMIT))
+                window = self.endpointLimits["vulnerable-bom-components"]
+                pages = deque(self._requestPage(hub, url, parameters, offset) for offset in islice(offsets, window))
+                try:
+                    while pages:
+                        page = await pages.popleft()
+                        for offset in islice(offsets, 1):
+                            pages.append(self._requestPage(hub, url, parameters, offset))
+                        if page.status_code == 200:
+                            self.addComponents(counts, page.json().get("items", []))
+                finally:
+                    for page in pages:
+                        page.cancel()
+        return counts
+
+    def _requestPage(self, hub, url, parameters, offset):
+        return asyncio.ensure_future(self._get(hub, "vulnerable-bom-components", url, dict(parameters, offset=offset)))
@@ -6,10 +6,10 @@ By default the script is exporting the status for all projects in given
 Black Duck instance. There are some filtering implemented to limit the 
 project count.
 
-Will need following: Python 3 and module: blackduck, jinja2, pdfkit and tinydb
+Will need following: Python 3 and module: requests, jinja2, pdfkit and tinydb
 To install the needed modules: 
 
-pip install blackduck jinja2 pdfkit tinydb BetterJSONStorage
+pip install requests jinja2 pdfkit tinydb BetterJSONStorage
 OR
 pip install -r requirements.txt
 
@@ -81,23 +81,34 @@ import logging
 import sys
 import argparse
 import gzip
-from blackduck.HubRestApi import HubInstance
+import hashlib
 from timeit import default_timer as timer
-import jinja2
 from datetime import datetime
 import pdfkit
-import requests
 import os
 import json
-from tinydb import TinyDB, Query
+import io
+import re
+from collections import deque
+from contextlib import ExitStack
+from itertools import islice
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from tqdm import tqdm
-import pandas as pd
-try:
-    from playwright.sync_api import sync_playwright
-    PLAYWRIGHT_AVAILABLE = True
-except ImportError:
-    PLAYWRIGHT_AVAILABLE = False
+from .async_collector import AsyncCollector, parseEndpointLimits
+from .hub_session import HubSession, DEFAULT_POOL_SIZE
+from .cache_store import openCacheStore, CACHE_BACKENDS
+from .checkpoint import CheckpointJournal
+from .telemetry import RunMetrics
+from .profiling import PhaseProfiler
+from .pdf_service import PdfService, PLAYWRIGHT_AVAILABLE
+from .report_views import templateEnvironment, reportView, dashboardView, dashboardPayload, jsonView
+from .version_query import VersionQuery, FilterStats, UNFILTERED_SIGNATURE
+from .model import RunClock, Version, PolicyHit, isoDate, isoDay, latestDate
+from .policy_index import PolicyIndex
+from .fact_tables import writeFactTables, PYARROW_AVAILABLE
+from .counters import REMEDIATION_STATUSES, RemediationCounts, PolicyCounts, LevelTotals
 
 
 __author__ = "Jouni Lehto"
@@ -106,252 +117,487 @@ __version__ = "0.1.22"
 #Global variables
 args = "" 
 MAX_LIMIT=1000
+# The TLS certificate of Black Duck is always verified, by the session and by the async collector
+INSECURE = False
+# Template and JSON chunks joined into one write of the streaming report writers
+STREAM_CHUNKS = 1000
+# wkhtmltopdf converts the report without JavaScript, the PDF shows the inline SVG charts of the report
+PDFKIT_OPTIONS = {'enable-local-file-access': None, 'disable-javascript': None}
 # Use package-relative path for templates
 templatesDir = str(Path(__file__).parent / "templates")
 templateFile = "BD_Results_Distribution_by_Triage_Status_v3.html"
 db = None
+# Journal of finished projects for --resume
+checkpoint = None
+# Filter signature of the cached project records without one, see recordFilterSignature
+legacySignature = None
+# Request and cache telemetry for --metrics-file
+metrics = None
+# Project IDs of every --project-groups group by group name, None without --project-groups
+reportShards = None
+# Server-side version filters of the run and, with --filter-stats, the versions they eliminated
+versionQuery = None
+filterStats = None
+# Timestamp of the run, the dormancy of every version is decided against it
+runClock = None
+# Shared pools for per-version Black Duck requests and for the extra pages of paginated endpoints,
+# None when running serially (--workers 1)
+requestExecutor = None
+pageExecutor = None
 
-def get_project_group_projects(hub):
+def submitTask(executor, function, *args, **kwargs):
+    """Run the given function in the executor, or inline when running serially (executor is None)"""
+    if executor:
+        return executor.submit(function, *args, **kwargs)
+    future = Future()
+    try:
+        future.set_result(function(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+PROJECT_ACCEPT = 'application/vnd.blackducksoftware.project-detail-4+json'
+PROJECT_GROUP_ACCEPT = 'application/vnd.blackducksoftware.project-detail-5+json'
+# Page size of the --incremental listing, a nightly refresh usually finds every updated project on the first page
+INCREMENTAL_PAGE_LIMIT = 100
+# Cache metadata key of the project listing of the previous --incremental run
+PROJECT_LISTING_KEY = "projectListing"
+# Cache metadata key of the filter signature taken for project records written without one
+LEGACY_SIGNATURE_KEY = "legacyFilterSignature"
+# Format of the cached aggregated results, results of earlier formats (display dates) are not reused
+RESULT_FORMAT = 2
+
+def iter_pages(hub, url, accept, parameters=None, limit=MAX_LIMIT, window=None):
+    """Yield (response, jsondata) for every page of a paginated Black Duck endpoint in offset order.
+
+    Once the first page has given the totalCount, the remaining offsets are fetched concurrently
+    in the page pool. At most window pages (all when None) are requested ahead of the consumer,
+    which bounds how many pages are held in memory at a time.
+    """
+    parameters = dict(parameters or {}, limit=limit)
+    response = hub.get(url, accept=accept, params=parameters)
+    jsondata = response.json()
+    yield response, jsondata
+    if response.status_code == 200 and "totalCount" in jsondata and int(jsondata["totalCount"]) > limit:
+        offsets = iter(range(limit, int(jsondata["totalCount"]), limit))
+        pageRequests = deque(submitTask(pageExecutor, hub.get, url, accept=accept, params=dict(parameters, offset=offset))
+                             for offset in (offsets if window is None else islice(offsets, window)))
+        while pageRequests:
+            page = pageRequests.popleft().result()
+            for offset in islice(offsets, 1):
+                pageRequests.append(submitTask(pageExecutor, hub.get, url, accept=accept, params=dict(parameters, offset=offset)))
+            yield page, page.json()
+
+def get_all_pages(hub, url, accept, parameters=None, limit=MAX_LIMIT):
+    """Fetch every page of a paginated Black Duck endpoint.
+
+    Returns the first response and its json data with the items of all pages appended in offset order.
+    """
+    pages = iter_pages(hub, url, accept, parameters, limit)
+    response, jsondata = next(pages)
+    for _, page in pages:
+        jsondata["items"].extend(page.get("items", []))
+    return response, jsondata
+
+def get_projects(hub, parameters=None):
+    return get_all_pages(hub, f'{hub.get_urlbase()}/api/projects', PROJECT_ACCEPT, parameters)[1]
+
+def get_projects_updated_since(hub, watermark, limit=INCREMENTAL_PAGE_LIMIT):
+    """Projects updated at or after the watermark, newest first. Paging stops at the first project
+    updated before it. Returns the totalCount of all projects and the updated projects, None on errors."""
+    url = f'{hub.get_urlbase()}/api/projects'
+    updated = []
+    offset = 0
+    while True:
+        response = hub.get(url, accept=PROJECT_ACCEPT, params={"sort": "updatedAt DESC", "limit": limit, "offset": offset})
+        if response.status_code != 200:
+            return None
+        jsondata = response.json()
+        for project in jsondata["items"]:
+            if project["updatedAt"] < watermark:
+                return int(jsondata["totalCount"]), updated
+            updated.append(project)
+        offset += limit
+        if not jsondata["items"] or offset >= int(jsondata["totalCount"]):
+            return int(jsondata["totalCount"]), updated
+
+def get_projects_incrementally(hub):
+    """Project listing of --incremental. Only the projects updated since the previous run are listed, the
+    other projects of the previous listing come from the cache in their previous order, new projects last.
+    All projects are listed when there is no previous listing or projects have been deleted since."""
+    listing = db.get_meta(PROJECT_LISTING_KEY)
+    if listing and listing["url"] == args.url:
+        result = get_projects_updated_since(hub, listing["watermark"])
+        if result:
+            totalCount, updated = result
+            updatedProjects = {project["_meta"]["href"].split("/")[-1]: project for project in updated}
+            items = []
+            for projectId in listing["projectIDs"]:
+                project = updatedProjects.pop(projectId, None) or cachedProjectListItem(hub, projectId)
+                if project is None:
+                    break
+                items.append(project)
+            else:
+                items.extend(updatedProjects.values())
+                # Every project still in Black Duck is either updated or in the previous listing
+                if len(items) == totalCount:
+                    tqdm.write(f"{len(updated)} projects updated since {listing['watermark']}, {totalCount - len(updated)} served from the cache")
+                    return {"totalCount": totalCount, "items": items}
+        tqdm.write("Projects have changed since the previous run in a way the incremental listing cannot follow, listing all projects")
+    return get_projects(hub)
+
+def cachedProjectListItem(hub, projectId):
+    """Project listing item of a cached project, None when it is not cached"""
+    cached = db.get_project(projectId)
+    if cached is None:
+        return None
+    return {"name": cached["projectName"], "updatedAt": cached["updatedAt"],
+            "_meta": {"href": f"{hub.get_urlbase()}/api/projects/{projectId}"}}
+
+def saveProjectListing(projects):
+    """Store the project listing of the run and its watermark, the latest updatedAt, for the next --incremental run"""
+    if projects:
+        db.put_meta(PROJECT_LISTING_KEY, {"url": args.url, "watermark": max(project["updatedAt"] for project in projects),
+                                          "projectIDs": [project["_meta"]["href"].split("/")[-1] for project in projects]})
+
+def get_project_group_projects(hub, projectGroupName=None, exactName=False):
+    """Projects of the project groups found by name (--project-group by default), a name search matches
+    every group with the name in its name unless exactName is set"""
+    projectGroupName = projectGroupName or args.project_group_name
     projects = {"totalCount": 0, "items": []}
     url = f'{hub.get_urlbase()}/api/project-groups'
-    headers = hub.get_headers()
-    headers['Accept'] = 'application/vnd.blackducksoftware.project-detail-5+json'
-    parameters={"q":f'name:{args.project_group_name}'}
-    response = requests.get(url, headers=headers, params=parameters, verify = not hub.config['insecure'])
+    parameters={"q":f'name:{projectGroupName}'}
+    response = hub.get(url, accept=PROJECT_GROUP_ACCEPT, params=parameters)
     if response.status_code == 200:
         jsondata = response.json()
         if "totalCount" in jsondata and int(jsondata["totalCount"]) > 0:
             for projectGroup in jsondata["items"]:
-                get_project_groups_children_projects(hub, projectGroup, projects, headers)
+                if not exactName or projectGroup["name"].lower() == projectGroupName.lower():
+                    get_project_groups_children_projects(hub, projectGroup, projects)
     return projects
 
-def get_project_groups_children_projects(hub, projectGroup, projects, headers):
-    parameters={"limit": MAX_LIMIT}
-    response = requests.get(projectGroup['_meta']['href']+"/children", headers=headers, params=parameters, verify = not hub.config['insecure'])
+def get_report_shard_projects(hub):
+    """Projects of all --project-groups groups, each project once, and the project IDs of every group"""
+    projects = {"totalCount": 0, "items": []}
+    shards = {}
+    collected = set()
+    for projectGroupName in parseProjectGroups(args.project_groups):
+        shards[projectGroupName] = []
+        for project in get_project_group_projects(hub, projectGroupName, exactName=True)["items"]:
+            projectId = project["_meta"]["href"].split("/")[-1]
+            shards[projectGroupName].append(projectId)
+            if projectId not in collected:
+                collected.add(projectId)
+                projects["items"].append(project)
+    projects["totalCount"] = len(projects["items"])
+    return projects, shards
+
+def parseProjectGroups(projectGroups):
+    """Group names of --project-groups, in the given order without duplicates"""
+    return list(dict.fromkeys(name.strip() for name in projectGroups.split(',') if name.strip()))
+
+def get_project_groups_children_projects(hub, projectGroup, projects):
+    response, childrens = get_all_pages(hub, projectGroup['_meta']['href']+"/children", PROJECT_GROUP_ACCEPT)
     if response.status_code == 200:
-        childrens = response.json()
-        if "totalCount" in childrens and int(childrens["totalCount"]) > MAX_LIMIT:
-            downloaded = MAX_LIMIT
-            while int(childrens["totalCount"]) > downloaded:
-                parameters={"offset": downloaded, "limit": MAX_LIMIT}
-                moreProjects = requests.get(projectGroup['_meta']['href']+"/children", headers=headers, params=parameters, verify = not hub.config['insecure'])
-                childrens["items"] = childrens["items"] + moreProjects.json()["items"]
-                downloaded += MAX_LIMIT
         if "totalCount" in childrens and int(childrens["totalCount"]) > 0:
             for children in childrens["items"]:
                 if "isProject" in children and children["isProject"] is False:
-                    get_project_groups_children_projects(hub,children, projects, headers)
+                    get_project_groups_children_projects(hub,children, projects)
                 else:
                     #This phase there will always be one project, so no need for limits
-                    project_response = requests.get(children['_meta']['href'], headers=headers, verify = not hub.config['insecure'])
+                    project_response = hub.get(children['_meta']['href'], accept=PROJECT_GROUP_ACCEPT)
                     if project_response.status_code == 200:
                         children_projects = project_response.json()
                         if children_projects:
-                            projectList = [children_projects]
                             projects["totalCount"] = int(projects["totalCount"]) + 1
-                            projects["items"] = projects["items"] + projectList
+                            projects["items"].append(children_projects)
     
 def get_version_snippets(hub, projectversion):
     url = f'{projectversion}/snippet-counts'
-    headers = hub.get_headers()
-    headers['Accept'] = 'application/vnd.blackducksoftware.internal-1+json'
-    response = requests.get(url, headers=headers, verify = not hub.config['insecure'])
+    response = hub.get(url, accept='application/vnd.blackducksoftware.internal-1+json')
     jsondata = response.json()
     return jsondata
 
 def get_project_versions(hub, project, limit=100, parameters={}):
-    # paramstring = self.get_limit_paramstring(limit)
-    parameters.update({'limit': limit})
-    url = project['_meta']['href'] + "/versions" + hub._get_parameter_string(parameters)
-    headers = hub.get_headers()
-    headers['Accept'] = 'application/vnd.blackducksoftware.internal-1+json'
-    response = requests.get(url, headers=headers, verify = not hub.config['insecure'])
-    jsondata = response.json()
-    return jsondata
+    url = project['_meta']['href'] + "/versions"
+    return get_all_pages(hub, url, 'application/vnd.blackducksoftware.internal-1+json', parameters, limit)[1]
 
-def get_version_vuln_components(hub, projectversion, limit=MAX_LIMIT):
-    parameters={"limit": limit}
+def get_version_vuln_component_counts(hub, projectversion, limit=MAX_LIMIT):
+    """Count the vulnerable BOM components of the version by remediation status and severity.
+
+    Pages are folded into the counts as they arrive and then dropped, so at most --workers pages
+    of a version are held in memory instead of the whole BOM.
+    """
     url = projectversion['_meta']['href'] + "/vulnerable-bom-components"
-    headers = hub.get_headers()
-    headers['Accept'] = 'application/vnd.blackducksoftware.bill-of-materials-6+json'
-    response = requests.get(url, headers=headers, params=parameters, verify = not hub.config['insecure'])
-    jsondata = response.json()
-    if response.status_code == 200:
-        if "totalCount" in jsondata and int(jsondata["totalCount"]) > MAX_LIMIT:
-            downloaded = MAX_LIMIT
-            while int(jsondata["totalCount"]) > downloaded:
-                parameters={"offset": downloaded, "limit": limit}
-                moreComponents = requests.get(url, headers=headers, params=parameters, verify = not hub.config['insecure'])
-                if "items" in moreComponents.json():
-                    jsondata["items"] = jsondata["items"] + moreComponents.json()["items"]
-                downloaded += MAX_LIMIT
-        return jsondata
+    counts = newRemediationStatusCounts()
+    for response, page in iter_pages(hub, url, 'application/vnd.blackducksoftware.bill-of-materials-6+json', limit=limit, window=args.workers):
+        if response.status_code == 200:
+            addVulnerableComponents(counts, page.get("items", []))
+    return counts
+
+def newRemediationStatusCounts():
+    """Empty vulnerable component counts by remediation status and severity"""
+    return RemediationCounts()
+
+def addVulnerableComponents(counts, vulnerableComponents):
+    """Fold one page of vulnerable BOM components into the counts by remediation status and severity"""
+    remediationStatuses = []
+    severities = []
+    for vulnerableComponent in vulnerableComponents:
+        if "vulnerabilityWithRemediation" in vulnerableComponent:
+            vulnerability = vulnerableComponent["vulnerabilityWithRemediation"]
+            remediationStatuses.append(vulnerability.get("remediationStatus", "NONE"))
+            severities.append(vulnerability.get("severity", "NONE"))
+    counts.count_labels(remediationStatuses, severities)
+    return counts
 
 def addFindings():
     global args, db
-    hub = HubInstance(args.url, api_token=args.token, insecure=False)
-    if args.project_group_name:
+    poolSize = args.pool_size if args.pool_size else max(DEFAULT_POOL_SIZE, 2 * args.workers)
+    hub = HubSession(args.url, args.token, insecure=INSECURE, poolSize=poolSize, metrics=metrics)
+    startExecutors()
+    try:
+        return collectFindings(hub)
+    finally:
+        stopExecutors()
+        hub.close()
+
+def collectFindings(hub):
+    """Collect the metrics of all selected projects through the given Black Duck session"""
+    global reportShards, versionQuery, filterStats, runClock, legacySignature
+    reportShards = None
+    legacySignature = None
+    runClock = RunClock(args.sinceDays)
+    versionQuery = VersionQuery.fromArguments(args)
+    filterStats = FilterStats(versionQuery) if args.filter_stats else None
+    if args.project_groups:
+        projects, reportShards = get_report_shard_projects(hub)
+    elif args.project_group_name:
         projects = get_project_group_projects(hub)
     elif args.project:
         parameters={"q":"name:{}".format(args.project)}
-        projects = hub.get_projects(limit=MAX_LIMIT, parameters=parameters)
+        projects = get_projects(hub, parameters=parameters)
+    elif args.incremental:
+        projects = get_projects_incrementally(hub)
     else:
-        projects = hub.get_projects(limit=MAX_LIMIT)
-        if "totalCount" in projects and int(projects["totalCount"]) > MAX_LIMIT:
-            downloaded = MAX_LIMIT
-            while int(projects["totalCount"]) > downloaded:
-                parameters={"offset": downloaded}
-                moreProjects = hub.get_projects(limit=MAX_LIMIT, parameters=parameters)
-                projects["items"] = projects["items"] + moreProjects["items"]
-                downloaded += MAX_LIMIT
+        projects = get_projects(hub)
     if projects and "totalCount" in projects and int(projects["totalCount"]) > 0:
+        if args.cache:
+            resultInputs = resultCacheInputs(projects)
+        # The filter stats count the versions of this run's listing, which cached results cannot give
+        if args.cache and not filterStats:
+            cachedResult = db.get_result(versionQuery.signature(), resultInputs)
+            if metrics:
+                metrics.record_cache("result", cachedResult is not None)
+            if cachedResult:
+                tqdm.write(f"No project has changed since the previous run with the same filters, using its results for {projects['totalCount']} projects")
+                if args.incremental:
+                    saveProjectListing(projects["items"])
+                return cachedResult
         totalCounts=[]
-        instanceLevelCount = {"Total": 0}
-        instanceLevelCount["ProjectTotalCount"] = projects["totalCount"]
-        instanceLevelCount["ProjectTotalVersionCount"] = 0
-        instanceLevelCount["NEW"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-        instanceLevelCount["IGNORED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-        instanceLevelCount["DUPLICATE"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-        instanceLevelCount["MITIGATED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-        instanceLevelCount["NEEDS_REVIEW"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-        instanceLevelCount["PATCHED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-        instanceLevelCount["REMEDIATION_COMPLETE"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-        instanceLevelCount["REMEDIATION_REQUIRED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-        instanceLevelCount["NOT_AFFECTED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-        instanceLevelCount["AFFECTED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-        instanceLevelCount["UNDER_INVESTIGATION"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-        instanceLevelCount["NONE"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-        instanceLevelCount["SNIPPET"] = {"Total": 0, "unreviewed": 0, "reviewed": 0, "ignored": 0, "NONE": 0}
-        instanceLevelCountPolicy = {}
-        instanceLevelCountPolicy["UNCATEGORIZED"] = {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0}
-        instanceLevelCountPolicy["COMPONENT"] = {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0}
-        instanceLevelCountPolicy["LICENSE"] = {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0}
-        instanceLevelCountPolicy["OPERATIONAL"] = {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0}
-        instanceLevelCountPolicy["SECURITY"] = {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0}
-        instanceLevelCount["policyViolations"] = instanceLevelCountPolicy
-        # Initialize policy details dictionary for hierarchical view
-        instanceLevelCount["policyDetails"] = {}
+        instanceLevelCount = newInstanceLevelCount(projects["totalCount"])
+        # The instance totals are summed in count matrices and written into instanceLevelCount at the end
+        instanceTotals = LevelTotals()
         tqdm.write(f"Total project count: {projects['totalCount']}")
         tqdm.write("Analyzing found projects...")
         progressBar = tqdm(total=len(projects["items"]), desc="Progress", unit="project")
-        for index, project in enumerate(projects["items"]):
-            if index%200 == 0:
-                #renew the connection after every 200 projects
-                hub = HubInstance(args.url, api_token=args.token, insecure=False)
-            projectLevelCount = {}
-            projectId = project["_meta"]["href"].split("/")[-1]
-            projectLevelCount["projectID"] = projectId
-            projectLevelCount["projectName"] = project["name"]
-            projectLevelCount["updatedAt"] = project["updatedAt"]
-            projectLevelCount["Total"] = 0
-            projectLevelCount["NEW"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            projectLevelCount["IGNORED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            projectLevelCount["DUPLICATE"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            projectLevelCount["MITIGATED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            projectLevelCount["NEEDS_REVIEW"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            projectLevelCount["PATCHED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            projectLevelCount["REMEDIATION_COMPLETE"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            projectLevelCount["REMEDIATION_REQUIRED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            projectLevelCount["NOT_AFFECTED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            projectLevelCount["AFFECTED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            projectLevelCount["UNDER_INVESTIGATION"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            projectLevelCount["NONE"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            projectLevelCount["SNIPPET"] = {"Total": 0, "unreviewed": 0, "reviewed": 0, "ignored": 0, "NONE": 0}
-            projectLevelCount["isDormant"] = False
-            projectLevelCountPolicy = {}
-            projectLevelCountPolicy["UNCATEGORIZED"] = {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0}
-            projectLevelCountPolicy["COMPONENT"] = {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0}
-            projectLevelCountPolicy["LICENSE"] = {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0}
-            projectLevelCountPolicy["OPERATIONAL"] = {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0}
-            projectLevelCountPolicy["SECURITY"] = {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0}
-            projectLevelCount["policyViolations"] = projectLevelCountPolicy
-            # Initialize policy details dictionary for this project
-            projectLevelCount["policyDetails"] = {}
-            if args.cache:
-                if not db.contains(Query()['projectID']==projectId):
-                    getProjectMetrics(hub, project, projectLevelCount, instanceLevelCount)
-                    db.insert(projectLevelCount)
-                else:
+        # Projects are collected in a bounded window and merged into the totals strictly in listing order,
+        # so the result is identical to a serial run regardless of --workers.
+        asyncCollector = None
+        if args.async_collector:
+            asyncCollector = AsyncCollector(parseEndpointLimits(args.async_limits), verify=not INSECURE,
+                                            newComponentCounts=newRemediationStatusCounts, addComponents=addVulnerableComponents,
+                                            metrics=metrics)
+        projectExecutor = None
+        if args.workers > 1 and not asyncCollector:
+            projectExecutor = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="bd-project")
+        window = asyncCollector.window if asyncCollector else 2 * args.workers
+        pending = deque()
+        filterStatsRequests = []
+        try:
+            for project in projects["items"]:
+                projectLevelCount = {}
+                projectId = project["_meta"]["href"].split("/")[-1]
+                projectLevelCount["projectID"] = projectId
+                projectLevelCount["projectName"] = project["name"]
+                projectLevelCount["updatedAt"] = project["updatedAt"]
+                projectLevelCount.update(RemediationCounts().to_dict())
+                projectLevelCount["SNIPPET"] = {"Total": 0, "unreviewed": 0, "reviewed": 0, "ignored": 0, "NONE": 0}
+                projectLevelCount["isDormant"] = False
+                projectLevelCount["policyViolations"] = PolicyCounts().to_dict()
+                # Initialize policy details dictionary for this project
+                projectLevelCount["policyDetails"] = {}
+                resumed = checkpoint.get(projectId, project["updatedAt"]) if checkpoint else None
+                cached = None
+                if args.cache and not resumed:
+                    cached = db.get_project(projectId)
+                if metrics:
+                    if checkpoint:
+                        metrics.record_cache("checkpoint", resumed is not None)
+                    if args.cache and not resumed:
+                        metrics.record_cache("project", isReusableProjectRecord(cached, project))
+                if resumed:
+                    # Finished before the previous run stopped
+                    if filterStats:
+                        # The journal holds the kept versions only
+                        countFilteredVersions(hub, project, None, filterStatsRequests)
+                    resumed = withIsoScanDates(resumed)
+                    if args.cache:
+                        storeResumedProject(resumed)
+                    pending.append((resumed, None))
+                elif isReusableProjectRecord(cached, project):
                     #project data is already collected
-                    projectLevelCount = db.get(Query()['projectID']==projectId)
-                    if not projectLevelCount["updatedAt"] == project["updatedAt"]:
-                        getProjectMetrics(hub, project, projectLevelCount, instanceLevelCount)
-                        projectLevelCount["projectName"] = project["name"]
-                        projectLevelCount["updatedAt"] = project["updatedAt"]
-                        db.upsert(projectLevelCount)
+                    # Always filter cached data to match specified criteria
+                    if filterStats:
+                        countFilteredVersions(hub, project, cached, filterStatsRequests)
+                    projectLevelCount = filterProjectDataByFilters(withIsoScanDates(cached), versionQuery)
+                    pending.append((projectLevelCount, None))
+                else:
+                    lookupVersion = None
+                    if args.cache:
+                        # Unchanged versions of a changed project are rebuilt from their version cache records
+                        cachedVersions = {record["versionID"]: record for record in db.get_versions(projectId)}
+                        lookupVersion = partial(lookupCachedVersion, cachedVersions)
+                    if asyncCollector:
+                        future = asyncCollector.submit(hub, project, versionQuery.parameters(),
+                                                       partial(addProjectVersions, project, projectLevelCount), lookupVersion)
                     else:
-                        # Parse phase and distribution filters from args
-                        phaseList = [p.strip().upper() for p in args.phaseCategories.split(',')] if args.phaseCategories else None
-                        distributionList = [d.strip().upper() for d in args.distributionCategories.split(',')] if args.distributionCategories else None
-                        
-                        # Always filter cached data to match specified criteria
-                        projectLevelCount = filterProjectDataByFilters(
-                            projectLevelCount, 
-                            versionName=args.project_version if args.project_version else None,
-                            phaseCategories=phaseList,
-                            distributionCategories=distributionList
-                        )
-                        addToTotals(projectLevelCount, instanceLevelCount)
-            else:
-                getProjectMetrics(hub, project, projectLevelCount, instanceLevelCount)
-            totalCounts.append(projectLevelCount)
-            progressBar.update()
+                        future = submitTask(projectExecutor, getProjectMetrics, hub, project, projectLevelCount, lookupVersion)
+                    pending.append((projectLevelCount, future))
+                    if filterStats:
+                        countFilteredVersions(hub, project, None, filterStatsRequests)
+                # Merge finished projects from the head of the window, wait only when the window is full
+                while pending and (len(pending) > window or pending[0][1] is None or pending[0][1].done()):
+                    mergeProject(pending.popleft(), instanceLevelCount, instanceTotals, totalCounts, progressBar)
+            while pending:
+                mergeProject(pending.popleft(), instanceLevelCount, instanceTotals, totalCounts, progressBar)
+            for request in filterStatsRequests:
+                request.result()
+        finally:
+            if projectExecutor:
+                projectExecutor.shutdown(wait=True)
+            if asyncCollector:
+                asyncCollector.close()
         progressBar.close()
+        if filterStats:
+            reportFilterStats()
+        if args.incremental:
+            saveProjectListing(projects["items"])
+        instanceTotals.write_to(instanceLevelCount)
         instanceLevelCount["projects"] = totalCounts
-        
-        # Generate policyBreakdown from policyDetails for tooltip display
-        instanceLevelCount["policyBreakdown"] = generatePolicyBreakdown(instanceLevelCount["policyDetails"])
+        if args.cache:
+            db.put_result(versionQuery.signature(), resultInputs, instanceLevelCount)
         
         return instanceLevelCount
     else:
         tqdm.write("No projects found!")
 
-def generatePolicyBreakdown(policyDetails):
-    """Generate simplified policy breakdown for tooltips from full policy details"""
-    policyBreakdown = {
-        "COMPONENT": {},
-        "LICENSE": {},
-        "SECURITY": {},
-        "OPERATIONAL": {},
-        "UNCATEGORIZED": {}
-    }
-    
-    for category, policies in policyDetails.items():
-        if category not in policyBreakdown:
-            policyBreakdown[category] = {}
-        for policyName, policyData in policies.items():
-            policyBreakdown[category][policyName] = policyData["totalCount"]
-    
-    return policyBreakdown
+def resultCacheInputs(projects):
+    """Digest of the inputs of the aggregated results besides the version filters: the result format, the Black Duck instance,
+    the dormancy setting and the listed projects with their updatedAt, in listing order"""
+    digest = hashlib.sha256(json.dumps([RESULT_FORMAT, args.url, args.sinceDays, int(projects["totalCount"])]).encode("utf-8"))
+    for project in projects["items"]:
+        digest.update(f'{project["_meta"]["href"]} {project["updatedAt"]}\n'.encode("utf-8"))
+    return digest.hexdigest()
+
+def isReusableProjectRecord(cached, project):
+    """A cached project record is reused when the project has not been updated since and the record was collected
+    with the version filters of this run, or without any, so that filtering it down gives this run's versions"""
+    return cached is not None and cached["updatedAt"] == project["updatedAt"] \
+        and recordFilterSignature(cached) in (versionQuery.signature(), UNFILTERED_SIGNATURE)
+
+def recordFilterSignature(record):
+    """Signature of the version filters a cached project record was collected with. Records written before records
+    carried one are taken to be collected with the filters of the first run that reads them, as scheduled runs keep
+    their filters; the signature is kept in the cache metadata for the runs after it."""
+    global legacySignature
+    if "filterSignature" in record:
+        return record["filterSignature"]
+    if legacySignature is None:
+        legacySignature = db.get_meta(LEGACY_SIGNATURE_KEY)
+        if legacySignature is None:
+            legacySignature = versionQuery.signature()
+            db.put_meta(LEGACY_SIGNATURE_KEY, legacySignature)
+    return legacySignature
+
+def newInstanceLevelCount(projectCount):
+    """Empty instance level counts of projectCount projects, filled by addToTotals"""
+    instanceLevelCount = {"Total": 0}
+    instanceLevelCount["ProjectTotalCount"] = projectCount
+    instanceLevelCount["ProjectTotalVersionCount"] = 0
+    instanceLevelCount.update(RemediationCounts().to_dict())
+    instanceLevelCount["SNIPPET"] = {"Total": 0, "unreviewed": 0, "reviewed": 0, "ignored": 0, "NONE": 0}
+    instanceLevelCount["policyViolations"] = PolicyCounts().to_dict()
+    return instanceLevelCount
+
+def startExecutors():
+    """Create the request and page pools used for concurrent collection (--workers)"""
+    global requestExecutor, pageExecutor
+    if args.workers > 1:
+        requestExecutor = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="bd-request")
+        # Page fetches never wait on other tasks, so requests waiting for their pages cannot deadlock the pools
+        pageExecutor = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="bd-page")
+
+def stopExecutors():
+    global requestExecutor, pageExecutor
+    for executor in (requestExecutor, pageExecutor):
+        if executor:
+            executor.shutdown(wait=True)
+    requestExecutor = None
+    pageExecutor = None
+
+def storeResumedProject(record):
+    """Write a project of the checkpoint journal to the cache, unless the cache has it already. The cache writes of the
+    interrupted run may have been lost with it, the journal is flushed for every project."""
+    cached = db.get_project(record["projectID"])
+    if cached is None or cached["updatedAt"] != record["updatedAt"]:
+        db.put_project(dict(record, filterSignature=versionQuery.signature()))
+
+def mergeProject(pendingProject, instanceLevelCount, instanceTotals, totalCounts, progressBar):
+    """Merge one collected project into the instance totals. Always called from the main thread in project order."""
+    projectLevelCount, future = pendingProject
+    if future:
+        # Re-raises any exception from the collecting thread
+        fetchedVersions = future.result()
+        if args.cache:
+            # The filters the versions were collected with, a run with other filters cannot reuse the record
+            db.put_project(dict(projectLevelCount, filterSignature=versionQuery.signature()))
+            for fetchedVersion in fetchedVersions:
+                db.put_version(newVersionRecord(projectLevelCount["projectID"], *fetchedVersion))
+    # Projects without versions have no scan date
+    projectLevelCount.setdefault("latestScanDate", None)
+    if checkpoint:
+        checkpoint.add(projectLevelCount)
+    addToTotals(projectLevelCount, instanceLevelCount, instanceTotals)
+    totalCounts.append(projectLevelCount)
+    progressBar.update()
+
+def reportFilterStats():
+    """Print the versions every version filter eliminated (--filter-stats) and add them to the run metrics"""
+    tqdm.write(filterStats.summary())
+    if metrics:
+        stats = filterStats.to_dict()
+        metrics.set_run(versions_listed=stats["listed"], versions_kept=stats["kept"],
+                        **{f"versions_eliminated_by_{name}": count for name, count in stats["eliminated"].items()})
 
-def filterProjectDataByFilters(projectLevelCount, versionName=None, phaseCategories=None, distributionCategories=None):
-    """Filter cached project data to only include versions matching specified filters"""
+def countFilteredVersions(hub, project, record, requests):
+    """Count the versions the version filters eliminate from the project (--filter-stats). A record holding all versions
+    of the project is counted client-side, otherwise Black Duck is asked and the request is appended to requests."""
+    if record is not None and recordFilterSignature(record) == UNFILTERED_SIGNATURE:
+        filterStats.countCached(record.get("projectVersionLevelCounts", []))
+    else:
+        requests.append(submitTask(requestExecutor, filterStats.countListing, hub, project))
+
+def filterProjectDataByFilters(projectLevelCount, versionQuery):
+    """Filter cached project data to only include versions matching the version query"""
     filteredProjectCount = {
         "projectID": projectLevelCount["projectID"],
         "projectName": projectLevelCount["projectName"],
         "updatedAt": projectLevelCount["updatedAt"],
-        "Total": 0,
-        "NEW": {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0},
-        "IGNORED": {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0},
-        "DUPLICATE": {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0},
-        "MITIGATED": {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0},
-        "NEEDS_REVIEW": {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0},
-        "PATCHED": {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0},
-        "REMEDIATION_COMPLETE": {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0},
-        "REMEDIATION_REQUIRED": {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0},
-        "NOT_AFFECTED": {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0},
-        "AFFECTED": {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0},
-        "UNDER_INVESTIGATION": {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0},
-        "NONE": {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0},
+        **RemediationCounts().to_dict(),
         "SNIPPET": {"Total": 0, "unreviewed": 0, "reviewed": 0, "ignored": 0, "NONE": 0},
         "isDormant": False,
-        "policyViolations": {
-            "UNCATEGORIZED": {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0},
-            "COMPONENT": {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0},
-            "LICENSE": {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0},
-            "OPERATIONAL": {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0},
-            "SECURITY": {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0}
-        },
+        "policyViolations": PolicyCounts().to_dict(),
         "policyDetails": {},
         "projectVersionCount": 0,
         "projectVersionLevelCounts": []
@@ -360,58 +606,16 @@ def filterProjectDataByFilters(projectLevelCount, versionName=None, phaseCategor
     # Filter versions by name, phase, and distribution
     if "projectVersionLevelCounts" in projectLevelCount:
         for versionData in projectLevelCount["projectVersionLevelCounts"]:
-            # Check if version matches all filter criteria
-            matchesVersion = versionName is None or versionData.get("versionName") == versionName
-            matchesPhase = phaseCategories is None or versionData.get("phase", "").upper() in phaseCategories
-            matchesDistribution = distributionCategories is None or versionData.get("distribution", "").upper() in distributionCategories
-            
             # Only include version if it matches all specified filters
-            if matchesVersion and matchesPhase and matchesDistribution:
+            if versionQuery.matches(versionData):
                 filteredProjectCount["projectVersionLevelCounts"].append(versionData)
                 filteredProjectCount["projectVersionCount"] += 1
                 
-                # Aggregate vulnerability counts from this version
-                if "vulnerableComponentCountsByRemediationStatus" in versionData:
-                    vulnCounts = versionData["vulnerableComponentCountsByRemediationStatus"]
-                    remediationStatuses = ["NEW", "IGNORED", "DUPLICATE", "MITIGATED", "NEEDS_REVIEW", "PATCHED", 
-                                          "REMEDIATION_COMPLETE", "REMEDIATION_REQUIRED", "NOT_AFFECTED", 
-                                          "AFFECTED", "UNDER_INVESTIGATION", "NONE"]
-                    severities = ["MEDIUM", "HIGH", "CRITICAL", "LOW", "NONE"]
-                    
-                    for status in remediationStatuses:
-                        if status in vulnCounts:
-                            for severity in severities:
-                                if severity in vulnCounts[status]:
-                                    filteredProjectCount[status][severity] += vulnCounts[status][severity]
-                            if "Total" in vulnCounts[status]:
-                                filteredProjectCount[status]["Total"] += vulnCounts[status]["Total"]
-                    
-                    if "Total" in vulnCounts:
-                        filteredProjectCount["Total"] += vulnCounts["Total"]
-                
-                # Aggregate policy violations from this version
-                if "policyViolations" in versionData:
-                    policyCategories = ["UNCATEGORIZED", "COMPONENT", "LICENSE", "OPERATIONAL", "SECURITY"]
-                    policySeverities = ["BLOCKER", "CRITICAL", "MAJOR", "MINOR", "TRIVIAL", "UNSPECIFIED"]
-                    
-                    for category in policyCategories:
-                        if category in versionData["policyViolations"]:
-                            for severity in policySeverities:
-                                if severity in versionData["policyViolations"][category]:
-                                    filteredProjectCount["policyViolations"][category][severity] += versionData["policyViolations"][category][severity]
-                            if "Total" in versionData["policyViolations"][category]:
-                                filteredProjectCount["policyViolations"][category]["Total"] += versionData["policyViolations"][category]["Total"]
-                
-                # Aggregate snippets from this version
-                if "snippets" in versionData:
-                    filteredProjectCount["SNIPPET"]["unreviewed"] += versionData["snippets"]["unreviewed"]
-                    filteredProjectCount["SNIPPET"]["reviewed"] += versionData["snippets"]["reviewed"]
-                    filteredProjectCount["SNIPPET"]["ignored"] += versionData["snippets"]["ignored"]
-                    filteredProjectCount["SNIPPET"]["Total"] += versionData["snippets"]["Total"]
-                
                 # Set dormant flag
                 if versionData.get("isDormant", False):
                     filteredProjectCount["isDormant"] = True
+        # Sum the counts of the matching versions in one go
+        LevelTotals.from_versions(filteredProjectCount["projectVersionLevelCounts"]).write_to(filteredProjectCount)
     
     # Filter policy details to only include versions matching all filter criteria
     if "policyDetails" in projectLevelCount:
@@ -419,12 +623,7 @@ def filterProjectDataByFilters(projectLevelCount, versionName=None, phaseCategor
             for policyName, policyData in policies.items():
                 for projectId, projectInfo in policyData["projects"].items():
                     # Filter versions within this policy using same criteria as version filtering
-                    matchingVersions = [
-                        v for v in projectInfo["versions"] 
-                        if (versionName is None or v.get("versionName") == versionName) and
-                           (phaseCategories is None or v.get("phase", "").upper() in phaseCategories) and
-                           (distributionCategories is None or v.get("distribution", "").upper() in distributionCategories)
-                    ]
+                    matchingVersions = [v for v in projectInfo["versions"] if versionQuery.matches(v)]
                     if matchingVersions:
                         if category not in filteredProjectCount["policyDetails"]:
                             filteredProjectCount["policyDetails"][category] = {}
@@ -445,43 +644,97 @@ def filterProjectDataByFilters(projectLevelCount, versionName=None, phaseCategor
                             "projectID": projectId,
                             "versions": matchingVersions
                         }
-    
+    filteredProjectCount["latestScanDate"] = latestDate(version["lastScanDate"] for version in filteredProjectCount["projectVersionLevelCounts"])
     return filteredProjectCount
 
 
-def getProjectMetrics(hub, project, projectLevelCount, instanceLevelCount):
-    if args.project_version:
-        parameters={"filter":f'{createPhaseFilterForVersions()}',"filter":f'{createDistributionFilterForVersions()}', 'q':"versionName:{}".format(args.project_version)}
-        versions = get_project_versions(hub, project=project, limit=MAX_LIMIT, parameters=parameters)
-    else:
-        parameters={"filter":f'{createPhaseFilterForVersions()}',"filter":f'{createDistributionFilterForVersions()}'}
-        versions = get_project_versions(hub, project=project, limit=MAX_LIMIT, parameters=parameters)
+def getCheckpointSettings():
+    """Run settings that change the collected counts, a checkpoint is only resumed with the same settings"""
+    return {"url": args.url, "project": args.project, "project_group_name": args.project_group_name, "project_groups": args.project_groups,
+            "project_version": args.project_version, "phaseCategories": args.phaseCategories,
+            "distributionCategories": args.distributionCategories, "sinceDays": args.sinceDays}
+
+def getProjectMetrics(hub, project, projectLevelCount, lookupVersion=None):
+    """Collect the version level metrics of the given project into projectLevelCount.
+
+    Only project level data is touched, so this can run in a worker thread. The instance
+    level totals are merged from the result with addToTotals. Versions for which
+    lookupVersion returns a cached result are not fetched again.
+    Returns the (version, snippetCounts, policyViolations, vulnerableComponentCounts) results
+    of the versions that were fetched from Black Duck.
+    """
+    versions = get_project_versions(hub, project=project, limit=MAX_LIMIT, parameters=versionQuery.parameters())
+    fetchedVersions = []
     if versions and "totalCount" in versions and int(versions["totalCount"]) > 0:
-        instanceLevelCount["ProjectTotalVersionCount"] = instanceLevelCount["ProjectTotalVersionCount"] + int(versions["totalCount"])
-        projectLevelCount["projectVersionCount"] = versions["totalCount"]
-        projectVersionsCounts = []
+        # Fire all per-version requests first, the results are folded in version order
+        versionRequests = []
         for version in versions["items"]:
-            versionLevelCounts = {}
-            projectVersionId = version["_meta"]["href"].split("/")[-1]
-            versionLevelCounts["versionID"] = projectVersionId
-            versionLevelCounts["versionName"] = version["versionName"] if "versionName" in version else "-"
-            versionLevelCounts["lastScanDate"] = getDate(version, "lastScanDate")
-            versionLevelCounts["isDormant"] = False
-            if args.sinceDays and args.sinceDays > 0:
-                if "lastScanDate" in version:
-                    versionLevelCounts["isDormant"] = isDormant(version["lastScanDate"])
-                    if projectLevelCount["isDormant"] is False:
-                        #Set isDormant to project level only if not set True yet
-                        projectLevelCount["isDormant"] = versionLevelCounts["isDormant"]
+            cachedResult = lookupVersion(version) if lookupVersion else None
+            if cachedResult:
+                versionRequests.append((version, cachedResult, None))
+            else:
+                versionRequests.append((version, None,
+                                        (submitTask(requestExecutor, get_version_snippets, hub, version["_meta"]["href"]),
+                                         submitTask(requestExecutor, getPolicyViolations, hub=hub, projectversion=version),
+                                         submitTask(requestExecutor, get_version_vuln_component_counts, hub=hub, projectversion=version))))
+
+        def versionResults():
+            for version, cachedResult, requests in versionRequests:
+                if cachedResult:
+                    yield cachedResult
                 else:
-                    versionLevelCounts["isDormant"] = True
-                    if projectLevelCount["isDormant"] is False:
-                        #Set isDormant to project level only if not set True yet
-                        projectLevelCount["isDormant"] = versionLevelCounts["isDormant"]
-            versionLevelCounts["phase"] = version["phase"] if "phase" in version else "-"
-            versionLevelCounts["distribution"] = version["distribution"] if "distribution" in version else "-"
+                    result = (version,) + tuple(request.result() for request in requests)
+                    fetchedVersions.append(result)
+                    yield result
+        addProjectVersions(project, projectLevelCount, versions, versionResults())
+    return fetchedVersions
+
+def lookupCachedVersion(cachedVersions, version):
+    """Return the cached version result, if the version has not been rescanned or changed since it was cached"""
+    cachedVersion = cachedVersions.get(version["_meta"]["href"].split("/")[-1])
+    isFresh = cachedVersion is not None and cachedVersion["lastScanDate"] == version.get("lastScanDate") \
+        and cachedVersion["settingUpdatedAt"] == version.get("settingUpdatedAt")
+    if metrics:
+        metrics.record_cache("version", isFresh)
+    if isFresh:
+        return (version, cachedVersion["snippetCounts"], {"items": cachedVersion["policyViolations"]},
+                RemediationCounts.from_dict(cachedVersion["vulnerableComponentCounts"]))
+    return None
+
+def newVersionRecord(projectId, version, snippetCounts, policyViolations, vulnerableComponentCounts):
+    """Version cache record: the raw timestamps the record is valid for and the per-version Black Duck results"""
+    return {
+        "versionID": version["_meta"]["href"].split("/")[-1],
+        "projectID": projectId,
+        "lastScanDate": version.get("lastScanDate"),
+        "settingUpdatedAt": version.get("settingUpdatedAt"),
+        "snippetCounts": {key: snippetCounts[key] for key in ("snippetScanPresent", "unreviewedCount", "reviewedCount", "ignoredCount", "totalCount")
+                          if key in snippetCounts},
+        "policyViolations": [{key: policyViolation[key] for key in ("name", "category", "severity", "bomViolationCount") if key in policyViolation}
+                             for policyViolation in policyViolations.get("items", [])],
+        "vulnerableComponentCounts": vulnerableComponentCounts.to_dict()
+    }
+
+def addProjectVersions(project, projectLevelCount, versions, versionResults):
+    """Fold the snippet, policy rule and vulnerable component responses of each version into projectLevelCount.
+
+    versionResults yields (version, snippetCounts, policyViolations, vulnerableComponentCounts) tuples in version order,
+    where vulnerableComponentCounts are the RemediationCounts from get_version_vuln_component_counts.
+    """
+    if versions and "totalCount" in versions and int(versions["totalCount"]) > 0:
+        projectLevelCount["projectVersionCount"] = versions["totalCount"]
+        projectVersionsCounts = []
+        projectTotals = LevelTotals()
+        latestScan = None
+        for version, snippetCounts, projectPolicyViolations, vulnerableComponentCountsByRemediationStatus in versionResults:
+            # Timestamps are parsed and dormancy decided once per version
+            versionModel = Version(version, runClock)
+            versionLevelCounts = versionModel.to_dict()
+            if versionModel.lastScan and (latestScan is None or versionModel.lastScan > latestScan):
+                latestScan = versionModel.lastScan
+            if versionModel.isDormant:
+                projectLevelCount["isDormant"] = True
             #Check if project version has snippets scan present
-            snippetCounts = get_version_snippets(hub, version["_meta"]["href"])
             if "snippetScanPresent" in snippetCounts and snippetCounts["snippetScanPresent"]:
                 projectVersionSnippetCounts = {"unreviewed": snippetCounts["unreviewedCount"], 
                                             "reviewed": snippetCounts["reviewedCount"],
@@ -489,15 +742,8 @@ def getProjectMetrics(hub, project, projectLevelCount, instanceLevelCount):
                                             "Total": snippetCounts["totalCount"]}
                 versionLevelCounts["snippets"] = projectVersionSnippetCounts
                 #Project level snippet count
-                projectLevelCount["SNIPPET"]["unreviewed"] = projectLevelCount["SNIPPET"]["unreviewed"] + snippetCounts["unreviewedCount"]
-                projectLevelCount["SNIPPET"]["reviewed"] = projectLevelCount["SNIPPET"]["reviewed"] + snippetCounts["reviewedCount"]
-                projectLevelCount["SNIPPET"]["ignored"] = projectLevelCount["SNIPPET"]["ignored"] + snippetCounts["ignoredCount"]
-                projectLevelCount["SNIPPET"]["Total"] = projectLevelCount["SNIPPET"]["Total"] + snippetCounts["totalCount"]
-                #Instance level snippet count
-                instanceLevelCount["SNIPPET"]["unreviewed"] = instanceLevelCount["SNIPPET"]["unreviewed"] + snippetCounts["unreviewedCount"]
-                instanceLevelCount["SNIPPET"]["reviewed"] = instanceLevelCount["SNIPPET"]["reviewed"] + snippetCounts["reviewedCount"]
-                instanceLevelCount["SNIPPET"]["ignored"] = instanceLevelCount["SNIPPET"]["ignored"] + snippetCounts["ignoredCount"]
-                instanceLevelCount["SNIPPET"]["Total"] = instanceLevelCount["SNIPPET"]["Total"] + snippetCounts["totalCount"]
+                projectTotals.add_snippets(snippetCounts["unreviewedCount"], snippetCounts["reviewedCount"],
+                                           snippetCounts["ignoredCount"], snippetCounts["totalCount"])
             else:
                 projectVersionSnippetCounts = {"unreviewed": 0, 
                                             "reviewed": 0,
@@ -505,65 +751,18 @@ def getProjectMetrics(hub, project, projectLevelCount, instanceLevelCount):
                                             "Total": 0}
                 versionLevelCounts["snippets"] = projectVersionSnippetCounts
             # Get project policy violations
-            projectPolicyViolations = getPolicyViolations(hub=hub, projectversion=version)
-            versionLevelCountPolicy = {}
-            versionLevelCountPolicy["UNCATEGORIZED"] = {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0}
-            versionLevelCountPolicy["COMPONENT"] = {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0}
-            versionLevelCountPolicy["LICENSE"] = {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0}
-            versionLevelCountPolicy["OPERATIONAL"] = {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0}
-            versionLevelCountPolicy["SECURITY"] = {"Total": 0, "BLOCKER": 0, "CRITICAL": 0, "MAJOR": 0, "MINOR": 0, "TRIVIAL": 0, "UNSPECIFIED": 0}
+            versionLevelCountPolicy = PolicyCounts()
             for policyViolation in projectPolicyViolations.get("items", []):
                 category = policyViolation.get("category", "UNCATEGORIZED")
                 severity = policyViolation.get("severity", "UNSPECIFIED")
                 count = policyViolation.get("bomViolationCount", 0)
                 policyName = policyViolation.get("name", "Unnamed Policy")
                 
-                # By category and by severity on instance level
-                byCategory = instanceLevelCount["policyViolations"][category]
-                byCategory[severity] = byCategory[severity] + count
-                byCategory["Total"] = byCategory["Total"] + count
-                # By category and by severity on project level
-                byCategory = projectLevelCount["policyViolations"][category]
-                byCategory[severity] = byCategory[severity] + count
-                byCategory["Total"] = byCategory["Total"] + count
-                # By category and by severity on project version level
-                byCategory = versionLevelCountPolicy[category]
-                byCategory[severity] = byCategory[severity] + count
-                byCategory["Total"] = byCategory["Total"] + count
+                # By category and by severity on project version level, added to the project level below
+                versionLevelCountPolicy.count(category, severity, count)
                 
-                # Build hierarchical policy details structure at instance level: Category -> Policy Name -> Projects -> Versions
-                if category not in instanceLevelCount["policyDetails"]:
-                    instanceLevelCount["policyDetails"][category] = {}
-                if policyName not in instanceLevelCount["policyDetails"][category]:
-                    instanceLevelCount["policyDetails"][category][policyName] = {
-                        "severity": severity,
-                        "totalCount": 0,
-                        "projects": {}
-                    }
-                instanceLevelCount["policyDetails"][category][policyName]["totalCount"] += count
-                
-                # Add project to this policy's violations
                 projectId = projectLevelCount["projectID"]
-                if projectId not in instanceLevelCount["policyDetails"][category][policyName]["projects"]:
-                    instanceLevelCount["policyDetails"][category][policyName]["projects"][projectId] = {
-                        "projectName": projectLevelCount["projectName"],
-                        "projectID": projectId,
-                        "versions": []
-                    }
-                
-                # Add version details to instance level
-                instanceLevelCount["policyDetails"][category][policyName]["projects"][projectId]["versions"].append({
-                    "versionName": version["versionName"],
-                    "versionID": version["_meta"]["href"].split("/")[-1],
-                    "phase": version.get("phase", "UNKNOWN"),
-                    "distribution": version.get("distribution", "UNKNOWN"),
-                    "lastScanDate": getDate(version, "settingUpdatedAt"),
-                    "isDormant": versionLevelCounts["isDormant"],
-                    "violationCount": count,
-                    "severity": severity
-                })
-                
-                # Build hierarchical policy details structure at project level for caching
+                # Build hierarchical policy details structure at project level: Category -> Policy Name -> Projects -> Versions
                 if category not in projectLevelCount["policyDetails"]:
                     projectLevelCount["policyDetails"][category] = {}
                 if policyName not in projectLevelCount["policyDetails"][category]:
@@ -583,209 +782,253 @@ def getProjectMetrics(hub, project, projectLevelCount, instanceLevelCount):
                     }
                 
                 # Add version details to project level
-                projectLevelCount["policyDetails"][category][policyName]["projects"][projectId]["versions"].append({
-                    "versionName": version["versionName"],
-                    "versionID": version["_meta"]["href"].split("/")[-1],
-                    "phase": version.get("phase", "UNKNOWN"),
-                    "distribution": version.get("distribution", "UNKNOWN"),
-                    "lastScanDate": getDate(version, "settingUpdatedAt"),
-                    "isDormant": versionLevelCounts["isDormant"],
-                    "violationCount": count,
-                    "severity": severity
-                })
-            versionLevelCounts["policyViolations"] = versionLevelCountPolicy
-            vulnerableComponents = get_version_vuln_components(hub=hub, projectversion=version)
-            vulnerableComponentCountsByRemediationStatus = {"Total": 0}
-            vulnerableComponentCountsByRemediationStatus["NEW"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            vulnerableComponentCountsByRemediationStatus["IGNORED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            vulnerableComponentCountsByRemediationStatus["DUPLICATE"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            vulnerableComponentCountsByRemediationStatus["MITIGATED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            vulnerableComponentCountsByRemediationStatus["NEEDS_REVIEW"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            vulnerableComponentCountsByRemediationStatus["PATCHED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            vulnerableComponentCountsByRemediationStatus["REMEDIATION_COMPLETE"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            vulnerableComponentCountsByRemediationStatus["REMEDIATION_REQUIRED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            vulnerableComponentCountsByRemediationStatus["NOT_AFFECTED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            vulnerableComponentCountsByRemediationStatus["AFFECTED"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            vulnerableComponentCountsByRemediationStatus["UNDER_INVESTIGATION"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            vulnerableComponentCountsByRemediationStatus["NONE"] = {"Total": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0, "LOW": 0, "NONE": 0}
-            if vulnerableComponents and "totalCount" in vulnerableComponents and int(vulnerableComponents["totalCount"]) > 0:
-                for vulnerableComponent in vulnerableComponents["items"]:
-                    if "vulnerabilityWithRemediation" in vulnerableComponent:
-                        if not "remediationStatus" in vulnerableComponent["vulnerabilityWithRemediation"]:
-                            vulnerableComponent["vulnerabilityWithRemediation"]["remediationStatus"] = "NONE"
-                        if not "severity" in vulnerableComponent["vulnerabilityWithRemediation"]:
-                            vulnerableComponent["vulnerabilityWithRemediation"]["severity"] = "NONE"
-                        # By remediation status and by severity on project version level
-                        byRemediationStatus = vulnerableComponentCountsByRemediationStatus[vulnerableComponent["vulnerabilityWithRemediation"]["remediationStatus"]]
-                        byRemediationStatus["Total"] = byRemediationStatus["Total"] + 1
-                        byRemediationStatus[vulnerableComponent["vulnerabilityWithRemediation"]["severity"]] = byRemediationStatus[vulnerableComponent["vulnerabilityWithRemediation"]["severity"]] + 1
-                        vulnerableComponentCountsByRemediationStatus["Total"] = vulnerableComponentCountsByRemediationStatus["Total"] + 1
-                        # By remediation status and by severity on project level
-                        byRemediationStatus = projectLevelCount[vulnerableComponent["vulnerabilityWithRemediation"]["remediationStatus"]]
-                        byRemediationStatus["Total"] = byRemediationStatus["Total"] + 1
-                        byRemediationStatus[vulnerableComponent["vulnerabilityWithRemediation"]["severity"]] = byRemediationStatus[vulnerableComponent["vulnerabilityWithRemediation"]["severity"]] + 1
-                        projectLevelCount["Total"] = projectLevelCount["Total"] + 1
-                        # By remediation status and by severity on Black Duck instance level
-                        byRemediationStatus = instanceLevelCount[vulnerableComponent["vulnerabilityWithRemediation"]["remediationStatus"]]
-                        byRemediationStatus["Total"] = byRemediationStatus["Total"] + 1
-                        byRemediationStatus[vulnerableComponent["vulnerabilityWithRemediation"]["severity"]] = byRemediationStatus[vulnerableComponent["vulnerabilityWithRemediation"]["severity"]] + 1
-                        instanceLevelCount["Total"] = instanceLevelCount["Total"] + 1
-            else:
+                projectLevelCount["policyDetails"][category][policyName]["projects"][projectId]["versions"].append(
+                    PolicyHit(versionModel, count, severity).to_dict())
+            projectTotals.policyViolations.add(versionLevelCountPolicy)
+            versionLevelCounts["policyViolations"] = versionLevelCountPolicy.to_dict()
+            # By remediation status and by severity on project level
+            projectTotals.vulnerabilities.add(vulnerableComponentCountsByRemediationStatus)
+            if vulnerableComponentCountsByRemediationStatus.total() == 0:
                 if logging.getLogger().isEnabledFor(logging.DEBUG):
                     tqdm.write(f"Project {project['name']} version {version['versionName']} didn't have any vulnerable components.")
-            versionLevelCounts["vulnerableComponentCountsByRemediationStatus"] = vulnerableComponentCountsByRemediationStatus
+            versionLevelCounts["vulnerableComponentCountsByRemediationStatus"] = vulnerableComponentCountsByRemediationStatus.to_dict()
             projectVersionsCounts.append(versionLevelCounts)
         projectLevelCount["projectVersionLevelCounts"] = projectVersionsCounts
+        projectTotals.write_to(projectLevelCount)
+        projectLevelCount["latestScanDate"] = isoDay(latestScan)
 
 def getPolicyViolations(hub, projectversion):
     url = projectversion['_meta']['href'] + "/policy-rules"
-    headers = hub.get_headers()
-    headers['Accept'] = 'application/vnd.blackducksoftware.bill-of-materials-7+json'
-    response = requests.get(url, headers=headers, verify = not hub.config['insecure'])
+    response = hub.get(url, accept='application/vnd.blackducksoftware.bill-of-materials-7+json')
     jsondata = response.json()
     return jsondata
 
-def isDormant(scanninDate):
-    if scanninDate:
-        findingDatetime = datetime.strptime(scanninDate, "%Y-%m-%dT%H:%M:%S.%fZ")
-        comparedatetime = findingDatetime
-        return True if (datetime.now()-comparedatetime).days > args.sinceDays else False
-    else:
-        return False
-    
-def getDate(source, whichDate):
-    datetime_to_modify = None
-    if whichDate in source and source[whichDate]:
-       datetime_to_modify = datetime.strptime(source[whichDate], "%Y-%m-%dT%H:%M:%S.%fZ")
-    if datetime_to_modify:
-        return datetime.strftime(datetime_to_modify, "%B %d, %Y")
-    return "-"
-
-def computeLatestScanDates(totals):
-    """Compute the latest lastScanDate across all versions for each project and store it as latestScanDate."""
-    for project in totals.get("projects", []):
-        latestDate = None
-        for version in project.get("projectVersionLevelCounts", []):
-            scanDate = version.get("lastScanDate", "-")
-            if scanDate and scanDate != "-":
-                try:
-                    d = datetime.strptime(scanDate, "%B %d, %Y")
-                    if latestDate is None or d > latestDate:
-                        latestDate = d
-                except ValueError:
-                    pass
-        project["latestScanDate"] = latestDate.strftime("%B %d, %Y") if latestDate else "-"
-
-def addToTotals(projectCount, instanceLevelCount):
-    remediationstatuses = ["NEW","IGNORED","DUPLICATE","MITIGATED","NEEDS_REVIEW","PATCHED","REMEDIATION_COMPLETE","REMEDIATION_REQUIRED", "NOT_AFFECTED", "AFFECTED", "UNDER_INVESTIGATION", "NONE"]
-    severities = ["MEDIUM","HIGH","CRITICAL","LOW", "NONE", "Total"]
-    policySeverities = ["BLOCKER", "CRITICAL", "MAJOR", "MINOR", "TRIVIAL", "UNSPECIFIED", "Total"]
-    policyCategories = ["UNCATEGORIZED", "COMPONENT", "LICENSE", "OPERATIONAL", "SECURITY"]
-    
-    for remediation in remediationstatuses:
-        for severity in severities:
-            if remediation in projectCount and severity in projectCount[remediation]:
-                instanceLevelCount[remediation][severity] = instanceLevelCount[remediation][severity] + projectCount[remediation][severity]
-    instanceLevelCount["Total"] = instanceLevelCount["Total"] + projectCount["Total"]
+def withIsoScanDates(record):
+    """The project record with ISO scan dates. Records of earlier versions hold display dates and no latestScanDate."""
+    versions = record.get("projectVersionLevelCounts", [])
+    if "latestScanDate" not in record:
+        for version in versions:
+            version["lastScanDate"] = isoDate(version.get("lastScanDate"))
+        for policies in record.get("policyDetails", {}).values():
+            for policyData in policies.values():
+                for projectInfo in policyData["projects"].values():
+                    for hit in projectInfo["versions"]:
+                        hit["lastScanDate"] = isoDate(hit.get("lastScanDate"))
+        record["latestScanDate"] = latestDate(version["lastScanDate"] for version in versions)
+    return record
+
+def addToTotals(projectCount, instanceLevelCount, instanceTotals):
+    """Add the project counts to the instance totals, which are written into instanceLevelCount by instanceTotals.write_to"""
+    instanceTotals.add(LevelTotals.from_level(projectCount))
     if "projectVersionCount" in projectCount:
         instanceLevelCount["ProjectTotalVersionCount"] = instanceLevelCount["ProjectTotalVersionCount"] + projectCount["projectVersionCount"]
-    instanceLevelCount["SNIPPET"]["unreviewed"] = instanceLevelCount["SNIPPET"]["unreviewed"] + projectCount["SNIPPET"]["unreviewed"]
-    instanceLevelCount["SNIPPET"]["reviewed"] = instanceLevelCount["SNIPPET"]["reviewed"] + projectCount["SNIPPET"]["reviewed"]
-    instanceLevelCount["SNIPPET"]["ignored"] = instanceLevelCount["SNIPPET"]["ignored"] + projectCount["SNIPPET"]["ignored"]
-    instanceLevelCount["SNIPPET"]["Total"] = instanceLevelCount["SNIPPET"]["Total"] + projectCount["SNIPPET"]["Total"]
-    
-    # Aggregate policy violations from cached project data
-    if "policyViolations" in projectCount:
-        for category in policyCategories:
-            if category in projectCount["policyViolations"]:
-                for severity in policySeverities:
-                    if severity in projectCount["policyViolations"][category]:
-                        instanceLevelCount["policyViolations"][category][severity] += projectCount["policyViolations"][category][severity]
-    
-    # Aggregate policy details from cached project data
-    if "policyDetails" in projectCount:
-        for category, policies in projectCount["policyDetails"].items():
-            if category not in instanceLevelCount["policyDetails"]:
-                instanceLevelCount["policyDetails"][category] = {}
-            for policyName, policyData in policies.items():
-                if policyName not in instanceLevelCount["policyDetails"][category]:
-                    instanceLevelCount["policyDetails"][category][policyName] = {
-                        "severity": policyData["severity"],
-                        "totalCount": 0,
-                        "projects": {}
-                    }
-                instanceLevelCount["policyDetails"][category][policyName]["totalCount"] += policyData["totalCount"]
-                # Merge project data
-                for projectId, projectInfo in policyData["projects"].items():
-                    if projectId not in instanceLevelCount["policyDetails"][category][policyName]["projects"]:
-                        instanceLevelCount["policyDetails"][category][policyName]["projects"][projectId] = projectInfo
-                    else:
-                        # Append versions if project already exists
-                        instanceLevelCount["policyDetails"][category][policyName]["projects"][projectId]["versions"].extend(projectInfo["versions"])
-
-
-def createPhaseFilterForVersions():
-    phaseCategories = args.phaseCategories.split(',')
-    phaseCategoryOptions = ""
-    for phaseCategory in phaseCategories:
-        phaseCategoryOptions += f'phase:{phaseCategory.strip().upper()},'
-    return phaseCategoryOptions[:-1]
-
-def createDistributionFilterForVersions():
-    distributionCategories = args.distributionCategories.split(',')
-    distributionCategoryOptions = ""
-    for distributionCategory in distributionCategories:
-        distributionCategoryOptions += f'distribution:{distributionCategory.strip().upper()},'
-    return distributionCategoryOptions[:-1]
-
-def generate_pdf_with_playwright(html_file_path, output_path):
-    """Generate PDF using Playwright from HTML file for proper chart rendering"""
-    try:
-        with sync_playwright() as p:
-            # Launch browser with optimized settings
-            browser = p.chromium.launch(
-                headless=True,
-                args=['--disable-dev-shm-usage', '--no-sandbox']
-            )
-            context = browser.new_context()
-            page = context.new_page()
-            
-            # Set shorter timeout
-            page.set_default_timeout(15000)  # 15 seconds
-            
-            # Load HTML file with 'load' event instead of 'networkidle' for faster loading
-            page.goto(f'file:///{html_file_path.replace(chr(92), "/")}', wait_until='load', timeout=15000)
-            
-            # Wait for Chart.js to be loaded and charts to render (reduced wait time)
-            page.wait_for_function("typeof Chart !== 'undefined'", timeout=5000)
-            
-            # Wait for canvas elements (charts) with shorter timeout
-            try:
-                page.wait_for_selector('canvas', timeout=2000)
-                # Give charts minimal time to render
-                page.wait_for_timeout(500)
-            except:
-                # If no charts, just wait a bit
-                page.wait_for_timeout(1000)
-            
-            # Generate PDF with compression
-            page.pdf(
-                path=output_path, 
-                format='A4', 
-                print_background=True,
-                prefer_css_page_size=False,
-                margin={'top': '0.5cm', 'bottom': '0.5cm', 'left': '0.5cm', 'right': '0.5cm'}
+
+
+def openReportFile(file, compress=False):
+    """Text stream to the report file, gzip-compressed with compress"""
+    if compress:
+        return gzip.open(file, "wt", encoding="utf-8")
+    return open(file, "w", encoding="utf-8")
+
+def renderToFiles(template, files, **context):
+    """Render the template chunk by chunk into every (file, compress) of files, without building the document in memory.
+    A file can also be an open text stream, compress is ignored for it."""
+    with ExitStack() as stack:
+        streams = [file if hasattr(file, "write") else stack.enter_context(openReportFile(file, compress)) for file, compress in files]
+        templateStream = template.stream(**context)
+        templateStream.enable_buffering(STREAM_CHUNKS)
+        for chunk in templateStream:
+            for stream in streams:
+                stream.write(chunk)
+
+def writeJsonReport(totals, file):
+    """Serialise the totals to the file as they are encoded, identical to json.dumps(totals, indent=3)"""
+    chunks = []
+    with open(file, "w", encoding="utf8") as f:
+        for chunk in json.JSONEncoder(indent=3).iterencode(totals):
+            chunks.append(chunk)
+            if len(chunks) >= STREAM_CHUNKS:
+                f.write("".join(chunks))
+                chunks.clear()
+        f.write("".join(chunks))
+
+def reportFileTag(timestamp, projectGroup=None):
+    """Part of the report file names after the report kind: the timestamp, prefixed by the group name of a --project-groups report"""
+    if projectGroup is None:
+        return timestamp
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', projectGroup).strip('_') + '_' + timestamp
+
+def withPolicyDetails(totals):
+    """The totals with the instance level policy details and breakdown of the reports, derived from the policy hits
+    of the projects. They are placed where the JSON report has always had them."""
+    policyIndex = PolicyIndex(totals["projects"])
+    reportTotals = {}
+    for key, value in totals.items():
+        if key == "projects":
+            reportTotals["policyDetails"] = policyIndex.details()
+        reportTotals[key] = value
+    reportTotals["policyBreakdown"] = policyIndex.breakdown()
+    return reportTotals
+
+def writeReports(totals, fileTag, profiler, projectGroup=None):
+    """Write the reports selected by the arguments for the totals. The PDF is not printed here,
+    the (html, pdf path) of it is returned for printPdfs, which prints the PDFs of all reports together."""
+    timeFormat = '%Y-%m-%d %H:%M:%S'
+    outputPrefix = 'triageReport_bd_' + fileTag
+    pdfDocuments = []
+    totals = withPolicyDetails(totals)
+    if (args.dashboard):
+        # Generate interactive dashboard with Chart.js
+        tqdm.write("Creating interactive dashboard...")
+        dashboardTemplate = templateEnvironment(templatesDir).get_template('BD_Results_Triage_Dashboard.html')
+        dashboardFile = args.dir + '/dashboard_bd_' + fileTag + ('.html.gz' if args.compress else '.html')
+
+        with profiler.phase("render_dashboard"):
+            dashboard = dashboardView(totals)
+            renderToFiles(dashboardTemplate, [(dashboardFile, args.compress)],
+                bdURL = args.url,
+                reportTime = datetime.today().strftime(timeFormat),
+                data = totals,
+                dashboard = dashboard,
+                dashboardPayload = dashboardPayload(totals, dashboard["projectRows"]),
+                phases = args.phaseCategories,
+                distibutions = args.distributionCategories,
+                projectGroup = projectGroup,
+                project = args.project,
+                version = args.project_version,
+                sinceDays = args.sinceDays
             )
-            
-            browser.close()
-            return True
-    except Exception as e:
-        tqdm.write(f"Playwright error: {str(e)}")
-        return False
+        tqdm.write(f"Dashboard created: {dashboardFile}")
+    if (args.html or args.pdf):
+        # Setup template stuff
+        tqdm.write("Creating template for HTML and PDF reports....")
+        template = templateEnvironment(templatesDir).get_template(templateFile)
+        tqdm.write("Done")
+
+        # The report is rendered once, into the HTML report and into memory for the PDF
+        reportFiles = []
+        if args.html:
+            file = args.dir + '/' + outputPrefix + ('.html.gz' if args.compress else '.html')
+            reportFiles.append((file, args.compress))
+        if args.pdf:
+            pdfHtml = io.StringIO()
+            reportFiles.append((pdfHtml, False))
+
+        tqdm.write("Rendering the template for HTML and PDF reports....")
+        with profiler.phase("render_report"):
+            renderToFiles(template, reportFiles,
+                                    bdURL = args.url,
+                                    reportTime = datetime.today().strftime(timeFormat),
+                                    phases = args.phaseCategories,
+                                    distibutions = args.distributionCategories,
+                                    projectGroup = projectGroup,
+                                    project = args.project,
+                                    version = args.project_version,
+                                    sinceDays = args.sinceDays,
+                                    showEmpty = args.show_empty,
+                                    totals = totals,
+                                    report = reportView(totals, args.show_empty))
+        tqdm.write("Done")
+        if (args.pdf):
+            pdfDocuments.append((pdfHtml.getvalue(), args.dir + '/' + outputPrefix + '.pdf'))
+            pdfHtml.close()
+    if (args.json):
+        tqdm.write("Creating JSON report...")
+        with profiler.phase("json"):
+            writeJsonReport(jsonView(totals), args.dir + '/' + outputPrefix + '.json')
+        tqdm.write("Done")
+    if args.csv:
+        tqdm.write("Creating CSV fact tables...")
+        with profiler.phase("csv"):
+            writeFactTables(totals["projects"], args.dir + '/' + outputPrefix, csvFiles=True)
+        tqdm.write("Done")
+    if args.parquet:
+        tqdm.write("Creating Parquet fact tables...")
+        with profiler.phase("parquet"):
+            writeFactTables(totals["projects"], args.dir + '/' + outputPrefix, csvFiles=False, parquetFiles=True)
+        tqdm.write("Done")
+    return pdfDocuments
+
+def printPdfs(pdfDocuments):
+    """Print every (html, pdf path) of pdfDocuments, in parallel pages of one headless Chromium when Playwright is installed"""
+    tqdm.write("Creating PDF report...")
+    failed = pdfDocuments
+    if PLAYWRIGHT_AVAILABLE:
+        tqdm.write("Generating PDF with Playwright...")
+        try:
+            with PdfService() as pdfService:
+                futures = [(document, pdfService.submit(*document)) for document in pdfDocuments]
+                failed = []
+                for document, future in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        tqdm.write(f"Playwright error: {str(e)}")
+                        failed.append(document)
+        except Exception as e:
+            tqdm.write(f"Playwright error: {str(e)}")
+        if failed:
+            tqdm.write("Playwright PDF generation failed. Falling back to pdfkit...")
+    for html, pdfPath in failed:
+        pdfkit.from_string(html, pdfPath, options=PDFKIT_OPTIONS)
+    tqdm.write("Done (using pdfkit)" if failed else "Done (using Playwright)")
+
+def shardTotals(totals, projectIds):
+    """Totals of the given projects of the collected totals, re-aggregated like the collection aggregates them"""
+    projectIds = set(projectIds)
+    projects = [project for project in totals["projects"] if project["projectID"] in projectIds]
+    instanceLevelCount = newInstanceLevelCount(len(projects))
+    instanceTotals = LevelTotals()
+    for project in projects:
+        addToTotals(project, instanceLevelCount, instanceTotals)
+    instanceTotals.write_to(instanceLevelCount)
+    instanceLevelCount["projects"] = projects
+    return instanceLevelCount
+
+def initReportWorker(workerArgs):
+    """Initializer of the --report-workers processes, which get the arguments of the run"""
+    global args
+    args = workerArgs
+
+def writeShardReports(projectGroup, totals, timestamp, profiler=None):
+    """Write the reports of one --project-groups group, returns the PDF documents for printPdfs"""
+    if int(totals['Total']) == 0:
+        tqdm.write(f"No vulnerable components found in project group {projectGroup}!")
+        return []
+    return writeReports(totals, reportFileTag(timestamp, projectGroup), profiler or PhaseProfiler(), projectGroup)
+
+def writeShardedReports(totals, timestamp, profiler):
+    """Write the reports of every --project-groups group from the totals collected once for all of them.
+    With --report-workers > 1 the groups are rendered in a process pool."""
+    pdfDocuments = []
+    if args.report_workers > 1:
+        with ProcessPoolExecutor(max_workers=args.report_workers, initializer=initReportWorker, initargs=(args,)) as executor:
+            futures = [executor.submit(writeShardReports, projectGroup, shardTotals(totals, projectIds), timestamp)
+                       for projectGroup, projectIds in reportShards.items()]
+            for future in futures:
+                pdfDocuments.extend(future.result())
+    else:
+        for projectGroup, projectIds in reportShards.items():
+            pdfDocuments.extend(writeShardReports(projectGroup, shardTotals(totals, projectIds), timestamp, profiler))
+    return pdfDocuments
+
+def writeRunMetrics(totals, success, usedTime, collectionTime=None):
+    """Write the request, cache and run metrics to --metrics-file"""
+    metrics.set_run(success=success, duration_seconds=usedTime, timestamp_seconds=datetime.now().timestamp())
+    if collectionTime is not None:
+        metrics.set_run(collection_seconds=collectionTime)
+    if totals:
+        metrics.set_run(projects=totals["ProjectTotalCount"], versions=totals["ProjectTotalVersionCount"],
+                        vulnerable_components=totals["Total"])
+        if totals["ProjectTotalCount"] > 0:
+            metrics.set_run(seconds_per_project=usedTime / totals["ProjectTotalCount"])
+    metricsFile = os.path.join(args.dir, args.metrics_file)
+    metrics.write(metricsFile)
+    tqdm.write(f"Run metrics written to {metricsFile}")
 
 def main():
     """Main entry point for the Black Duck Remediation Metrics tool."""
-    global args, db
+    global args, db, checkpoint, metrics
     try:
         start = timer()
         #Initialize the parser
@@ -798,29 +1041,67 @@ def main():
         parser.add_argument('--token', default=os.environ.get('BD_TOKEN'), help="BD Access token", required=False)
         parser.add_argument('--project', help="BD project name", required=False)
         parser.add_argument('--project-group', dest='project_group_name', help="BD project group name", required=False)
+        parser.add_argument('--project-groups', dest='project_groups', help="comma separated list of BD project group names. The projects of all groups \
+            are collected once and a separate report is written for every group", required=False)
         parser.add_argument('--project-version', dest='project_version', help="BD project version name", required=False)
         parser.add_argument('--phaseCategories', help="Comma separated list of version phases, which will be selected. \
             Options are [PLANNING,DEVELOPMENT,RELEASED,DEPRECATED,ARCHIVED,PRERELEASE], default=\"PLANNING,DEVELOPMENT,RELEASED,DEPRECATED,ARCHIVED,PRERELEASE\"", default="PLANNING,DEVELOPMENT,RELEASED,DEPRECATED,ARCHIVED,PRERELEASE")
         parser.add_argument('--distributionCategories', help="Comma separated list of version distributions, which will be selected. \
             Options are [EXTERNAL,SAAS,INTERNAL,OPENSOURCE], default=\"EXTERNAL,SAAS,INTERNAL,OPENSOURCE\"", default="EXTERNAL,SAAS,INTERNAL,OPENSOURCE")
+        parser.add_argument('--filter-stats', dest='filter_stats', action='store_true', help='count how many project versions every version filter \
+            (--phaseCategories, --distributionCategories, --project-version) eliminated and print them at the end of the collection')
         parser.add_argument('--log_level', help="Will print more info... default=INFO", default="INFO")
         parser.add_argument('--html', action='store_true', help='generate HTML report')
         parser.add_argument('--pdf', action='store_true', help='generate PDF report')
         parser.add_argument('--json', action='store_true', help='generate json report')
-        parser.add_argument('--csv', action='store_true', help='generate csv report')
+        parser.add_argument('--csv', action='store_true', help='generate csv fact tables of the findings, policy hits and snippets')
+        parser.add_argument('--parquet', action='store_true', help='generate parquet fact tables of the findings, policy hits and snippets (needs pyarrow)')
         parser.add_argument('--dashboard', action='store_true', help='generate interactive dashboard HTML report with charts')
         parser.add_argument('--dir', default='.', help='output directory (default: current directory)')
-        parser.add_argument('--db_file', default='bd_remediation_db.json', help='TinyDB database file.')
+        parser.add_argument('--db_file', default='bd_remediation_db.json', help='TinyDB database file. With --cache-backend sqlite the .json suffix is replaced with .sqlite')
         parser.add_argument('--cache', action='store_true', help='use tinyDB as a cache')
         parser.add_argument('--cache_truncate', action='store_true', help='will clean the given cache file')
+        parser.add_argument('--incremental', action='store_true', help='with --cache, list only the projects updated since the previous \
+            --incremental run and serve all other projects from the cache')
+        parser.add_argument('--cache-backend', dest='cache_backend', choices=CACHE_BACKENDS, default="tinydb", help='cache storage: tinydb (JSON file) or sqlite (indexed, \
+            an existing TinyDB cache file is migrated on first use), default=tinydb')
+        parser.add_argument('--resume', action='store_true', help='continue an interrupted run: projects already collected into the checkpoint file are not collected again')
+        parser.add_argument('--checkpoint-file', dest='checkpoint_file', default='bd_remediation_checkpoint.jsonl', help='checkpoint journal of finished projects, \
+            removed when the run completes (default: bd_remediation_checkpoint.jsonl)')
         parser.add_argument('--sinceDays', type=int, default=30, help="The number of days before which to find project version dormant. (Default 30 days)", required=False)
         parser.add_argument('--show-empty', dest='show_empty', action='store_true', help='show projects and versions with zero counts in all report tables (by default rows with no findings are hidden)')
+        parser.add_argument('--workers', type=int, default=1, help='number of parallel workers used to collect projects and versions (default: 1, serial)')
+        parser.add_argument('--pool-size', dest='pool_size', type=int, help='size of the keep-alive connection pool to Black Duck (default: 10 or 2 x --workers, whichever is bigger)')
+        parser.add_argument('--async', dest='async_collector', action='store_true', help='collect with the asyncio backend (needs httpx) instead of worker threads')
+        parser.add_argument('--async-limits', dest='async_limits', help='concurrent requests per endpoint for --async, e.g. "vulnerable-bom-components=8,snippet-counts=64". \
+            Endpoints are versions, snippet-counts, policy-rules and vulnerable-bom-components')
+        parser.add_argument('--metrics-file', dest='metrics_file', help='write request and cache telemetry of the run to this JSON file \
+            and in Prometheus textfile format next to it (.prom), relative to --dir')
+        parser.add_argument('--profile', action='store_true', help='profile CPU (cProfile) and allocations (tracemalloc) of every phase of the run \
+            into a profile_<timestamp> directory in --dir. Use --workers 1 for a complete CPU profile of the collection')
+        parser.add_argument('--report-workers', dest='report_workers', type=int, default=1, help='number of processes rendering the reports \
+            of --project-groups in parallel (default: 1)')
         parser.add_argument('--compress', action='store_true', help='gzip-compress HTML and dashboard output files (.html.gz); browsers open these natively')
         args = parser.parse_args()
+        if args.workers < 1:
+            parser.error("--workers must be at least 1")
+        if args.report_workers < 1:
+            parser.error("--report-workers must be at least 1")
+        if args.project_groups and (args.project_group_name or args.project):
+            parser.error("--project-groups cannot be used with --project-group or --project")
+        if args.incremental and not args.cache:
+            parser.error("--incremental needs --cache")
+        if args.incremental and (args.project_groups or args.project_group_name or args.project):
+            parser.error("--incremental lists all projects, it cannot be used with --project, --project-group or --project-groups")
+        if args.parquet and not PYARROW_AVAILABLE:
+            parser.error("--parquet needs pyarrow. Install with: pip install pyarrow")
+        try:
+            parseEndpointLimits(args.async_limits)
+        except ValueError as e:
+            parser.error(f"--async-limits: {e}")
         #Initializing the logger
         logging.getLogger("requests").setLevel(logging.WARNING)
         logging.getLogger("urllib3").setLevel(logging.WARNING)
-        logging.getLogger("blackduck.HubRestApi").setLevel(logging.WARNING)
         logging.basicConfig(format='%(asctime)s:%(levelname)s:%(module)s: %(message)s', stream=sys.stderr, level=args.log_level)
         #Printing out the version number
         tqdm.write("Black Duck Triage Extractor version: " + __version__)
@@ -834,140 +1115,47 @@ def main():
         args.url = f'{args.url if not args.url.endswith("/") else args.url[:-1]}'
         #DB Initialization
         db_file = args.dir + '/' + args.db_file
-        path = Path(db_file)
-        db = TinyDB(path, access_mode="r+", sort_keys=True, indent=3, separators=(',', ': '))
-        db.default_table_name = "projects"
-        if args.cache_truncate:
-            db.truncate()
-        totals = addFindings()
+        db = openCacheStore(args.cache_backend, db_file, truncate=args.cache_truncate)
+        checkpoint = CheckpointJournal(args.dir + '/' + args.checkpoint_file, getCheckpointSettings(), resume=args.resume)
+        metrics = RunMetrics() if args.metrics_file else None
+        profiler = PhaseProfiler(args.dir + '/profile_' + datetime.today().strftime('%Y%m%d%H%M%S') if args.profile else None)
+        collectionStart = timer()
+        with profiler.phase("collection"):
+            totals = addFindings()
+        collectionTime = timer() - collectionStart
         db.close()
         if totals:
-            computeLatestScanDates(totals)
-            if int(totals['Total']) > 0:
-                timeFilenameFormat = '%Y%m%d%H%M%S'
-                timeFormat = '%Y-%m-%d %H:%M:%S'
-                polarisTimeFormat = '%Y-%m-%dT%H:%M:%S.%fZ'
-                timestamp = datetime.today().strftime(timeFilenameFormat)
-                outputPrefix = 'triageReport_bd_' + timestamp
-                if (args.dashboard):
-                    # Generate interactive dashboard with Chart.js
-                    tqdm.write("Creating interactive dashboard...")
-                    templateLoader = jinja2.FileSystemLoader(searchpath=templatesDir)
-                    templateEnv = jinja2.Environment(loader=templateLoader, autoescape=True)
-                    dashboardTemplate = templateEnv.get_template('BD_Results_Triage_Dashboard.html')
-                    
-                    dashboardHtml = dashboardTemplate.render(
-                        bdURL = args.url,
-                        reportTime = datetime.today().strftime(timeFormat),
-                        data = totals,
-                        dataJson = json.dumps(totals),
-                        phases = args.phaseCategories,
-                        distibutions = args.distributionCategories,
-                        projectGroup = args.project_group_name,
-                        project = args.project,
-                        version = args.project_version,
-                        sinceDays = args.sinceDays
-                    )
-                    
-                    dashboardFile = args.dir + '/dashboard_bd_' + timestamp + ('.html.gz' if args.compress else '.html')
-                    if args.compress:
-                        with gzip.open(dashboardFile, 'wb') as fh:
-                            fh.write(dashboardHtml.encode('utf-8'))
-                    else:
-                        with open(dashboardFile, "w", encoding='utf-8') as fh:
-                            fh.write(dashboardHtml)
-                    tqdm.write(f"Dashboard created: {dashboardFile}")
-                if (args.html or args.pdf):
-                    # Setup template stuff
-                    tqdm.write("Creating template for HTML and PDF reports....")
-                    templateLoader = jinja2.FileSystemLoader(searchpath=templatesDir)
-                    templateEnv = jinja2.Environment(loader=templateLoader, autoescape=True)
-                    template = templateEnv.get_template(templateFile)
-                    tqdm.write("Done")
-
-                    tqdm.write("Rendering the template for HTML and PDF reports....")
-                    htmlText = template.render(bdURL = args.url,
-                                            reportTime = datetime.today().strftime(timeFormat),
-                                            phases = args.phaseCategories,
-                                            distibutions = args.distributionCategories,
-                                            projectGroup = args.project_group_name,
-                                            project = args.project,
-                                            version = args.project_version,
-                                            sinceDays = args.sinceDays,
-                                            showEmpty = args.show_empty,
-                                            totals = totals)
-                    tqdm.write("Done")
-
-                    if (args.html):
-                        tqdm.write("Creating HTML report...")
-                        file = args.dir + '/' + outputPrefix + ('.html.gz' if args.compress else '.html')
-                        if args.compress:
-                            with gzip.open(file, 'wb') as fh:
-                                fh.write(htmlText.encode('utf-8'))
-                        else:
-                            with open(file, "w", encoding='utf-8') as fh:
-                                fh.write(htmlText)
-                        tqdm.write("Done")
-                    
-                    if (args.pdf):
-                        tqdm.write("Creating PDF report...")
-                        pdf_path = args.dir + '/' + outputPrefix + '.pdf'
-                        
-                        # Always create HTML file first for PDF generation
-                        html_path = args.dir + '/' + outputPrefix + '_temp.html'
-                        if args.html:
-                            # Use the already created HTML file
-                            html_path = args.dir + '/' + outputPrefix + '.html'
-                        else:
-                            # Create temporary HTML file
-                            with open(html_path, "w", encoding='utf-8') as fh:
-                                fh.write(htmlText)
-                        
-                        if PLAYWRIGHT_AVAILABLE:
-                            tqdm.write("Generating PDF with Playwright...")
-                            success = generate_pdf_with_playwright(html_path, pdf_path)
-                            if success:
-                                tqdm.write("Done (using Playwright for chart rendering)")
-                            else:
-                                tqdm.write("Playwright PDF generation failed. Falling back to pdfkit...")
-                                options = {'enable-local-file-access': None}
-                                pdfkit.from_string(htmlText, pdf_path, options=options)
-                                tqdm.write("Done (using pdfkit - charts may not render)")
-                        else:
-                            tqdm.write("Warning: Playwright not installed. Charts will not render in PDF.")
-                            tqdm.write("Install with: pip install playwright && playwright install chromium")
-                            options = {'enable-local-file-access': None}
-                            pdfkit.from_string(htmlText, pdf_path, options=options)
-                            tqdm.write("Done (using pdfkit - charts not rendered)")
-                        
-                        # Clean up temp HTML file if it was created
-                        if not args.html and os.path.exists(html_path):
-                            try:
-                                os.remove(html_path)
-                            except:
-                                pass
-                if (args.json):
-                    tqdm.write("Creating JSON report...")
-                    file = args.dir + '/' + outputPrefix + '.json'
-                    f = open(file, "w", encoding="utf8")
-                    f.write(json.dumps(totals, indent=3))
-                    f.close()
-                    tqdm.write("Done")
-                if args.csv:
-                    tqdm.write("Creating CVS report...")
-                    df = pd.json_normalize(totals)
-                    df.to_csv(args.dir + '/' + outputPrefix + '.csv', index=False, encoding='utf-8')
+            timestamp = datetime.today().strftime('%Y%m%d%H%M%S')
+            pdfDocuments = []
+            if reportShards is not None:
+                pdfDocuments = writeShardedReports(totals, timestamp, profiler)
+            elif int(totals['Total']) > 0:
+                pdfDocuments = writeReports(totals, reportFileTag(timestamp), profiler, args.project_group_name)
             else:
                 tqdm.write("No vulnerable components found!")
+            if pdfDocuments:
+                with profiler.phase("pdf"):
+                    printPdfs(pdfDocuments)
         end = timer()
         usedTime = end - start
         tqdm.write(f"Took: {usedTime} seconds.")
         if totals and totals['ProjectTotalCount'] > 0:
             tqdm.write(f'average time per project: {usedTime/totals["ProjectTotalCount"]} seconds.')
+        if metrics:
+            writeRunMetrics(totals, True, usedTime, collectionTime)
+        if profiler.phases:
+            profiler.close()
+            tqdm.write(f"Profiles written to {profiler.outputDir}\n{profiler.summary()}")
+        # The run is complete, the next one starts from scratch
+        checkpoint.close(remove=True)
         tqdm.write("Done")
     except Exception as e:
         if db:
             db.close()
+        if checkpoint:
+            checkpoint.close()
+        if metrics:
+            writeRunMetrics(None, False, timer() - start)
         tqdm.write(f"Exception occurred: {e}")
         raise SystemError(e)
 
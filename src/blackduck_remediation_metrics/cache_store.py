@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+'''
+Cache backends for the --cache option of blackduck_triage_extract.
+
+The cache holds one record per project (the collected project level counts) and one
+record per project version (see newVersionRecord in blackduck_triage_extract). Run state
+that is not a project, like the project listing of --incremental, is kept as metadata
+records by key. The aggregated results of a run are kept by the signature of its version
+filters, together with a digest of the inputs they were aggregated from; a later run with
+the same filters and inputs takes them as they are.
+Two backends are available, selected with --cache-backend:
+
+tinydb - The original TinyDB JSON document store. Records are located through
+         in-memory indexes built once at open, and writes are batched in memory
+         and flushed to the JSON file on close. Project records of cache files that
+         have them in the default table of TinyDB are moved to the projects table.
+sqlite - SQLite database in WAL mode with primary keys on projectID and versionID,
+         an index on the projectID of versions and writes batched into transactions.
+         An existing TinyDB cache file is migrated on first use.
+'''
+import copy
+import json
+import logging
+import os
+import sqlite3
+
+from tinydb import TinyDB, Query
+from tinydb.middlewares import CachingMiddleware
+from tinydb.storages import JSONStorage
+
+CACHE_BACKENDS = ["tinydb", "sqlite"]
+# TinyDB table that project records were written to when no table was given
+LEGACY_TABLE = "_default"
+
+
+def openCacheStore(backend, path, truncate=False):
+    """Open the cache store of the given backend. For sqlite a TinyDB file with the same name and .json suffix is migrated."""
+    if backend == "sqlite":
+        root, extension = os.path.splitext(path)
+        if extension == ".json":
+            return SQLiteCacheStore(root + ".sqlite", truncate=truncate, migrateFrom=path)
+        return SQLiteCacheStore(path, truncate=truncate)
+    return TinyDBCacheStore(path, truncate=truncate)
+
+
+class TinyDBCacheStore:
+    """Cache store on top of TinyDB with in-memory projectID and versionID indexes"""
+
+    def __init__(self, path, truncate=False):
+        self.db = TinyDB(path, storage=CachingMiddleware(JSONStorage), access_mode="r+", sort_keys=True, indent=3, separators=(',', ': '))
+        self.db.default_table_name = "projects"
+        if truncate:
+            self.db.drop_tables()
+        self.projects = self.db.table("projects")
+        self.versions = self.db.table("versions")
+        self.meta = self.db.table("meta")
+        self.results = self.db.table("results")
+        if LEGACY_TABLE in self.db.tables():
+            self._moveLegacyProjects()
+        # One scan at open instead of a Query scan for every lookup. Records are copied in and out,
+        # because the CachingMiddleware keeps the documents in memory until they are flushed.
+        self.projectIndex = {document["projectID"]: document.doc_id for document in self.projects.all()}
+        self.versionIndex = {}
+        self.projectVersionIndex = {}
+        for document in self.versions.all():
+            self.versionIndex[document["versionID"]] = document.doc_id
+            self.projectVersionIndex.setdefault(document["projectID"], []).append(document.doc_id)
+
+    def _moveLegacyProjects(self):
+        """Move the project records of the default table to the projects table, records already there are kept"""
+        cached = {document["projectID"] for document in self.projects.all()}
+        legacy = self.db.table(LEGACY_TABLE)
+        self.projects.insert_multiple(dict(record) for record in legacy.all() if "projectID" in record and record["projectID"] not in cached)
+        self.db.drop_table(LEGACY_TABLE)
+
+    def get_project(self, projectId):
+        docId = self.projectIndex.get(projectId)
+        return copy.deepcopy(self.projects.get(doc_id=docId)) if docId is not None else None
+
+    def put_project(self, record):
+        record = copy.deepcopy(record)
+        docId = self.projectIndex.get(record["projectID"])
+        if docId is None:
+            self.projectIndex[record["projectID"]] = self.projects.insert(record)
+        else:
+            self.projects.update(record, doc_ids=[docId])
+
+    def all_projects(self):
+        return copy.deepcopy(self.projects.all())
+
+    def get_versions(self, projectId):
+        return [copy.deepcopy(self.versions.get(doc_id=docId)) for docId in self.projectVersionIndex.get(projectId, [])]
+
+    def put_version(self, record):
+        record = copy.deepcopy(record)
+        docId = self.versionIndex.get(record["versionID"])
+        if docId is None:
+            docId = self.versions.insert(record)
+            self.versionIndex[record["versionID"]] = docId
+            self.projectVersionIndex.setdefault(record["projectID"], []).append(docId)
+        else:
+            self.versions.update(record, doc_ids=[docId])
+
+    def get_meta(self, key):
+        documents = self.meta.search(Query().key == key)
+        return copy.deepcopy(documents[0]["value"]) if documents else None
+
+    def put_meta(self, key, value):
+        self.meta.upsert({"key": key, "value": copy.deepcopy(value)}, Query().key == key)
+
+    def get_result(self, signature, inputs):
+        """Results stored for the filter signature, None unless they were aggregated from the same inputs"""
+        documents = self.results.search((Query().signature == signature) & (Query().inputs == inputs))
+        return copy.deepcopy(documents[0]["totals"]) if documents else None
+
+    def put_result(self, signature, inputs, totals):
+        self.results.upsert({"signature": signature, "inputs": inputs, "totals": copy.deepcopy(totals)}, Query().signature == signature)
+
+    def close(self):
+        if self.db:
+            self.db.close()
+            self.db = None
+
+
+class SQLiteCacheStore:
+    """Cache store on SQLite with indexed lookups and batched transactions"""
+
+    # Commit after this many writes, the rest is committed on close
+    BATCH_SIZE = 500
+
+    def __init__(self, path, truncate=False, migrateFrom=None):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        if truncate:
+            self.connection.executescript("DROP TABLE IF EXISTS projects; DROP TABLE IF EXISTS versions; DROP TABLE IF EXISTS meta; DROP TABLE IF EXISTS results;")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS projects (projectID TEXT PRIMARY KEY, updatedAt TEXT, data TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS versions (versionID TEXT PRIMARY KEY, projectID TEXT NOT NULL, data TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS versions_projectID ON versions (projectID);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, data TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS results (signature TEXT PRIMARY KEY, inputs TEXT NOT NULL, data TEXT NOT NULL);
+        """)
+        self.pendingWrites = 0
+        # Migrated until the database has projects, so a migration that found none is tried again
+        if not truncate and migrateFrom and os.path.exists(migrateFrom) \
+                and self.connection.execute("SELECT 1 FROM projects LIMIT 1").fetchone() is None:
+            self.migrate(migrateFrom)
+
+    def migrate(self, tinyDBPath):
+        """One-shot import of an existing TinyDB cache file"""
+        logging.info(f"Migrating TinyDB cache {tinyDBPath} to SQLite")
+        source = TinyDB(tinyDBPath, access_mode="r")
+        # Records of the projects table replace records of the same project in the default table
+        projects = [record for record in source.table(LEGACY_TABLE) if "projectID" in record] + source.table("projects").all()
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO projects VALUES (?, ?, ?)",
+                                        ((record["projectID"], record.get("updatedAt"), json.dumps(record)) for record in projects))
+            self.connection.executemany("INSERT OR REPLACE INTO versions VALUES (?, ?, ?)",
+                                        ((record["versionID"], record["projectID"], json.dumps(record)) for record in source.table("versions")))
+        source.close()
+
+    def _written(self):
+        self.pendingWrites += 1
+        if self.pendingWrites >= self.BATCH_SIZE:
+            self.connection.commit()
+            self.pendingWrites = 0
+
+    def get_project(self, projectId):
+        row = self.connection.execute("SELECT data FROM projects WHERE projectID = ?", (projectId,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_project(self, record):
+        self.connection.execute("INSERT OR REPLACE INTO projects VALUES (?, ?, ?)",
+                                (record["projectID"], record.get("updatedAt"), json.dumps(record)))
+        self._written()
+
+    def all_projects(self):
+        return [json.loads(row[0]) for row in self.connection.execute("SELECT data FROM projects")]
+
+    def get_versions(self, projectId):
+        return [json.loads(row[0]) for row in self.connection.execute("SELECT data FROM versions WHERE projectID = ?", (projectId,))]
+
+    def put_version(self, record):
+        self.connection.execute("INSERT OR REPLACE INTO versions VALUES (?, ?, ?)",
+                                (record["versionID"], record["projectID"], json.dumps(record)))
+        self._written()
+
+    def get_meta(self, key):
+        row = self.connection.execute("SELECT data FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_meta(self, key, value):
+        self.connection.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value)))
+        self._written()
+
+    def get_result(self, signature, inputs):
+        row = self.connection.execute("SELECT data FROM results WHERE signature = ? AND inputs = ?", (signature, inputs)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_result(self, signature, inputs, totals):
+        self.connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (signature, inputs, json.dumps(totals)))
+        self._written()
+
+    def close(self):
+        if self.connection:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
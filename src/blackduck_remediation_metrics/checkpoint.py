@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+'''
+Checkpoint journal for blackduck_triage_extract (--resume).
+
+Every finished project is appended as one JSON line and flushed to disk right away,
+so a run that dies half way keeps everything collected so far. The first line holds
+the run settings that affect the collected counts; a journal written with other
+settings is not resumed. The journal is removed when the run completes.
+'''
+import json
+import logging
+import os
+
+
+class CheckpointJournal:
+    """Append-only JSON Lines journal of the project level counts of finished projects"""
+
+    def __init__(self, path, settings, resume=False):
+        self.path = path
+        self.completed = {}
+        if resume and os.path.exists(path):
+            self.completed = self.load(path, settings)
+        # A fresh journal starts with the settings line, a resumed one is appended to
+        self.journal = open(path, "a" if self.completed else "w", encoding="utf8")
+        if not self.completed:
+            self._append({"settings": settings})
+        elif self.journal.tell() > 0:
+            # Terminate a line that was cut short, so the next record starts on its own line
+            with open(path, "rb") as journal:
+                journal.seek(-1, os.SEEK_END)
+                if journal.read(1) != b"\n":
+                    self.journal.write("\n")
+
+    @staticmethod
+    def load(path, settings):
+        """Read the finished projects from an earlier journal written with the same settings"""
+        completed = {}
+        with open(path, encoding="utf8") as journal:
+            lines = journal.read().splitlines()
+        try:
+            journalSettings = json.loads(lines[0]).get("settings") if lines else None
+        except ValueError:
+            journalSettings = None
+        if journalSettings != settings:
+            logging.warning(f"Checkpoint {path} was written with other settings, collecting all projects again")
+            return completed
+        for line in lines[1:]:
+            try:
+                projectLevelCount = json.loads(line)
+            except ValueError:
+                # The last line is cut short when the run died while writing it
+                logging.debug(f"Ignoring incomplete checkpoint line in {path}")
+                continue
+            completed[projectLevelCount["projectID"]] = projectLevelCount
+        logging.info(f"Resuming from {path}, {len(completed)} projects already collected")
+        return completed
+
+    def get(self, projectId, updatedAt):
+        """Return the checkpointed project level counts, if the project has not changed since"""
+        projectLevelCount = self.completed.get(projectId)
+        if projectLevelCount and projectLevelCount["updatedAt"] == updatedAt:
+            return projectLevelCount
+
+    def add(self, projectLevelCount):
+        """Journal a finished project, unless it was resumed unchanged from this journal"""
+        resumed = self.completed.get(projectLevelCount["projectID"])
+        if not resumed or resumed["updatedAt"] != projectLevelCount["updatedAt"]:
+            self._append(projectLevelCount)
+
+    def _append(self, record):
+        self.journal.write(json.dumps(record) + "\n")
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+
+    def close(self, remove=False):
+        if not self.journal.closed:
+            self.journal.close()
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+'''
+Fixed-shape count matrices for the vulnerability, policy violation and snippet counts.
+
+Counts are kept in NumPy int64 matrices indexed by remediation status x severity and
+policy category x severity while collecting, so merging versions into projects and
+projects into the instance totals are single vectorised adds. They are turned into the
+nested {"Total": n, "MEDIUM": n, ...} dicts of the JSON, cache and report output only
+when a project or the instance totals are written out.
+'''
+import numpy as np
+
+REMEDIATION_STATUSES = ["NEW", "IGNORED", "DUPLICATE", "MITIGATED", "NEEDS_REVIEW", "PATCHED", "REMEDIATION_COMPLETE",
+                        "REMEDIATION_REQUIRED", "NOT_AFFECTED", "AFFECTED", "UNDER_INVESTIGATION", "NONE"]
+SEVERITIES = ["MEDIUM", "HIGH", "CRITICAL", "LOW", "NONE"]
+POLICY_CATEGORIES = ["UNCATEGORIZED", "COMPONENT", "LICENSE", "OPERATIONAL", "SECURITY"]
+POLICY_SEVERITIES = ["BLOCKER", "CRITICAL", "MAJOR", "MINOR", "TRIVIAL", "UNSPECIFIED"]
+# Keys of the SNIPPET counts on project and instance level
+SNIPPET_COUNTS = ["Total", "unreviewed", "reviewed", "ignored", "NONE"]
+
+
+class CountMatrix:
+    """Counts by row and column label in an int64 matrix, column 0 holds the row totals"""
+    ROWS = []
+    COLUMNS = []
+    __slots__ = ("values",)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.KEYS = ["Total"] + cls.COLUMNS
+        cls.ROW_INDEX = {row: index for index, row in enumerate(cls.ROWS)}
+        cls.COLUMN_INDEX = {column: index for index, column in enumerate(cls.KEYS)}
+
+    def __init__(self, values=None):
+        self.values = values if values is not None else np.zeros((len(self.ROWS), len(self.KEYS)), dtype=np.int64)
+
+    @classmethod
+    def _rowsOf(cls, counts):
+        empty = {}
+        return [[byRow.get(key, 0) for key in cls.KEYS] for byRow in (counts.get(row, empty) for row in cls.ROWS)]
+
+    @classmethod
+    def from_dict(cls, counts):
+        """Counts from the {row: {"Total": n, column: n}} shape, missing rows and columns count as 0"""
+        return cls(np.array(cls._rowsOf(counts), dtype=np.int64))
+
+    @classmethod
+    def stack(cls, countsList):
+        """Many counts in the dict shape as one (count, row, column) array"""
+        rows = [cls._rowsOf(counts) for counts in countsList]
+        if not rows:
+            return np.zeros((0, len(cls.ROWS), len(cls.KEYS)), dtype=np.int64)
+        return np.array(rows, dtype=np.int64)
+
+    @classmethod
+    def sum(cls, countsList):
+        """Sum of many counts in the dict shape with one vectorised reduction"""
+        return cls(cls.stack(countsList).sum(axis=0))
+
+    def add(self, other):
+        self.values += other.values
+        return self
+
+    def count(self, row, column, count=1):
+        rowIndex = self.ROW_INDEX[row]
+        self.values[rowIndex, self.COLUMN_INDEX[column]] += count
+        self.values[rowIndex, 0] += count
+
+    def count_labels(self, rows, columns):
+        """Count one occurrence for every (row, column) label pair with a single bincount"""
+        if rows:
+            width = len(self.KEYS)
+            cells = [self.ROW_INDEX[row] * width + self.COLUMN_INDEX[column] for row, column in zip(rows, columns)]
+            counts = np.bincount(cells, minlength=self.values.size).reshape(self.values.shape)
+            counts[:, 0] = counts.sum(axis=1)
+            self.values += counts
+
+    def total(self):
+        return int(self.values[:, 0].sum())
+
+    def to_dict(self):
+        return {row: dict(zip(self.KEYS, values)) for row, values in zip(self.ROWS, self.values.tolist())}
+
+
+class RemediationCounts(CountMatrix):
+    """Vulnerable component counts by remediation status and severity"""
+    ROWS = REMEDIATION_STATUSES
+    COLUMNS = SEVERITIES
+    __slots__ = ()
+
+    def to_dict(self):
+        counts = {"Total": self.total()}
+        counts.update(super().to_dict())
+        return counts
+
+
+class PolicyCounts(CountMatrix):
+    """Policy violation counts by policy category and severity"""
+    ROWS = POLICY_CATEGORIES
+    COLUMNS = POLICY_SEVERITIES
+    __slots__ = ()
+
+
+class LevelTotals:
+    """Vulnerability, policy violation and snippet totals of a project or of the whole instance"""
+    __slots__ = ("vulnerabilities", "policyViolations", "snippets")
+
+    def __init__(self):
+        self.vulnerabilities = RemediationCounts()
+        self.policyViolations = PolicyCounts()
+        self.snippets = np.zeros(len(SNIPPET_COUNTS), dtype=np.int64)
+
+    @classmethod
+    def from_level(cls, levelCount):
+        """Totals from project level counts"""
+        totals = cls()
+        totals.vulnerabilities = RemediationCounts.from_dict(levelCount)
+        totals.policyViolations = PolicyCounts.from_dict(levelCount.get("policyViolations", {}))
+        totals.snippets = np.array([levelCount["SNIPPET"].get(key, 0) for key in SNIPPET_COUNTS], dtype=np.int64)
+        return totals
+
+    @classmethod
+    def from_versions(cls, versionLevelCounts):
+        """Totals of the given version level counts, summed with one reduction per matrix"""
+        totals = cls()
+        totals.vulnerabilities = RemediationCounts.sum(versionData["vulnerableComponentCountsByRemediationStatus"]
+                                                       for versionData in versionLevelCounts
+                                                       if "vulnerableComponentCountsByRemediationStatus" in versionData)
+        totals.policyViolations = PolicyCounts.sum(versionData["policyViolations"] for versionData in versionLevelCounts
+                                                   if "policyViolations" in versionData)
+        snippets = [[versionData["snippets"]["Total"], versionData["snippets"]["unreviewed"], versionData["snippets"]["reviewed"],
+                     versionData["snippets"]["ignored"], 0] for versionData in versionLevelCounts if "snippets" in versionData]
+        if snippets:
+            totals.snippets = np.array(snippets, dtype=np.int64).sum(axis=0)
+        return totals
+
+    def add(self, other):
+        self.vulnerabilities.add(other.vulnerabilities)
+        self.policyViolations.add(other.policyViolations)
+        self.snippets += other.snippets
+        return self
+
+    def add_snippets(self, unreviewed, reviewed, ignored, total):
+        self.snippets += np.array([total, unreviewed, reviewed, ignored, 0], dtype=np.int64)
+
+    def write_to(self, levelCount):
+        """Write the totals into the project or instance level dict. Existing keys keep their position."""
+        levelCount.update(self.vulnerabilities.to_dict())
+        levelCount["SNIPPET"] = dict(zip(SNIPPET_COUNTS, self.snippets.tolist()))
+        levelCount["policyViolations"] = self.policyViolations.to_dict()
+        return levelCount
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+'''
+Tidy fact tables of the collected projects for --csv and --parquet.
+
+The nested totals are exported as three long-format tables with one count per row:
+findings (project, version, remediation status, severity), policy hits (project, version,
+policy) and snippets (project, version, snippet status). Every row repeats the project
+and version attributes, so a table loads into a warehouse or data frame without joins or
+JSON parsing. Rows with a count of 0 are left out and the Total columns of the report,
+which are sums of the rows, are not exported.
+
+Rows are generated project by project and written as they come: CSV files with the csv
+module, Parquet files in row groups of PARQUET_ROW_GROUP rows. Neither holds a whole
+table in memory.
+
+Parquet needs pyarrow: pip install blackduck-remediation-metrics[parquet]
+'''
+import csv
+from datetime import date
+
+from .counters import REMEDIATION_STATUSES, SEVERITIES
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Rows per Parquet row group, the rows of one group are kept in memory until it is written
+PARQUET_ROW_GROUP = 65536
+SNIPPET_STATUSES = ["unreviewed", "reviewed", "ignored"]
+VERSION_COLUMNS = [("projectID", "string"), ("projectName", "string"), ("versionID", "string"), ("versionName", "string"),
+                   ("phase", "string"), ("distribution", "string"), ("lastScanDate", "date"), ("isDormant", "bool")]
+
+
+def _versionColumns(project, version):
+    lastScan = version.get("lastScanDate")
+    return [project["projectID"], project["projectName"], version["versionID"], version["versionName"],
+            version["phase"], version["distribution"], date.fromisoformat(lastScan) if lastScan else None, version["isDormant"]]
+
+
+def findingRows(projects):
+    """Vulnerable component counts by project version, remediation status and severity"""
+    for project in projects:
+        for version in project.get("projectVersionLevelCounts", []):
+            counts = version.get("vulnerableComponentCountsByRemediationStatus", {})
+            versionColumns = None
+            for status in REMEDIATION_STATUSES:
+                byStatus = counts.get(status, {})
+                for severity in SEVERITIES:
+                    count = byStatus.get(severity, 0)
+                    if count:
+                        if versionColumns is None:
+                            versionColumns = _versionColumns(project, version)
+                        yield versionColumns + [status, severity, count]
+
+
+def policyHitRows(projects):
+    """Violation counts by project version and policy"""
+    for project in projects:
+        versions = {version["versionID"]: version for version in project.get("projectVersionLevelCounts", [])}
+        for category, policies in project.get("policyDetails", {}).items():
+            for policyName, policyData in policies.items():
+                for projectInfo in policyData["projects"].values():
+                    for hit in projectInfo["versions"]:
+                        if hit["violationCount"]:
+                            yield _versionColumns(project, versions.get(hit["versionID"], hit)) + [category, policyName, hit["severity"],
+                                                                                                 hit["violationCount"]]
+
+
+def snippetRows(projects):
+    """Snippet counts by project version and review status"""
+    for project in projects:
+        for version in project.get("projectVersionLevelCounts", []):
+            snippets = version.get("snippets", {})
+            versionColumns = None
+            for status in SNIPPET_STATUSES:
+                count = snippets.get(status, 0)
+                if count:
+                    if versionColumns is None:
+                        versionColumns = _versionColumns(project, version)
+                    yield versionColumns + [status, count]
+
+
+# name: (columns as (name, type), rows of the projects)
+FACT_TABLES = {
+    "findings": (VERSION_COLUMNS + [("remediationStatus", "string"), ("severity", "string"), ("count", "int")], findingRows),
+    "policy_hits": (VERSION_COLUMNS + [("policyCategory", "string"), ("policyName", "string"), ("severity", "string"),
+                                       ("violationCount", "int")], policyHitRows),
+    "snippets": (VERSION_COLUMNS + [("snippetStatus", "string"), ("count", "int")], snippetRows),
+}
+
+
+def writeCsv(columns, rows, file):
+    """Write the header and the rows to the CSV file as they are generated, dates in ISO format"""
+    with open(file, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, _ in columns])
+        writer.writerows(rows)
+
+
+def _arrowSchema(columns):
+    types = {"string": pa.string(), "date": pa.date32(), "bool": pa.bool_(), "int": pa.int64()}
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def _arrowTable(schema, rows):
+    return pa.Table.from_arrays([pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)], schema=schema)
+
+
+def writeParquet(columns, rows, file, rowGroup=PARQUET_ROW_GROUP):
+    """Write the rows to the Parquet file in row groups of rowGroup rows as they are generated"""
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("Parquet export needs pyarrow. Install with: pip install pyarrow")
+    schema = _arrowSchema(columns)
+    # A file without rows still has the schema
+    with pq.ParquetWriter(file, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= rowGroup:
+                writer.write_table(_arrowTable(schema, batch))
+                batch.clear()
+        if batch:
+            writer.write_table(_arrowTable(schema, batch))
+
+
+def writeFactTables(projects, filePrefix, csvFiles=True, parquetFiles=False):
+    """Write every fact table of the projects to filePrefix_<table>.csv and/or .parquet, return the written files"""
+    files = []
+    for name, (columns, rowsOf) in FACT_TABLES.items():
+        if csvFiles:
+            files.append(f"{filePrefix}_{name}.csv")
+            writeCsv(columns, rowsOf(projects), files[-1])
+        if parquetFiles:
+            files.append(f"{filePrefix}_{name}.parquet")
+            writeParquet(columns, rowsOf(projects), files[-1])
+    return files
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+'''
+Shared HTTP layer for all Black Duck REST calls.
+
+One requests.Session with a keep-alive connection pool is used for the whole run,
+so the TCP and TLS handshakes are paid once per pooled connection instead of once
+per request. The bearer token is obtained from the API token and renewed
+transparently when it is about to expire or when Black Duck answers 401.
+'''
+import logging
+import threading
+from time import monotonic
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Renew the bearer token this many seconds before Black Duck would expire it
+TOKEN_EXPIRY_MARGIN = 60
+DEFAULT_POOL_SIZE = 10
+
+
+class HubSession:
+    """Thread-safe Black Duck session with a pooled connection and automatic bearer token refresh"""
+
+    def __init__(self, baseurl, api_token, insecure=False, poolSize=DEFAULT_POOL_SIZE, timeout=300, metrics=None):
+        self.config = {'baseurl': baseurl, 'insecure': insecure}
+        self.timeout = timeout
+        # Optional telemetry.RunMetrics recording every request
+        self.metrics = metrics
+        self._api_token = api_token
+        self._lock = threading.Lock()
+        self.session = requests.Session()
+        self.session.verify = not insecure
+        adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.token = None
+        self.csrf_token = None
+        self.expiresAt = 0
+        self.authenticate()
+
+    def authenticate(self):
+        """Exchange the API token for a new bearer token"""
+        url = f'{self.config["baseurl"]}/api/tokens/authenticate'
+        start = monotonic()
+        response = self.session.post(url, data={}, headers={'Authorization': f'token {self._api_token}'}, timeout=self.timeout)
+        if self.metrics:
+            self.metrics.record_request(url, monotonic() - start, response.status_code, len(response.content))
+        if response.status_code != 200:
+            raise Exception(f"Failed to obtain bearer token (HTTP {response.status_code}), check for valid authentication token")
+        jsondata = response.json()
+        self.token = jsondata['bearerToken']
+        self.csrf_token = response.headers.get('X-CSRF-TOKEN')
+        # Without an expiry from the server the token is renewed only on 401
+        expiresIn = jsondata.get('expiresInMilliseconds')
+        self.expiresAt = monotonic() + expiresIn / 1000 - TOKEN_EXPIRY_MARGIN if expiresIn else float('inf')
+        logging.debug("Black Duck bearer token renewed")
+
+    def refresh_token(self, staleToken):
+        """Renew the bearer token, unless another thread already did it after staleToken was used"""
+        with self._lock:
+            if self.token == staleToken:
+                self.authenticate()
+
+    def get_urlbase(self):
+        return self.config['baseurl']
+
+    def get_headers(self):
+        if monotonic() >= self.expiresAt:
+            self.refresh_token(self.token)
+        headers = {'Authorization': f'Bearer {self.token}', 'Accept': 'application/json'}
+        if self.csrf_token:
+            headers['X-CSRF-TOKEN'] = self.csrf_token
+        return headers
+
+    def get(self, url, accept=None, params=None):
+        """GET the url through the shared pool, retrying once with a renewed token on 401"""
+        for attempt in range(2):
+            headers = self.get_headers()
+            if accept:
+                headers['Accept'] = accept
+            start = monotonic()
+            response = self.session.get(url, headers=headers, params=params, timeout=self.timeout)
+            if self.metrics:
+                self.metrics.record_request(url, monotonic() - start, response.status_code, len(response.content))
+            if response.status_code == 401 and attempt == 0:
+                if self.metrics:
+                    self.metrics.record_retry(url)
+                self.refresh_token(headers['Authorization'][len('Bearer '):])
+                continue
+            return response
+
+    def get_projects(self, limit=100, parameters=None):
+        params = dict(parameters or {})
+        if limit:
+            params['limit'] = limit
+        response = self.get(f'{self.config["baseurl"]}/api/projects',
+                            accept='application/vnd.blackducksoftware.project-detail-4+json', params=params)
+        return response.json()
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+'''
+Slotted model of the project versions and policy hits read from Black Duck.
+
+A version is read once into a Version: its timestamps are parsed into datetimes a single
+time, and its dormancy is decided against the one timestamp of the run (RunClock) instead
+of datetime.now() per version. Policy hits refer to their Version instead of copying and
+re-parsing its fields.
+
+The collected totals, the cache and the checkpoint journal hold the scan dates as ISO
+dates (YYYY-MM-DD), which sort like the dates they are, so the latest scan of a project
+is the largest of them without parsing anything. The "%B %d, %Y" display dates of the
+reports are only formatted by the view layer (displayDate), once per distinct day.
+Records of earlier versions hold display dates, which are turned into ISO dates when the
+records are read (isoDate).
+'''
+import functools
+from datetime import date, datetime
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+DISPLAY_DATE_FORMAT = "%B %d, %Y"
+# Distinct timestamps and days kept parsed and formatted
+DATE_CACHE_SIZE = 65536
+
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def parseTimestamp(value):
+    """Datetime of a Black Duck timestamp, None when there is none"""
+    return datetime.strptime(value, TIMESTAMP_FORMAT) if value else None
+
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def _isoDay(day):
+    return day.isoformat()
+
+
+def isoDay(moment):
+    """ISO date of a datetime, None when there is none"""
+    return _isoDay(moment.date()) if moment else None
+
+
+def _isIsoDate(value):
+    return value[:4].isdigit()
+
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def isoDate(value):
+    """ISO date of a stored scan date, which is an ISO date already or the display date of an earlier version"""
+    if not value or _isIsoDate(value):
+        return value or None
+    try:
+        return datetime.strptime(value, DISPLAY_DATE_FORMAT).date().isoformat()
+    except ValueError:
+        return None
+
+
+@functools.lru_cache(maxsize=DATE_CACHE_SIZE)
+def displayDate(value):
+    """Display date of the reports for an ISO date, - when there is none"""
+    if not value:
+        return "-"
+    if not _isIsoDate(value):
+        return value
+    return date.fromisoformat(value).strftime(DISPLAY_DATE_FORMAT)
+
+
+def latestDate(values):
+    """The latest of ISO dates, None when there are none"""
+    return max((value for value in values if value), default=None)
+
+
+class RunClock:
+    """The timestamp of the run that the dormancy of all versions is decided against"""
+    __slots__ = ("now", "sinceDays")
+
+    def __init__(self, sinceDays, now=None):
+        self.now = now if now is not None else datetime.now()
+        self.sinceDays = sinceDays
+
+    def isDormant(self, lastScan, hasScanDate=True):
+        """A version is dormant when it was last scanned more than sinceDays days ago, or has no scan date at all.
+        Nothing is dormant without sinceDays."""
+        if not self.sinceDays or self.sinceDays <= 0:
+            return False
+        if not hasScanDate:
+            return True
+        return lastScan is not None and (self.now - lastScan).days > self.sinceDays
+
+
+class Version:
+    """A project version as listed by Black Duck, with parsed timestamps and its dormancy"""
+    __slots__ = ("versionID", "versionName", "phase", "distribution", "lastScan", "settingUpdated", "isDormant")
+
+    def __init__(self, version, clock):
+        self.versionID = version["_meta"]["href"].split("/")[-1]
+        self.versionName = version.get("versionName")
+        self.phase = version.get("phase")
+        self.distribution = version.get("distribution")
+        self.lastScan = parseTimestamp(version.get("lastScanDate"))
+        self.settingUpdated = parseTimestamp(version.get("settingUpdatedAt"))
+        self.isDormant = clock.isDormant(self.lastScan, "lastScanDate" in version)
+
+    def to_dict(self):
+        """The version fields of the version level counts"""
+        return {"versionID": self.versionID,
+                "versionName": self.versionName if self.versionName is not None else "-",
+                "lastScanDate": isoDay(self.lastScan),
+                "isDormant": self.isDormant,
+                "phase": self.phase if self.phase is not None else "-",
+                "distribution": self.distribution if self.distribution is not None else "-"}
+
+
+class PolicyHit:
+    """Violations of one policy rule in one version"""
+    __slots__ = ("version", "violationCount", "severity")
+
+    def __init__(self, version, violationCount, severity):
+        self.version = version
+        self.violationCount = violationCount
+        self.severity = severity
+
+    def to_dict(self):
+        """The version entry of the policy details"""
+        version = self.version
+        return {"versionName": version.versionName,
+                "versionID": version.versionID,
+                "phase": version.phase if version.phase is not None else "UNKNOWN",
+                "distribution": version.distribution if version.distribution is not None else "UNKNOWN",
+                # The policy details show when the version settings were last changed
+                "lastScanDate": isoDay(version.settingUpdated),
+                "isDormant": version.isDormant,
+                "violationCount": self.violationCount,
+                "severity": self.severity}
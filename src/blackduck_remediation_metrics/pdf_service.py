@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+'''
+PDF rendering with one long-lived headless Chromium for blackduck_triage_extract (--pdf).
+
+The browser is started once and kept until close(), every document gets a fresh page in
+it. Documents are loaded from memory with set_content, no HTML file is written for them,
+and the page is printed as soon as the report scripts set window.chartsRendered, instead
+of after fixed delays. Several documents are printed in parallel pages, up to maxPages at
+a time.
+
+The browser runs on an asyncio event loop in one background thread, submit() is
+thread-safe and returns a concurrent.futures.Future.
+
+Needs Playwright: pip install blackduck-remediation-metrics[playwright] && playwright install chromium
+'''
+import asyncio
+import threading
+
+try:
+    from playwright.async_api import async_playwright
+    PLAYWRIGHT_AVAILABLE = True
+except ImportError:
+    PLAYWRIGHT_AVAILABLE = False
+
+# Pages printing at the same time
+DEFAULT_PDF_PAGES = 4
+# Milliseconds to load a document (Chart.js comes from a CDN) and to draw its charts
+LOAD_TIMEOUT = 15000
+CHARTS_TIMEOUT = 10000
+# Set by the report template once its charts can be printed
+CHARTS_RENDERED_SIGNAL = "window.chartsRendered === true"
+PDF_OPTIONS = {
+    "format": "A4",
+    "print_background": True,
+    "prefer_css_page_size": False,
+    "margin": {"top": "0.5cm", "bottom": "0.5cm", "left": "0.5cm", "right": "0.5cm"},
+}
+
+
+class PdfService:
+    """Prints HTML documents to PDF files in parallel pages of one headless Chromium"""
+
+    def __init__(self, maxPages=DEFAULT_PDF_PAGES):
+        if not PLAYWRIGHT_AVAILABLE:
+            raise RuntimeError("The PDF service needs Playwright. Install with: pip install playwright && playwright install chromium")
+        self.maxPages = maxPages
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="bd-pdf", daemon=True)
+        self.thread.start()
+        try:
+            asyncio.run_coroutine_threadsafe(self._open(), self.loop).result()
+        except BaseException:
+            self._stopLoop()
+            raise
+
+    async def _open(self):
+        # The semaphore must be created on the loop it is used on
+        self.pageSlots = asyncio.Semaphore(self.maxPages)
+        self.playwright = await async_playwright().start()
+        try:
+            self.browser = await self.playwright.chromium.launch(headless=True, args=['--disable-dev-shm-usage', '--no-sandbox'])
+        except BaseException:
+            await self.playwright.stop()
+            raise
+
+    def submit(self, html, outputPath):
+        """Print the HTML document to outputPath, the future is done when the PDF file is written"""
+        return asyncio.run_coroutine_threadsafe(self._print(html, outputPath), self.loop)
+
+    def render(self, html, outputPath):
+        self.submit(html, outputPath).result()
+
+    def renderAll(self, documents):
+        """Print every (html, outputPath) of documents, in parallel pages"""
+        futures = [self.submit(html, outputPath) for html, outputPath in documents]
+        for future in futures:
+            future.result()
+
+    async def _print(self, html, outputPath):
+        async with self.pageSlots:
+            # A fresh page per document, a reused one would keep the signal of the previous document
+            page = await self.browser.new_page()
+            try:
+                # Print media, the report shows its inline SVG charts for it
+                await page.emulate_media(media="print")
+                await page.set_content(html, wait_until="load", timeout=LOAD_TIMEOUT)
+                await page.wait_for_function(CHARTS_RENDERED_SIGNAL, timeout=CHARTS_TIMEOUT)
+                await page.pdf(path=outputPath, **PDF_OPTIONS)
+            finally:
+                await page.close()
+
+    def close(self):
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), self.loop).result()
+        finally:
+            self._stopLoop()
+
+    async def _close(self):
+        await self.browser.close()
+        await self.playwright.stop()
+
+    def _stopLoop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
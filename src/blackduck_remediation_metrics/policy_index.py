@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+'''
+Flat index of the policy hits of the collected projects.
+
+The policy hits of a project are kept once, in the category -> policy -> project ->
+versions tree of the project (its policyDetails), which the cache and the JSON report
+hold. The instance level view of the reports is not merged into a second tree while
+collecting. Instead the hits of the reported projects are indexed in a flat table of
+(policy, project, violation count, hit) rows, with the category, name and severity of
+every policy in a table of its own. The instance level policy details and the policy
+breakdown of the report tooltips are derived from it when the reports are written; the
+rows refer to the hit records of the project trees instead of copying them.
+'''
+from array import array
+
+import numpy as np
+
+# Categories the policy breakdown always has, in the order the reports show them
+BREAKDOWN_CATEGORIES = ["COMPONENT", "LICENSE", "SECURITY", "OPERATIONAL", "UNCATEGORIZED"]
+
+
+class PolicyIndex:
+    """Policy hits of the given projects, one row per violated policy of a version"""
+
+    def __init__(self, projects=()):
+        # (category, name, severity) by policy number, numbered in the order the policies are first seen
+        self.policies = []
+        self.policyNumbers = {}
+        # (projectID, projectName) by project number
+        self.projects = []
+        self.policy = array("q")
+        self.project = array("q")
+        self.count = array("q")
+        # The version records of the project trees, the rows refer to them
+        self.hits = []
+        for projectLevelCount in projects:
+            self.add(projectLevelCount)
+
+    def add(self, projectLevelCount):
+        """Index the policy hits of a project from its policy details"""
+        projectNumbers = {}
+        for category, policies in projectLevelCount.get("policyDetails", {}).items():
+            for policyName, policyData in policies.items():
+                policyNumber = self.policyNumbers.get((category, policyName))
+                if policyNumber is None:
+                    policyNumber = self.policyNumbers[(category, policyName)] = len(self.policies)
+                    self.policies.append((category, policyName, policyData["severity"]))
+                for projectId, projectInfo in policyData["projects"].items():
+                    projectNumber = projectNumbers.get(projectId)
+                    if projectNumber is None:
+                        projectNumber = projectNumbers[projectId] = len(self.projects)
+                        self.projects.append((projectId, projectInfo["projectName"]))
+                    for hit in projectInfo["versions"]:
+                        self.policy.append(policyNumber)
+                        self.project.append(projectNumber)
+                        self.count.append(hit["violationCount"])
+                        self.hits.append(hit)
+
+    def __len__(self):
+        return len(self.hits)
+
+    def policyTotals(self):
+        """Violation count of every policy, by policy number"""
+        totals = np.zeros(len(self.policies), dtype=np.int64)
+        np.add.at(totals, np.frombuffer(self.policy, dtype=np.int64), np.frombuffer(self.count, dtype=np.int64))
+        return totals
+
+    def rowsByPolicy(self):
+        """Row numbers of every policy in row order, by policy number"""
+        policies = np.frombuffer(self.policy, dtype=np.int64)
+        order = np.argsort(policies, kind="stable")
+        bounds = np.searchsorted(policies[order], np.arange(len(self.policies) + 1))
+        return [order[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+    def details(self):
+        """The policy details of all indexed projects: category -> policy -> {severity, totalCount, projects -> versions}"""
+        details = {}
+        totals = self.policyTotals().tolist()
+        for policyNumber, rows in enumerate(self.rowsByPolicy()):
+            category, policyName, severity = self.policies[policyNumber]
+            projects = {}
+            for row in rows.tolist():
+                projectId, projectName = self.projects[self.project[row]]
+                projectInfo = projects.get(projectId)
+                if projectInfo is None:
+                    projectInfo = projects[projectId] = {"projectName": projectName, "projectID": projectId, "versions": []}
+                projectInfo["versions"].append(self.hits[row])
+            details.setdefault(category, {})[policyName] = {"severity": severity, "totalCount": totals[policyNumber], "projects": projects}
+        return details
+
+    def breakdown(self):
+        """Violation counts by category and policy name, for the tooltips of the reports"""
+        breakdown = {category: {} for category in BREAKDOWN_CATEGORIES}
+        for (category, policyName, _), total in zip(self.policies, self.policyTotals().tolist()):
+            breakdown.setdefault(category, {})[policyName] = total
+        return breakdown
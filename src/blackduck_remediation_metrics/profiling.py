@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+'''
+Per-phase CPU and allocation profiles for blackduck_triage_extract (--profile).
+
+Every phase of a run (collection, latest scan dates, template rendering, PDF, JSON and
+CSV output) runs under cProfile and tracemalloc. For each phase a pstats file and an
+allocation report are written: wall time, peak traced memory, the memory the phase left
+allocated and the source lines that allocated most of it. A summary of all phases is
+written at the end.
+
+cProfile only sees the thread it runs in, so with --workers > 1 or --async the CPU
+profile of the collection phase misses the worker threads. Allocations are traced in
+all threads.
+'''
+import cProfile
+import io
+import os
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from timeit import default_timer as timer
+
+# Frames kept per traced allocation, the reports group allocations by source line
+TRACEBACK_DEPTH = 1
+TOP_ALLOCATIONS = 25
+TOP_FUNCTIONS = 30
+
+
+class PhaseProfiler:
+    """Profiles named phases with cProfile and tracemalloc, a no-op when outputDir is None"""
+
+    def __init__(self, outputDir=None):
+        self.outputDir = outputDir
+        self.phases = []
+        self.startedTracing = False
+        if outputDir:
+            os.makedirs(outputDir, exist_ok=True)
+
+    @contextmanager
+    def phase(self, name):
+        if not self.outputDir:
+            yield
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEBACK_DEPTH)
+            self.startedTracing = True
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        profile = cProfile.Profile()
+        start = timer()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            seconds = timer() - start
+            _, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            self._write(name, profile, before, after, seconds, peak)
+
+    def _write(self, name, profile, before, after, seconds, peak):
+        filePrefix = os.path.join(self.outputDir, f"{len(self.phases) + 1:02d}_{name}")
+        profile.dump_stats(filePrefix + ".pstats")
+        snapshotFilters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+        allocations = after.filter_traces(snapshotFilters).compare_to(before.filter_traces(snapshotFilters), "lineno")
+        allocated = sum(allocation.size_diff for allocation in allocations)
+        self.phases.append((name, seconds, peak, allocated))
+
+        report = io.StringIO()
+        report.write(f"Phase: {name}\n")
+        report.write(f"Wall time: {seconds:.3f} s\n")
+        report.write(f"Peak traced memory: {peak / 1048576:.1f} MB\n")
+        report.write(f"Memory still allocated at the end of the phase: {allocated / 1048576:.1f} MB\n\n")
+        report.write(f"Top {TOP_ALLOCATIONS} allocating source lines (size at the end of the phase, change during the phase):\n")
+        for allocation in allocations[:TOP_ALLOCATIONS]:
+            report.write(f"{allocation}\n")
+        report.write(f"\nTop {TOP_FUNCTIONS} functions by cumulative time:\n")
+        stats = pstats.Stats(profile, stream=report)
+        stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        with open(filePrefix + "_allocations.txt", "w", encoding="utf8") as f:
+            f.write(report.getvalue())
+
+    def summary(self):
+        """Table of the profiled phases: wall time, peak and retained memory"""
+        lines = [f"{'phase':<22} {'wall s':>9} {'peak MB':>9} {'retained MB':>12}"]
+        for name, seconds, peak, allocated in self.phases:
+            lines.append(f"{name:<22} {seconds:>9.3f} {peak / 1048576:>9.1f} {allocated / 1048576:>12.1f}")
+        return "\n".join(lines)
+
+    def close(self):
+        """Write the summary and stop tracing"""
+        if self.outputDir and self.phases:
+            with open(os.path.join(self.outputDir, "summary.txt"), "w", encoding="utf8") as f:
+                f.write(self.summary() + "\n")
+        if self.startedTracing:
+            tracemalloc.stop()
+            self.startedTracing = False
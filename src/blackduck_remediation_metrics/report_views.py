@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+'''
+Template environment and view models of the HTML/PDF report and the dashboard.
+
+Both reports are rendered from one shared jinja2 environment with a filesystem bytecode
+cache, so a template is compiled once and later runs load the compiled code. Values the
+templates show but the collected totals do not hold are computed here once per run:
+severity totals over the triage statuses, policy violation totals over the categories,
+the rows every table shows with and without --show-empty and the managed counts of the
+dashboard. The template loops then only format data.
+
+The dashboard scripts get a compact payload instead of the whole totals: the instance
+count matrices, one columnar table of the policies, with categories and severities
+interned in a string table, and one columnar table of the project rows, which the
+dashboard filters and sorts in a web worker and renders as the rows scroll into view.
+
+The charts of the HTML/PDF report are also rendered here as inline SVG (svg_charts), the
+report shows them when it is printed and in PDFs, which then need no JavaScript.
+
+The totals hold scan dates as ISO dates (YYYY-MM-DD). They are formatted for display only
+here: by the displayDate filter of the templates, in the policy details the report scripts
+read, in the dashboard payload and in the copy of the totals the JSON report is written
+from (jsonView).
+'''
+import functools
+
+import jinja2
+
+from .model import displayDate
+from .counters import REMEDIATION_STATUSES, POLICY_CATEGORIES, POLICY_SEVERITIES, SNIPPET_COUNTS, RemediationCounts, PolicyCounts
+from .svg_charts import doughnutChart, barChart
+
+# Remediation statuses of the report tables, components without a status are not counted
+TRIAGE_STATUSES = [status for status in REMEDIATION_STATUSES if status != "NONE"]
+# Policy categories counted in the project table of the dashboard
+DASHBOARD_POLICY_CATEGORIES = ["COMPONENT", "LICENSE", "SECURITY"]
+# Labels and colors of the report charts, the same as the Chart.js charts of the report use
+SEVERITY_CHART = [("CRITICAL", "Critical", "#e53e3e"), ("HIGH", "High", "#dd6b20"), ("MEDIUM", "Medium", "#d69e2e"), ("LOW", "Low", "#38a169")]
+SEVERITY_BY_STATUS_CHART_STATUSES = ["NEW", "IGNORED", "NEEDS_REVIEW", "PATCHED", "MITIGATED"]
+REMEDIATION_CHART_STATUSES = ["NEW", "IGNORED", "NEEDS_REVIEW", "PATCHED", "MITIGATED", "DUPLICATE", "REMEDIATION_REQUIRED",
+                              "REMEDIATION_COMPLETE", "NOT_AFFECTED", "AFFECTED", "UNDER_INVESTIGATION"]
+POLICY_CHART_CATEGORIES = ["UNCATEGORIZED", "COMPONENT", "LICENSE", "SECURITY", "OPERATIONAL"]
+POLICY_COLORS = dict(zip(POLICY_SEVERITIES, ["#742a2a", "#e53e3e", "#dd6b20", "#d69e2e", "#718096", "#a0aec0"]))
+SNIPPET_CHART = [("unreviewed", "Unreviewed", "#dd6b20"), ("reviewed", "Reviewed", "#38a169"), ("ignored", "Ignored", "#718096")]
+# Policies shown in the policy chart, the ones with most violations
+TOP_POLICIES = 20
+
+
+@functools.lru_cache(maxsize=None)
+def templateEnvironment(templatesDir):
+    """The jinja2 environment of the templates directory, shared by all reports of the run"""
+    environment = jinja2.Environment(loader=jinja2.FileSystemLoader(searchpath=templatesDir), autoescape=True,
+                                     bytecode_cache=jinja2.FileSystemBytecodeCache())
+    # Data embedded with tojson is read by scripts only, leave out the whitespace
+    environment.policies["json.dumps_kwargs"] = {"sort_keys": True, "separators": (",", ":")}
+    environment.filters["displayDate"] = displayDate
+    return environment
+
+
+def severityTotals(levelCounts):
+    """Counts by severity summed over the triage statuses, for each of the level counts"""
+    rows = [RemediationCounts.ROW_INDEX[status] for status in TRIAGE_STATUSES]
+    matrix = RemediationCounts.stack(levelCounts)[:, rows, :].sum(axis=1)
+    return [dict(zip(RemediationCounts.KEYS, values)) for values in matrix.tolist()]
+
+
+def policyTotals(policyViolationsList, categories=POLICY_CATEGORIES):
+    """Policy violations by severity summed over the categories, for each of the policy violation counts"""
+    rows = [PolicyCounts.ROW_INDEX[category] for category in categories]
+    matrix = PolicyCounts.stack(policyViolationsList)[:, rows, :].sum(axis=1)
+    return [dict(zip(PolicyCounts.KEYS, values)) for values in matrix.tolist()]
+
+
+def reportView(totals, showEmpty=False):
+    """Derived values and table rows of the HTML/PDF report"""
+    projects = totals["projects"]
+    projectSeverities = severityTotals(projects)
+    projectPolicies = policyTotals([project["policyViolations"] for project in projects])
+    statusRows = {}
+    for status in TRIAGE_STATUSES:
+        statusRows[status] = [(project, project["projectVersionLevelCounts"] if showEmpty else
+                               [versionData for versionData in project["projectVersionLevelCounts"]
+                                if versionData["vulnerableComponentCountsByRemediationStatus"][status]["Total"] > 0])
+                              for project in projects if showEmpty or project[status]["Total"] > 0]
+    severities = severityTotals([totals])[0]
+    return {"severityTotals": severities,
+            "policyTotals": policyTotals([totals["policyViolations"]])[0],
+            "policyRows": [(project, policies) for project, policies in zip(projects, projectPolicies) if policies["Total"] > 0],
+            "snippetRows": [project for project in projects if project["SNIPPET"]["Total"] > 0],
+            "vulnerabilityRows": [(project, severities) for project, severities in zip(projects, projectSeverities)
+                                  if showEmpty or project["Total"] > 0],
+            "statusRows": statusRows,
+            "policyDetails": _policyDetailsView(totals.get("policyDetails", {})),
+            "charts": reportCharts(totals, severities)}
+
+
+def reportCharts(totals, severities):
+    """The charts of the HTML/PDF report as inline SVG, by the id of the Chart.js canvas they stand in for"""
+    remediation = [(status.replace("_", " "), totals[status]["Total"]) for status in REMEDIATION_CHART_STATUSES if totals[status]["Total"] > 0]
+    policies = []
+    for category in POLICY_CHART_CATEGORIES:
+        for policyName, policyData in totals.get("policyDetails", {}).get(category, {}).items():
+            policies.append((policyName, policyData["totalCount"], POLICY_COLORS.get(policyData["severity"], "#718096")))
+    policies.sort(key=lambda policy: policy[1], reverse=True)
+    policies = policies[:TOP_POLICIES]
+    charts = {
+        "severityChart": doughnutChart([label for _, label, _ in SEVERITY_CHART], [severities[severity] for severity, _, _ in SEVERITY_CHART],
+                                       [color for _, _, color in SEVERITY_CHART]),
+        "remediationChart": barChart([label for label, _ in remediation], [("Count", "#3182ce", [count for _, count in remediation])]),
+        "severityByStatusChart": barChart([status.replace("_", " ").title() for status in SEVERITY_BY_STATUS_CHART_STATUSES],
+                                          [(label, color, [totals[status][severity] for status in SEVERITY_BY_STATUS_CHART_STATUSES])
+                                           for severity, label, color in SEVERITY_CHART]),
+        "policyChart": barChart([category.title() for category in POLICY_CHART_CATEGORIES],
+                                [(severity.title(), color, [totals["policyViolations"][category][severity] for category in POLICY_CHART_CATEGORIES])
+                                 for severity, color in POLICY_COLORS.items()]),
+        "policySeverityChart": barChart([name for name, _, _ in policies],
+                                        [("Policy Violations", [color for _, _, color in policies], [count for _, count, _ in policies])],
+                                        horizontal=True),
+        "snippetChart": None,
+    }
+    if totals["SNIPPET"]["Total"] > 0:
+        charts["snippetChart"] = doughnutChart([label for _, label, _ in SNIPPET_CHART], [totals["SNIPPET"][key] for key, _, _ in SNIPPET_CHART],
+                                               [color for _, _, color in SNIPPET_CHART])
+    return charts
+
+
+def dashboardView(totals):
+    """Derived values and the project table rows of the dashboard, projects with most findings first"""
+    projects = totals["projects"]
+    projectPolicies = policyTotals([project["policyViolations"] for project in projects], DASHBOARD_POLICY_CATEGORIES)
+    projectRows = [(project, {"total": project["Total"] + policies["Total"],
+                              "managed": project["Total"] - project["NEW"]["Total"],
+                              "policyViolations": policies["Total"]})
+                   for project, policies in zip(projects, projectPolicies)]
+    projectRows.sort(key=lambda row: row[0]["Total"], reverse=True)
+    return {"policyTotals": policyTotals([totals["policyViolations"]])[0],
+            "projectRows": projectRows}
+
+
+def dashboardPayload(totals, projectRows):
+    """The data the dashboard scripts read: instance count matrices and columnar policy and project tables"""
+    strings = []
+    stringIndex = {}
+
+    def intern(value):
+        if value not in stringIndex:
+            stringIndex[value] = len(strings)
+            strings.append(value)
+        return stringIndex[value]
+
+    policies = {"name": [], "category": [], "severity": [], "totalCount": [], "projectCount": [], "versionCount": []}
+    for category, categoryPolicies in totals["policyDetails"].items():
+        for policyName, policyData in categoryPolicies.items():
+            policies["name"].append(policyName)
+            policies["category"].append(intern(category))
+            policies["severity"].append(intern(policyData["severity"]))
+            policies["totalCount"].append(policyData["totalCount"])
+            policies["projectCount"].append(len(policyData["projects"]))
+            policies["versionCount"].append(sum(len(projectData["versions"]) for projectData in policyData["projects"].values()))
+    return {"strings": strings,
+            "statuses": RemediationCounts.ROWS,
+            "severities": RemediationCounts.KEYS,
+            "vulnerabilities": RemediationCounts.from_dict(totals).values.tolist(),
+            "policyCategories": PolicyCounts.ROWS,
+            "policySeverities": PolicyCounts.KEYS,
+            "policyViolations": PolicyCounts.from_dict(totals["policyViolations"]).values.tolist(),
+            "snippetKeys": SNIPPET_COUNTS,
+            "snippets": [totals["SNIPPET"].get(key, 0) for key in SNIPPET_COUNTS],
+            "policies": policies,
+            "projects": projectColumns(projectRows)}
+
+
+def projectColumns(projectRows):
+    """The project table of the dashboard as one array per column, in the order of the dashboard view"""
+    columns = {"name": [], "dormant": [], "new": [], "critical": [], "high": [], "medium": [], "low": [],
+               "managed": [], "policyViolations": [], "lastScan": [], "total": []}
+    for project, row in projectRows:
+        newCounts = project["NEW"]
+        columns["name"].append(project["projectName"])
+        columns["dormant"].append(1 if project.get("isDormant") else 0)
+        columns["new"].append(newCounts["Total"])
+        columns["critical"].append(newCounts["CRITICAL"])
+        columns["high"].append(newCounts["HIGH"])
+        columns["medium"].append(newCounts["MEDIUM"])
+        columns["low"].append(newCounts["LOW"])
+        columns["managed"].append(row["managed"])
+        columns["policyViolations"].append(row["policyViolations"])
+        columns["lastScan"].append(displayDate(project.get("latestScanDate")))
+        columns["total"].append(row["total"])
+    return columns
+
+
+def _withDisplayDate(record, key):
+    """Copy of the record with its ISO date under key formatted for display, in the same key position"""
+    return dict(record, **{key: displayDate(record.get(key))})
+
+
+def _policyDetailsView(policyDetails):
+    return {category: {policyName: dict(policyData, projects={projectId: dict(projectInfo, versions=[_withDisplayDate(hit, "lastScanDate")
+                                                                                                     for hit in projectInfo["versions"]])
+                                                               for projectId, projectInfo in policyData["projects"].items()})
+                       for policyName, policyData in policies.items()}
+            for category, policies in policyDetails.items()}
+
+
+def jsonView(totals):
+    """The totals as the JSON report has them, with display dates. The project and version records are copied,
+    the counts are shared with the totals."""
+    view = dict(totals)
+    if "policyDetails" in totals:
+        view["policyDetails"] = _policyDetailsView(totals["policyDetails"])
+    projects = []
+    for project in totals["projects"]:
+        projectView = _withDisplayDate(project, "latestScanDate")
+        projectView["projectVersionLevelCounts"] = [_withDisplayDate(version, "lastScanDate") for version in project.get("projectVersionLevelCounts", [])]
+        if "policyDetails" in project:
+            projectView["policyDetails"] = _policyDetailsView(project["policyDetails"])
+        projects.append(projectView)
+    view["projects"] = projects
+    return view
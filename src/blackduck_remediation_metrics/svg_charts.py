@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+'''
+Inline SVG charts for the HTML/PDF report.
+
+The report draws its charts with Chart.js in the browser. The same charts are also
+rendered here as static SVG, which the report shows when it is printed or converted to
+PDF, so a PDF has its charts without running JavaScript: pdfkit (wkhtmltopdf) converts
+the report with JavaScript disabled and Playwright prints it as soon as it is loaded.
+
+Only the chart types of the report are supported: doughnut charts and vertical or
+horizontal bar charts, stacked when they have more than one series.
+'''
+import math
+
+from markupsafe import Markup, escape
+
+FONT_FAMILY = '-apple-system, BlinkMacSystemFont, &quot;Segoe UI&quot;, Roboto, &quot;Helvetica Neue&quot;, Arial, sans-serif'
+TEXT_COLOR = "#4a5568"
+GRID_COLOR = "#e2e8f0"
+EMPTY_COLOR = "#e2e8f0"
+WIDTH = 450
+HEIGHT = 300
+LEGEND_ROW_HEIGHT = 20
+# Room for two legend rows is kept below a chart with a legend
+LEGEND_HEIGHT = 2 * LEGEND_ROW_HEIGHT
+# Longest category label drawn in full, longer ones are cut and shown in full as a tooltip
+MAX_LABEL_LENGTH = 28
+
+
+def _svg(body, width, height):
+    return Markup(f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="100%" height="100%" '
+                  f'role="img" font-family="{FONT_FAMILY}" font-size="12" fill="{TEXT_COLOR}">{body}</svg>')
+
+
+def _label(text, maxLength=MAX_LABEL_LENGTH):
+    """Escaped label text, cut to maxLength characters with the full text as a tooltip"""
+    text = str(text)
+    if len(text) <= maxLength:
+        return escape(text)
+    return f"<title>{escape(text)}</title>{escape(text[:maxLength - 1])}…"
+
+
+def _legend(entries, width, top):
+    """Legend rows of (label, color) centered below the chart, starting at top"""
+    rows = [[]]
+    rowWidth = 0
+    for label, color in entries:
+        entryWidth = 26 + 7 * len(str(label))
+        if rows[-1] and rowWidth + entryWidth > width:
+            rows.append([])
+            rowWidth = 0
+        rows[-1].append((label, color, entryWidth))
+        rowWidth += entryWidth
+    parts = []
+    for rowIndex, row in enumerate(rows):
+        x = (width - sum(entryWidth for _, _, entryWidth in row)) / 2
+        y = top + rowIndex * LEGEND_ROW_HEIGHT
+        for label, color, entryWidth in row:
+            parts.append(f'<rect x="{x:.1f}" y="{y + 4}" width="12" height="12" rx="2" fill="{color}"/>'
+                         f'<text x="{x + 16:.1f}" y="{y + 14}">{escape(label)}</text>')
+            x += entryWidth
+    return "".join(parts)
+
+
+def _niceStep(maximum, ticks=5):
+    """Integer axis step giving about ticks steps up to maximum"""
+    if maximum <= ticks:
+        return 1
+    rough = maximum / ticks
+    magnitude = 10 ** math.floor(math.log10(rough))
+    for factor in (1, 2, 5, 10):
+        if factor * magnitude >= rough:
+            return int(factor * magnitude)
+
+
+def doughnutChart(labels, values, colors, width=WIDTH, height=HEIGHT):
+    """Doughnut chart of values with a legend of labels below it"""
+    legend = _legend(list(zip(labels, colors)), width, height - LEGEND_HEIGHT)
+    total = sum(values)
+    cx, cy = width / 2, (height - LEGEND_HEIGHT) / 2
+    radius = cy - 10
+    ringWidth = radius / 2
+    # Every slice is a dash of a circle stroke, so a slice of 100% needs no special case
+    ringRadius = radius - ringWidth / 2
+    circumference = 2 * math.pi * ringRadius
+    parts = [f'<circle cx="{cx}" cy="{cy}" r="{ringRadius:.2f}" fill="none" stroke="{EMPTY_COLOR}" stroke-width="{ringWidth:.2f}"/>']
+    offset = 0.0
+    for label, value, color in zip(labels, values, colors):
+        if value <= 0:
+            continue
+        length = circumference * value / total
+        parts.append(f'<circle cx="{cx}" cy="{cy}" r="{ringRadius:.2f}" fill="none" stroke="{color}" stroke-width="{ringWidth:.2f}" '
+                     f'stroke-dasharray="{length:.2f} {circumference - length:.2f}" stroke-dashoffset="{circumference - offset:.2f}" '
+                     f'transform="rotate(-90 {cx} {cy})"><title>{escape(label)}: {value} ({100 * value / total:.1f}%)</title></circle>')
+        offset += length
+    return _svg("".join(parts) + legend, width, height)
+
+
+def barChart(labels, series, horizontal=False, legend=True, width=WIDTH, height=HEIGHT):
+    """Bar chart of series [(name, color, values)] over the labels, stacked when there are several series.
+    The color of a series can also be a list with a color for every bar."""
+    legendSvg, legendHeight = "", 0
+    if legend and len(series) > 1:
+        legendSvg, legendHeight = _legend([(name, color) for name, color, _ in series], width, height - LEGEND_HEIGHT), LEGEND_HEIGHT
+    stackTotals = [sum(values[i] for _, _, values in series) for i in range(len(labels))]
+    step = _niceStep(max(stackTotals, default=0))
+    axisMaximum = max(step, math.ceil(max(stackTotals, default=0) / step) * step)
+
+    if horizontal:
+        left, right, top, bottom = 8 + 6 * min(MAX_LABEL_LENGTH, max((len(str(label)) for label in labels), default=0)), 15, 10, 25 + legendHeight
+    else:
+        # Many category labels do not fit side by side, they are drawn slanted
+        slanted = len(labels) > 6
+        left, right, top, bottom = 10 + 7 * len(str(axisMaximum)), 10, 10, (85 if slanted else 40) + legendHeight
+    plotWidth, plotHeight = width - left - right, height - top - bottom
+    valueLength = plotWidth if horizontal else plotHeight
+    bandLength = (plotHeight if horizontal else plotWidth) / max(len(labels), 1)
+    barThickness = bandLength * 0.7
+
+    parts = []
+    for tick in range(0, axisMaximum + 1, step):
+        position = valueLength * tick / axisMaximum
+        if horizontal:
+            x = left + position
+            parts.append(f'<line x1="{x:.1f}" y1="{top}" x2="{x:.1f}" y2="{top + plotHeight}" stroke="{GRID_COLOR}"/>'
+                         f'<text x="{x:.1f}" y="{top + plotHeight + 15}" text-anchor="middle">{tick}</text>')
+        else:
+            y = top + plotHeight - position
+            parts.append(f'<line x1="{left}" y1="{y:.1f}" x2="{left + plotWidth}" y2="{y:.1f}" stroke="{GRID_COLOR}"/>'
+                         f'<text x="{left - 6}" y="{y + 4:.1f}" text-anchor="end">{tick}</text>')
+    for i, label in enumerate(labels):
+        band = bandLength * i + (bandLength - barThickness) / 2
+        if horizontal:
+            parts.append(f'<text x="{left - 6}" y="{top + band + barThickness / 2 + 4:.1f}" text-anchor="end">{_label(label)}</text>')
+        elif slanted:
+            parts.append(f'<text transform="translate({left + band + barThickness / 2 + 4:.1f} {top + plotHeight + 12}) rotate(-40)" '
+                         f'text-anchor="end" font-size="11">{_label(label, 16)}</text>')
+        else:
+            parts.append(f'<text x="{left + band + barThickness / 2:.1f}" y="{top + plotHeight + 16}" text-anchor="middle">{_label(label)}</text>')
+        stacked = 0
+        for name, color, values in series:
+            if values[i] <= 0:
+                continue
+            start, length = valueLength * stacked / axisMaximum, valueLength * values[i] / axisMaximum
+            stacked += values[i]
+            fill = color[i] if isinstance(color, (list, tuple)) else color
+            if horizontal:
+                rect = f'x="{left + start:.1f}" y="{top + band:.1f}" width="{length:.1f}" height="{barThickness:.1f}"'
+            else:
+                rect = f'x="{left + band:.1f}" y="{top + plotHeight - start - length:.1f}" width="{barThickness:.1f}" height="{length:.1f}"'
+            parts.append(f'<rect {rect} fill="{fill}"><title>{escape(label)} - {escape(name)}: {values[i]}</title></rect>')
+    return _svg("".join(parts) + legendSvg, width, height)
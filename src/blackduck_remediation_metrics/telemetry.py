@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+'''
+Request telemetry and run metrics for blackduck_triage_extract (--metrics-file).
+
+Every Black Duck call made through HubSession or the async collector is recorded per
+endpoint: request count by HTTP status, latency (histogram and p50/p95/p99), bytes
+received and token renewal retries. Cache lookups are counted as hits and misses.
+At the end of the run the metrics are written as JSON and in the Prometheus textfile
+format, e.g. for the node_exporter textfile collector.
+'''
+import json
+import os
+import threading
+import time
+from array import array
+from urllib.parse import urlsplit
+
+import numpy as np
+
+# Upper bounds in seconds of the Prometheus latency histogram buckets
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+PERCENTILES = [50, 95, 99]
+# Last path segment of the Black Duck endpoints the tool calls
+ENDPOINTS = {"projects": "projects", "project-groups": "project-groups", "children": "project-group-children",
+             "versions": "versions", "snippet-counts": "snippet-counts", "policy-rules": "policy-rules",
+             "vulnerable-bom-components": "vulnerable-bom-components", "authenticate": "authenticate"}
+
+
+def endpointOf(url):
+    """Endpoint name of a Black Duck API url, e.g. versions for .../api/projects/<id>/versions"""
+    path = urlsplit(url).path.rstrip("/")
+    endpoint = ENDPOINTS.get(path.rsplit("/", 1)[-1])
+    if endpoint:
+        return endpoint
+    # A single project, fetched while traversing project groups
+    return "project" if "/api/projects/" in path else "other"
+
+
+class EndpointMetrics:
+    """Request counts, latencies and bytes received of one endpoint"""
+    __slots__ = ("requests", "latencies", "bytes", "retries")
+
+    def __init__(self):
+        self.requests = {}
+        self.latencies = array("d")
+        self.bytes = 0
+        self.retries = 0
+
+    def to_dict(self):
+        latencies = np.frombuffer(self.latencies, dtype=np.float64)
+        latencySeconds = dict.fromkeys(["sum", "max"] + [f"p{percentile}" for percentile in PERCENTILES], 0.0)
+        if len(latencies):
+            latencySeconds["sum"] = float(latencies.sum())
+            latencySeconds["max"] = float(latencies.max())
+            for percentile, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES).tolist()):
+                latencySeconds[f"p{percentile}"] = value
+        return {"requests": sum(self.requests.values()),
+                "byStatus": {str(status): count for status, count in sorted(self.requests.items())},
+                "retries": self.retries,
+                "bytesReceived": self.bytes,
+                "latencySeconds": latencySeconds}
+
+    def buckets(self):
+        """Cumulative counts per LATENCY_BUCKETS upper bound"""
+        latencies = np.frombuffer(self.latencies, dtype=np.float64)
+        return np.searchsorted(np.sort(latencies), LATENCY_BUCKETS, side="right").tolist()
+
+
+class RunMetrics:
+    """Thread-safe collector of the request and cache metrics of one run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+        self.cache = {}
+        self.run = {}
+        self.started = time.time()
+
+    def record_request(self, url, seconds, status, receivedBytes):
+        endpoint = endpointOf(url)
+        with self._lock:
+            metrics = self.endpoints.get(endpoint)
+            if metrics is None:
+                metrics = self.endpoints[endpoint] = EndpointMetrics()
+            metrics.requests[status] = metrics.requests.get(status, 0) + 1
+            metrics.latencies.append(seconds)
+            metrics.bytes += receivedBytes
+
+    def record_retry(self, url):
+        endpoint = endpointOf(url)
+        with self._lock:
+            metrics = self.endpoints.get(endpoint)
+            if metrics is None:
+                metrics = self.endpoints[endpoint] = EndpointMetrics()
+            metrics.retries += 1
+
+    def record_cache(self, cache, hit):
+        """Count one lookup of the given cache (project, version or checkpoint)"""
+        with self._lock:
+            counts = self.cache.setdefault(cache, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    def set_run(self, **values):
+        """Run level values, e.g. duration, project and version counts"""
+        self.run.update(values)
+
+    def to_dict(self):
+        with self._lock:
+            return {"startedAt": self.started,
+                    "run": dict(self.run),
+                    "endpoints": {endpoint: metrics.to_dict() for endpoint, metrics in sorted(self.endpoints.items())},
+                    "cache": {cache: dict(counts) for cache, counts in sorted(self.cache.items())}}
+
+    def to_prometheus(self):
+        """The metrics in the Prometheus text exposition format"""
+        metrics = self.to_dict()
+        lines = []
+
+        def metric(name, kind, help, samples):
+            lines.append(f"# HELP bd_metrics_{name} {help}")
+            lines.append(f"# TYPE bd_metrics_{name} {kind}")
+            for labels, value in samples:
+                labelText = ",".join(f'{key}="{labelValue}"' for key, labelValue in labels.items())
+                lines.append(f"bd_metrics_{name}{{{labelText}}} {value}" if labelText else f"bd_metrics_{name} {value}")
+
+        metric("requests_total", "counter", "Black Duck requests by endpoint and HTTP status",
+               [({"endpoint": endpoint, "status": status}, count)
+                for endpoint, values in metrics["endpoints"].items() for status, count in values["byStatus"].items()])
+        with self._lock:
+            buckets = {endpoint: endpointMetrics.buckets() for endpoint, endpointMetrics in self.endpoints.items()}
+        lines.append("# HELP bd_metrics_request_duration_seconds Black Duck request latency")
+        lines.append("# TYPE bd_metrics_request_duration_seconds histogram")
+        for endpoint, values in metrics["endpoints"].items():
+            for bound, count in zip(LATENCY_BUCKETS, buckets[endpoint]):
+                lines.append(f'bd_metrics_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+            lines.append(f'bd_metrics_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {values["requests"]}')
+            lines.append(f'bd_metrics_request_duration_seconds_sum{{endpoint="{endpoint}"}} {values["latencySeconds"]["sum"]}')
+            lines.append(f'bd_metrics_request_duration_seconds_count{{endpoint="{endpoint}"}} {values["requests"]}')
+        metric("request_latency_seconds", "gauge", "Black Duck request latency percentiles of the run",
+               [({"endpoint": endpoint, "quantile": str(percentile / 100)}, values["latencySeconds"][f"p{percentile}"])
+                for endpoint, values in metrics["endpoints"].items() for percentile in PERCENTILES])
+        metric("response_bytes_total", "counter", "Bytes received from Black Duck",
+               [({"endpoint": endpoint}, values["bytesReceived"]) for endpoint, values in metrics["endpoints"].items()])
+        metric("retries_total", "counter", "Requests retried after renewing the bearer token",
+               [({"endpoint": endpoint}, values["retries"]) for endpoint, values in metrics["endpoints"].items()])
+        metric("cache_lookups_total", "counter", "Cache lookups by cache and result",
+               [({"cache": cache, "result": result}, counts[result])
+                for cache, counts in metrics["cache"].items() for result in ("hits", "misses")])
+        for name, value in sorted(metrics["run"].items()):
+            if isinstance(value, (bool, int, float)):
+                metric(f"run_{name}", "gauge", f"Run {name}", [({}, int(value) if isinstance(value, bool) else value)])
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the metrics as JSON to path and in Prometheus textfile format next to it (.prom)"""
+        root, _ = os.path.splitext(path)
+        for filePath, content in ((path, json.dumps(self.to_dict(), indent=3)), (root + ".prom", self.to_prometheus())):
+            # Write and rename, so a collector never reads a half written file
+            temporaryPath = filePath + ".tmp"
+            with open(temporaryPath, "w", encoding="utf8") as f:
+                f.write(content)
+            os.replace(temporaryPath, filePath)
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+'''
+Query planner for the project version listing of blackduck_triage_extract.
+
+The version filters of a run (--phaseCategories, --distributionCategories and
+--project-version) are planned into predicates that Black Duck evaluates itself, so
+versions that are not wanted are never listed and no snippet, policy or BOM requests
+are made for them. Every phase and distribution value is sent as its own repeated filter
+parameter (filter=phase:RELEASED&filter=phase:ARCHIVED); Black Duck ORs the values of one
+field and ANDs the fields. A predicate that selects every value of its field excludes
+nothing and is left out of the query. The signature of the planned predicates tells which
+version filters cached results were collected under.
+
+With --filter-stats the versions each predicate eliminated are counted: Black Duck is
+asked for the version count (limit=1) without filters and with every predicate added in
+turn, and versions of cached projects are counted as they are filtered client-side.
+'''
+import json
+import threading
+
+PHASES = ["PLANNING", "DEVELOPMENT", "RELEASED", "DEPRECATED", "ARCHIVED", "PRERELEASE"]
+DISTRIBUTIONS = ["EXTERNAL", "SAAS", "INTERNAL", "OPENSOURCE"]
+VERSIONS_ACCEPT = 'application/vnd.blackducksoftware.internal-1+json'
+
+
+def parseCategories(categories):
+    """Upper case values of a comma separated option, None when it is not given"""
+    if not categories:
+        return None
+    return [category.strip().upper() for category in categories.split(",") if category.strip()]
+
+
+class VersionQuery:
+    """The version filters of a run, planned into server-side predicates"""
+
+    def __init__(self, phases=None, distributions=None, versionName=None):
+        self.phases = phases
+        self.distributions = distributions
+        self.versionName = versionName
+        self.predicates = self._plan()
+
+    @classmethod
+    def fromArguments(cls, args):
+        return cls(parseCategories(args.phaseCategories), parseCategories(args.distributionCategories),
+                   args.project_version or None)
+
+    def _plan(self):
+        """(name, parameters, matches) of every predicate that excludes versions, in the order they are applied"""
+        predicates = []
+        for name, values, allValues in (("phase", self.phases, PHASES), ("distribution", self.distributions, DISTRIBUTIONS)):
+            if values is None or set(allValues) <= set(values):
+                continue
+            selected = list(dict.fromkeys(values))
+            predicates.append((name, {"filter": [f"{name}:{value}" for value in selected]},
+                               lambda version, name=name, selected=frozenset(selected): version.get(name, "").upper() in selected))
+        if self.versionName:
+            predicates.append(("versionName", {"q": [f"versionName:{self.versionName}"]},
+                               lambda version: version.get("versionName") == self.versionName))
+        return predicates
+
+    @staticmethod
+    def _parameters(predicates):
+        parameters = {}
+        for _, predicateParameters, _ in predicates:
+            for key, values in predicateParameters.items():
+                parameters.setdefault(key, []).extend(values)
+        return parameters
+
+    def parameters(self):
+        """Query parameters of the version listing, list values are sent as repeated parameters"""
+        return self._parameters(self.predicates)
+
+    def signature(self):
+        """Canonical text of the predicates, the same for every query selecting the same versions"""
+        return json.dumps({key: sorted(values) for key, values in self.parameters().items()}, sort_keys=True)
+
+    def stages(self):
+        """Parameters of the listing without predicates and with every predicate added in turn"""
+        return [self._parameters(self.predicates[:count]) for count in range(len(self.predicates) + 1)]
+
+    def eliminatedBy(self, version):
+        """Name of the first predicate the version does not match, None when it matches all"""
+        for name, _, matches in self.predicates:
+            if not matches(version):
+                return name
+        return None
+
+    def matches(self, version):
+        return self.eliminatedBy(version) is None
+
+
+# Signature of a query without predicates, projects collected under it hold all their versions
+UNFILTERED_SIGNATURE = VersionQuery().signature()
+
+
+class FilterStats:
+    """Thread-safe counts of the versions every predicate of the query eliminated"""
+
+    def __init__(self, query):
+        self.query = query
+        self._lock = threading.Lock()
+        self.listed = 0
+        self.eliminated = {name: 0 for name, _, _ in query.predicates}
+
+    def _add(self, listed, eliminated):
+        with self._lock:
+            self.listed += listed
+            for name, count in eliminated.items():
+                self.eliminated[name] += count
+
+    def countListing(self, hub, project):
+        """Count the versions of the project the server-side predicates eliminate, one limit=1 request per stage"""
+        url = project['_meta']['href'] + "/versions"
+        counts = []
+        for parameters in self.query.stages():
+            response = hub.get(url, accept=VERSIONS_ACCEPT, params=dict(parameters, limit=1))
+            if response.status_code != 200:
+                return
+            counts.append(int(response.json()["totalCount"]))
+        self._add(counts[0], {name: before - after for (name, _, _), before, after in zip(self.query.predicates, counts, counts[1:])})
+
+    def countCached(self, versions):
+        """Count the versions of a cached project the predicates eliminate client-side"""
+        eliminated = {}
+        for version in versions:
+            name = self.query.eliminatedBy(version)
+            if name:
+                eliminated[name] = eliminated.get(name, 0) + 1
+        self._add(len(versions), eliminated)
+
+    def to_dict(self):
+        with self._lock:
+            return {"listed": self.listed, "eliminated": dict(self.eliminated),
+                    "kept": self.listed - sum(self.eliminated.values())}
+
+    def summary(self):
+        stats = self.to_dict()
+        if not stats["eliminated"]:
+            return f"Version filters: none applied, {stats['listed']} versions kept"
+        eliminated = ", ".join(f"{name} eliminated {count}" for name, count in stats["eliminated"].items())
+        return f"Version filters: {eliminated} of {stats['listed']} versions, {stats['kept']} kept"
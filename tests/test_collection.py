@@ -0,0 +1,476 @@
+"""Tests for the project collection and aggregation in blackduck_triage_extract."""
+import json
+import random
+import sys
+from argparse import Namespace
+from pathlib import Path
+
+import pytest
+
+# Add src to path for testing
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from blackduck_remediation_metrics import blackduck_triage_extract as bte
+from blackduck_remediation_metrics.model import displayDate
+
+STATUSES = ["NEW", "IGNORED", "PATCHED", "REMEDIATION_REQUIRED", "NOT_AFFECTED"]
+SEVERITIES = ["CRITICAL", "HIGH", "MEDIUM", "LOW"]
+POLICIES = [("Banned license", "LICENSE", "BLOCKER"), ("High vulns", "SECURITY", "MAJOR"), ("Old component", "COMPONENT", "MINOR")]
+
+
+def make_instance(projectCount=12, versionsPerProject=3, seed=1):
+    """Build a small synthetic Black Duck instance: projects, versions and per-version responses."""
+    rnd = random.Random(seed)
+    projects = []
+    responses = {}
+    for p in range(projectCount):
+        href = f"https://bd.example/api/projects/p{p}"
+        projects.append({"name": f"project-{p}", "updatedAt": "2026-01-01T00:00:00.000Z", "_meta": {"href": href}})
+        versions = []
+        for v in range(versionsPerProject):
+            vhref = f"{href}/versions/p{p}v{v}"
+            versions.append({"versionName": f"{v}.0", "phase": "DEVELOPMENT", "distribution": "EXTERNAL",
+                             "lastScanDate": "2026-01-0%dT10:00:00.000Z" % (v + 1),
+                             "settingUpdatedAt": "2026-01-01T10:00:00.000Z", "_meta": {"href": vhref}})
+            components = [{"vulnerabilityWithRemediation": {"remediationStatus": rnd.choice(STATUSES),
+                                                            "severity": rnd.choice(SEVERITIES)}}
+                          for _ in range(rnd.randint(0, 20))]
+            policies = [{"name": name, "category": category, "severity": severity, "bomViolationCount": rnd.randint(1, 5)}
+                        for name, category, severity in POLICIES if rnd.random() < 0.5]
+            snippets = {"snippetScanPresent": True, "unreviewedCount": v, "reviewedCount": 1, "ignoredCount": 0, "totalCount": v + 1}
+            responses[vhref] = (snippets, {"items": policies}, {"totalCount": len(components), "items": components})
+        responses[href] = {"totalCount": len(versions), "items": versions}
+    return projects, responses
+
+
+@pytest.fixture
+def fake_instance(monkeypatch):
+    projects, responses = make_instance()
+    fetched = []
+
+    class FakeHub:
+        expiresAt = float("inf")
+
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def get_headers(self):
+            return {}
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(bte, "HubSession", FakeHub)
+    monkeypatch.setattr(bte, "get_projects", lambda hub, parameters=None: {"totalCount": len(projects), "items": projects})
+    monkeypatch.setattr(bte, "get_project_versions",
+                        lambda hub, project, limit=100, parameters={}: responses[project["_meta"]["href"]])
+    monkeypatch.setattr(bte, "get_version_snippets", lambda hub, href: fetched.append(href) or responses[href][0])
+    monkeypatch.setattr(bte, "getPolicyViolations", lambda hub, projectversion: responses[projectversion["_meta"]["href"]][1])
+    monkeypatch.setattr(bte, "get_version_vuln_component_counts",
+                        lambda hub, projectversion: bte.addVulnerableComponents(
+                            bte.newRemediationStatusCounts(), responses[projectversion["_meta"]["href"]][2]["items"]))
+    return projects, responses, fetched
+
+
+def run_collection(monkeypatch, **overrides):
+    options = dict(url="https://bd.example", token="token", project=None, project_group_name=None, project_groups=None, project_version=None,
+                   phaseCategories="PLANNING,DEVELOPMENT,RELEASED,DEPRECATED,ARCHIVED,PRERELEASE",
+                   distributionCategories="EXTERNAL,SAAS,INTERNAL,OPENSOURCE", sinceDays=0, cache=False, workers=1, pool_size=None,
+                   async_collector=False, async_limits=None, incremental=False, filter_stats=False)
+    options.update(overrides)
+    monkeypatch.setattr(bte, "args", Namespace(**options))
+    return bte.addFindings()
+
+
+def test_parallel_collection_matches_serial(fake_instance, monkeypatch):
+    """Collecting with a thread pool must give byte-for-byte the same totals as a serial run."""
+    serial = run_collection(monkeypatch, workers=1)
+    parallel = run_collection(monkeypatch, workers=8)
+    assert json.dumps(serial, indent=3) == json.dumps(parallel, indent=3)
+
+
+def test_instance_totals_are_sum_of_projects(fake_instance, monkeypatch):
+    totals = run_collection(monkeypatch, workers=4)
+    assert totals["Total"] == sum(p["Total"] for p in totals["projects"])
+    assert totals["NEW"]["Total"] == sum(p["NEW"]["Total"] for p in totals["projects"])
+    assert totals["ProjectTotalVersionCount"] == 36
+    assert totals["SNIPPET"]["Total"] == 12 * (1 + 2 + 3)
+    assert [p["projectName"] for p in totals["projects"]] == [f"project-{i}" for i in range(12)]
+
+
+def test_async_collection_matches_serial(fake_instance, monkeypatch):
+    """The asyncio backend folds the same responses into the same totals."""
+    httpx = pytest.importorskip("httpx")
+    from blackduck_remediation_metrics import async_collector
+    projects, responses, _ = fake_instance
+
+    def handler(request):
+        url = str(request.url.copy_with(query=None))
+        base, _, endpoint = url.rpartition("/")
+        if endpoint == "versions":
+            return httpx.Response(200, json=responses[base])
+        index = {"snippet-counts": 0, "policy-rules": 1, "vulnerable-bom-components": 2}[endpoint]
+        return httpx.Response(200, json=responses[base][index])
+
+    collector = async_collector.AsyncCollector
+    monkeypatch.setattr(bte, "AsyncCollector",
+                        lambda limits, **kwargs: collector(limits, transport=httpx.MockTransport(handler), **kwargs))
+    serial = run_collection(monkeypatch)
+    concurrent = run_collection(monkeypatch, async_collector=True, async_limits="vulnerable-bom-components=2")
+    assert json.dumps(serial, indent=3) == json.dumps(concurrent, indent=3)
+
+
+def test_async_collection_renews_expired_token_off_the_loop(fake_instance, monkeypatch):
+    """A token expiring mid-run is renewed on an executor thread, the loop thread never blocks on the session lock."""
+    httpx = pytest.importorskip("httpx")
+    import threading
+    from time import monotonic
+    from blackduck_remediation_metrics import async_collector
+    projects, responses, _ = fake_instance
+    hubs = []
+
+    class ExpiringHub:
+        def __init__(self, *args, **kwargs):
+            self.token = "bearer-1"
+            self.expiresAt = float("inf")
+            self.renewals = []
+            hubs.append(self)
+
+        def refresh_token(self, staleToken):
+            if self.token == staleToken:
+                self.renewals.append(threading.current_thread().name)
+                self.token = f"bearer-{len(self.renewals) + 1}"
+                self.expiresAt = float("inf")
+
+        def get_headers(self):
+            if monotonic() >= self.expiresAt:
+                self.refresh_token(self.token)
+            return {"Authorization": f"Bearer {self.token}"}
+
+        def close(self):
+            pass
+
+    requestCount = [0]
+
+    def handler(request):
+        hub, = hubs
+        if request.headers["Authorization"] != f"Bearer {hub.token}":
+            return httpx.Response(401, json={})
+        requestCount[0] += 1
+        if requestCount[0] == 20:
+            hub.expiresAt = 0
+        url = str(request.url.copy_with(query=None))
+        base, _, endpoint = url.rpartition("/")
+        if endpoint == "versions":
+            return httpx.Response(200, json=responses[base])
+        index = {"snippet-counts": 0, "policy-rules": 1, "vulnerable-bom-components": 2}[endpoint]
+        return httpx.Response(200, json=responses[base][index])
+
+    serial = run_collection(monkeypatch)
+    collector = async_collector.AsyncCollector
+    monkeypatch.setattr(bte, "HubSession", ExpiringHub)
+    monkeypatch.setattr(bte, "AsyncCollector",
+                        lambda limits, **kwargs: collector(limits, transport=httpx.MockTransport(handler), **kwargs))
+    concurrent = run_collection(monkeypatch, async_collector=True)
+    assert json.dumps(serial, indent=3) == json.dumps(concurrent, indent=3)
+    assert len(hubs[0].renewals) == 1 and hubs[0].renewals[0] != "bd-async"
+
+
+def test_async_vulnerable_component_pages_are_requested_in_a_window():
+    """Pages of a large BOM are requested a few at a time ahead of the fold, not all at once."""
+    httpx = pytest.importorskip("httpx")
+    import asyncio
+    from blackduck_remediation_metrics import async_collector
+
+    class Hub:
+        expiresAt = float("inf")
+
+        def get_headers(self):
+            return {"Authorization": "Bearer token"}
+
+    async def handler(request):
+        await asyncio.sleep(0.001)
+        offset = int(request.url.params.get("offset", 0))
+        return httpx.Response(200, json={"totalCount": 20500, "items": [{}] * min(1000, 20500 - offset)})
+
+    collector = async_collector.AsyncCollector(bte.parseEndpointLimits("vulnerable-bom-components=2"), transport=httpx.MockTransport(handler),
+                                               newComponentCounts=lambda: [0],
+                                               addComponents=lambda counts, items: counts.__setitem__(0, counts[0] + len(items)))
+    get = collector._get
+    inFlight = [0, 0]
+
+    async def countingGet(*args, **kwargs):
+        inFlight[0] += 1
+        inFlight[1] = max(inFlight)
+        try:
+            return await get(*args, **kwargs)
+        finally:
+            inFlight[0] -= 1
+    collector._get = countingGet
+    try:
+        counts = asyncio.run_coroutine_threadsafe(collector._getVulnerableComponents(Hub(), "https://bd.example/v1"), collector.loop).result()
+    finally:
+        collector.close()
+    assert counts == [20500]
+    assert inFlight[1] <= 2
+
+
+def test_parse_endpoint_limits():
+    from blackduck_remediation_metrics.async_collector import parseEndpointLimits, DEFAULT_ENDPOINT_LIMITS
+    assert parseEndpointLimits(None) == DEFAULT_ENDPOINT_LIMITS
+    assert parseEndpointLimits("snippet-counts=5")["snippet-counts"] == 5
+    with pytest.raises(ValueError):
+        parseEndpointLimits("bogus=1")
+    with pytest.raises(ValueError):
+        parseEndpointLimits("versions=0")
+
+
+@pytest.mark.parametrize("backend", ["tinydb", "sqlite"])
+def test_cache_refetches_only_changed_versions(fake_instance, monkeypatch, tmp_path, backend):
+    from blackduck_remediation_metrics.cache_store import openCacheStore
+    projects, responses, fetched = fake_instance
+    monkeypatch.setattr(bte, "db", openCacheStore(backend, str(tmp_path / "cache.json")))
+    run_collection(monkeypatch, cache=True)
+    assert len(fetched) == 36
+
+    # Rescan one version of project 3
+    projects[3]["updatedAt"] = "2026-02-01T00:00:00.000Z"
+    version = responses[projects[3]["_meta"]["href"]]["items"][1]
+    version["lastScanDate"] = "2026-02-01T10:00:00.000Z"
+    responses[version["_meta"]["href"]][0]["totalCount"] = 100
+    fetched.clear()
+    cached = run_collection(monkeypatch, cache=True)
+    assert fetched == [version["_meta"]["href"]]
+    assert cached["projects"][3]["SNIPPET"]["Total"] == 1 + 100 + 3
+
+    # Nothing changed, nothing is fetched and the totals match an uncached run
+    fetched.clear()
+    cachedAgain = run_collection(monkeypatch, cache=True)
+    assert fetched == []
+    uncached = run_collection(monkeypatch)
+    assert json.dumps(cached, sort_keys=True) == json.dumps(uncached, sort_keys=True)
+    assert json.dumps(cachedAgain, sort_keys=True) == json.dumps(uncached, sort_keys=True)
+    bte.db.close()
+
+
+def test_sqlite_cache_migrates_tinydb_file(fake_instance, monkeypatch, tmp_path):
+    from blackduck_remediation_metrics.cache_store import openCacheStore
+    _, _, fetched = fake_instance
+    monkeypatch.setattr(bte, "db", openCacheStore("tinydb", str(tmp_path / "cache.json")))
+    tinydbTotals = run_collection(monkeypatch, cache=True)
+    bte.db.close()
+
+    store = openCacheStore("sqlite", str(tmp_path / "cache.json"))
+    assert (tmp_path / "cache.sqlite").exists()
+    assert len(store.all_projects()) == 12
+    assert len(store.get_versions(store.all_projects()[0]["projectID"])) == 3
+    monkeypatch.setattr(bte, "db", store)
+    fetched.clear()
+    sqliteTotals = run_collection(monkeypatch, cache=True)
+    assert fetched == []
+    assert json.dumps(sqliteTotals, sort_keys=True) == json.dumps(tinydbTotals, sort_keys=True)
+    store.close()
+
+
+def write_baseline_cache(monkeypatch, path):
+    """Cache file in the format of the releases before the version cache: project records in the default table
+    of TinyDB, without version records or the filters they were collected with"""
+    monkeypatch.setattr(bte, "db", None)
+    records = run_collection(monkeypatch)["projects"]
+    with open(path, "w") as cacheFile:
+        json.dump({"_default": {str(docId): record for docId, record in enumerate(records, 1)}}, cacheFile)
+    return records
+
+
+@pytest.mark.parametrize("backend", ["tinydb", "sqlite"])
+def test_cache_reads_baseline_project_records(fake_instance, monkeypatch, tmp_path, backend):
+    from blackduck_remediation_metrics.cache_store import openCacheStore
+    records = write_baseline_cache(monkeypatch, tmp_path / "cache.json")
+    store = openCacheStore(backend, str(tmp_path / "cache.json"))
+    assert sorted(record["projectID"] for record in store.all_projects()) == sorted(record["projectID"] for record in records)
+    assert store.get_project("p1") == records[1]
+    store.close()
+    # The records stay where they were moved to
+    store = openCacheStore(backend, str(tmp_path / "cache.json"))
+    assert store.get_project("p1") == records[1]
+    store.close()
+
+
+def test_records_without_filter_signature_are_reused_under_the_filters_of_the_first_run(fake_instance, monkeypatch, tmp_path):
+    from blackduck_remediation_metrics.cache_store import openCacheStore
+    _, _, fetched = fake_instance
+    write_baseline_cache(monkeypatch, tmp_path / "cache.json")
+    uncached = run_collection(monkeypatch, phaseCategories="DEVELOPMENT")
+    monkeypatch.setattr(bte, "db", openCacheStore("tinydb", str(tmp_path / "cache.json")))
+    fetched.clear()
+    cached = run_collection(monkeypatch, cache=True, phaseCategories="DEVELOPMENT")
+    assert fetched == []
+    assert json.dumps(cached, sort_keys=True) == json.dumps(uncached, sort_keys=True)
+    bte.db.close()
+
+    # The records stay taken as collected with the development phase only, a run of all phases collects again
+    monkeypatch.setattr(bte, "db", openCacheStore("tinydb", str(tmp_path / "cache.json")))
+    fetched.clear()
+    run_collection(monkeypatch, cache=True)
+    assert len(fetched) == 36
+    bte.db.close()
+
+
+def test_projects_have_iso_scan_dates_from_collection(fake_instance, monkeypatch):
+    totals = run_collection(monkeypatch)
+    project = totals["projects"][0]
+    assert [version["lastScanDate"] for version in project["projectVersionLevelCounts"]] == ["2026-01-01", "2026-01-02", "2026-01-03"]
+    assert project["latestScanDate"] == "2026-01-03"
+    assert list(project)[-1] == "latestScanDate"
+
+
+def test_cached_records_with_display_dates_are_read_as_iso_dates(fake_instance, monkeypatch, tmp_path):
+    from blackduck_remediation_metrics.cache_store import openCacheStore
+    _, _, fetched = fake_instance
+    records = write_baseline_cache(monkeypatch, tmp_path / "cache.json")
+    # Records of earlier versions hold display dates and no latest scan date
+    for record in records:
+        del record["latestScanDate"]
+        for version in record["projectVersionLevelCounts"]:
+            version["lastScanDate"] = displayDate(version["lastScanDate"])
+        for policies in record["policyDetails"].values():
+            for policyData in policies.values():
+                for projectInfo in policyData["projects"].values():
+                    for hit in projectInfo["versions"]:
+                        hit["lastScanDate"] = displayDate(hit["lastScanDate"])
+    with open(tmp_path / "cache.json", "w") as cacheFile:
+        json.dump({"_default": {str(docId): record for docId, record in enumerate(records, 1)}}, cacheFile)
+    uncached = run_collection(monkeypatch)
+    monkeypatch.setattr(bte, "db", openCacheStore("tinydb", str(tmp_path / "cache.json")))
+    fetched.clear()
+    cached = run_collection(monkeypatch, cache=True)
+    assert fetched == []
+    assert json.dumps(cached, sort_keys=True) == json.dumps(uncached, sort_keys=True)
+    bte.db.close()
+
+
+def test_sqlite_cache_migrates_again_after_an_empty_migration(fake_instance, monkeypatch, tmp_path):
+    from blackduck_remediation_metrics.cache_store import openCacheStore
+    openCacheStore("sqlite", str(tmp_path / "cache.sqlite")).close()
+    write_baseline_cache(monkeypatch, tmp_path / "cache.json")
+    store = openCacheStore("sqlite", str(tmp_path / "cache.json"))
+    assert len(store.all_projects()) == 12
+    store.close()
+
+
+def test_resume_skips_checkpointed_projects(fake_instance, monkeypatch, tmp_path):
+    from blackduck_remediation_metrics.checkpoint import CheckpointJournal
+    projects, responses, fetched = fake_instance
+    journalPath = str(tmp_path / "checkpoint.jsonl")
+    snippets = bte.get_version_snippets
+    failingVersion = projects[7]["_meta"]["href"] + "/versions/p7v0"
+
+    def failingSnippets(hub, href):
+        if href == failingVersion:
+            raise ConnectionError("network blip")
+        return snippets(hub, href)
+
+    # The first run dies in project 7, after projects 0-6 were journaled
+    monkeypatch.setattr(bte, "get_version_snippets", failingSnippets)
+    monkeypatch.setattr(bte, "checkpoint", CheckpointJournal(journalPath, {"url": "https://bd.example"}))
+    with pytest.raises(ConnectionError):
+        run_collection(monkeypatch)
+    bte.checkpoint.close()
+    # Simulate a record cut short by the crash
+    with open(journalPath, "a") as journal:
+        journal.write('{"projectID": "p7", "Tot')
+
+    monkeypatch.setattr(bte, "get_version_snippets", snippets)
+    monkeypatch.setattr(bte, "checkpoint", CheckpointJournal(journalPath, {"url": "https://bd.example"}, resume=True))
+    fetched.clear()
+    resumed = run_collection(monkeypatch)
+    bte.checkpoint.close()
+    assert sorted(set(href.split("/")[-1][:-2] for href in fetched)) == ["p10", "p11", "p7", "p8", "p9"]
+
+    monkeypatch.setattr(bte, "checkpoint", None)
+    uncached = run_collection(monkeypatch)
+    assert json.dumps(resumed, sort_keys=True) == json.dumps(uncached, sort_keys=True)
+    # All 12 projects are in the journal now, so a second resume fetches nothing
+    assert len(CheckpointJournal.load(journalPath, {"url": "https://bd.example"})) == 12
+
+
+def test_resumed_projects_are_written_to_the_cache(fake_instance, monkeypatch, tmp_path):
+    from blackduck_remediation_metrics.cache_store import openCacheStore
+    from blackduck_remediation_metrics.checkpoint import CheckpointJournal
+    projects, responses, fetched = fake_instance
+    journalPath = str(tmp_path / "checkpoint.jsonl")
+    snippets = bte.get_version_snippets
+    failingVersion = projects[7]["_meta"]["href"] + "/versions/p7v0"
+
+    def failingSnippets(hub, href):
+        if href == failingVersion:
+            raise ConnectionError("killed")
+        return snippets(hub, href)
+
+    # The run is killed in project 7, the batched cache writes of projects 0-6 are never flushed
+    monkeypatch.setattr(bte, "get_version_snippets", failingSnippets)
+    monkeypatch.setattr(bte, "db", openCacheStore("tinydb", str(tmp_path / "cache.json")))
+    monkeypatch.setattr(bte, "checkpoint", CheckpointJournal(journalPath, {"url": "https://bd.example"}))
+    with pytest.raises(ConnectionError):
+        run_collection(monkeypatch, cache=True)
+    bte.checkpoint.close()
+
+    monkeypatch.setattr(bte, "get_version_snippets", snippets)
+    monkeypatch.setattr(bte, "db", openCacheStore("tinydb", str(tmp_path / "cache.json")))
+    monkeypatch.setattr(bte, "checkpoint", CheckpointJournal(journalPath, {"url": "https://bd.example"}, resume=True))
+    run_collection(monkeypatch, cache=True)
+    bte.checkpoint.close(remove=True)
+    bte.db.close()
+
+    store = openCacheStore("tinydb", str(tmp_path / "cache.json"))
+    assert sorted(record["projectID"] for record in store.all_projects()) == sorted(f"p{index}" for index in range(12))
+    assert all(bte.isReusableProjectRecord(store.get_project(f"p{index}"), projects[index]) for index in range(12))
+    store.close()
+
+
+class FakeResponse:
+    def __init__(self, jsondata, status_code=200):
+        self.jsondata = jsondata
+        self.status_code = status_code
+
+    def json(self):
+        return self.jsondata
+
+
+def test_get_all_pages_merges_pages_in_order(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    items = list(range(2500))
+    calls = []
+
+    class PagedHub:
+        def get(self, url, accept=None, params=None):
+            calls.append(params)
+            offset = params.get("offset", 0)
+            return FakeResponse({"totalCount": len(items), "items": items[offset:offset + params["limit"]]})
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        monkeypatch.setattr(bte, "pageExecutor", executor)
+        response, jsondata = bte.get_all_pages(PagedHub(), "https://bd.example/api/projects", "accept")
+    assert jsondata["items"] == items
+    assert sorted(call.get("offset", 0) for call in calls) == [0, 1000, 2000]
+
+
+def test_vulnerable_components_are_counted_page_by_page(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    components = [{"vulnerabilityWithRemediation": {"remediationStatus": STATUSES[i % len(STATUSES)],
+                                                    "severity": SEVERITIES[i % len(SEVERITIES)]}} for i in range(2500)]
+    components.append({"vulnerabilityWithRemediation": {}})
+
+    class PagedHub:
+        def get(self, url, accept=None, params=None):
+            offset = params.get("offset", 0)
+            return FakeResponse({"totalCount": len(components), "items": components[offset:offset + params["limit"]]})
+
+    monkeypatch.setattr(bte, "args", Namespace(workers=2))
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        monkeypatch.setattr(bte, "pageExecutor", executor)
+        counts = bte.get_version_vuln_component_counts(PagedHub(), {"_meta": {"href": "https://bd.example/v"}}).to_dict()
+    assert counts["Total"] == 2501
+    assert counts["NONE"]["NONE"] == 1
+    assert counts["NEW"]["Total"] == 500
+    assert sum(counts[status]["Total"] for status in bte.REMEDIATION_STATUSES) == 2501
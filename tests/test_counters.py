@@ -0,0 +1,50 @@
+"""Tests for the count matrices behind the vulnerability and policy totals."""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src to path for testing
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from blackduck_remediation_metrics.counters import RemediationCounts, PolicyCounts, LevelTotals, REMEDIATION_STATUSES
+
+
+def test_remediation_counts_round_trip_in_json_shape():
+    counts = RemediationCounts()
+    counts.count_labels(["NEW", "NEW", "PATCHED"], ["HIGH", "LOW", "HIGH"])
+    counts.count("NONE", "NONE")
+    asDict = counts.to_dict()
+    assert list(asDict) == ["Total"] + REMEDIATION_STATUSES
+    assert asDict["Total"] == 4
+    assert asDict["NEW"] == {"Total": 2, "MEDIUM": 0, "HIGH": 1, "CRITICAL": 0, "LOW": 1, "NONE": 0}
+    assert RemediationCounts.from_dict(asDict).to_dict() == asDict
+
+
+def test_unknown_labels_are_rejected():
+    with pytest.raises(KeyError):
+        RemediationCounts().count_labels(["NEW"], ["SEVERE"])
+    with pytest.raises(KeyError):
+        PolicyCounts().count("BOGUS", "MAJOR", 1)
+
+
+def test_sum_of_versions_matches_project_totals():
+    versions = []
+    projectTotals = LevelTotals()
+    for index in range(5):
+        vulnerabilities = RemediationCounts()
+        vulnerabilities.count_labels(["NEW"] * index, ["CRITICAL"] * index)
+        policyViolations = PolicyCounts()
+        policyViolations.count("LICENSE", "BLOCKER", index)
+        projectTotals.vulnerabilities.add(vulnerabilities)
+        projectTotals.policyViolations.add(policyViolations)
+        projectTotals.add_snippets(index, 1, 0, index + 1)
+        versions.append({"vulnerableComponentCountsByRemediationStatus": vulnerabilities.to_dict(),
+                         "policyViolations": policyViolations.to_dict(),
+                         "snippets": {"unreviewed": index, "reviewed": 1, "ignored": 0, "Total": index + 1}})
+    project = projectTotals.write_to({})
+    assert project == LevelTotals.from_versions(versions).write_to({})
+    assert project["Total"] == 10
+    assert project["policyViolations"]["LICENSE"]["BLOCKER"] == 10
+    assert project["SNIPPET"] == {"Total": 15, "unreviewed": 10, "reviewed": 5, "ignored": 0, "NONE": 0}
+    assert LevelTotals.from_level(project).write_to({}) == project
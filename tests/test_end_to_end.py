@@ -0,0 +1,266 @@
+"""End-to-end tests running main() against the local mock Black Duck server."""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src and benchmarks to path for testing
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+
+from blackduck_remediation_metrics import blackduck_triage_extract as bte
+from mock_blackduck import MockInstance, MockBlackDuckServer
+
+
+@pytest.fixture
+def mock_server():
+    # More than one page of components for some versions and more than one project group
+    instance = MockInstance(projects=60, versions=2, components=600, seed=3)
+    with MockBlackDuckServer(instance) as server:
+        yield instance, server
+
+
+def run_main(monkeypatch, server, outputDir, *extraArgs):
+    outputDir.mkdir(exist_ok=True)
+    # Reports of an earlier run into the same directory, the file names differ only by the second they were written in
+    for report in outputDir.glob("triageReport_bd_*"):
+        report.unlink()
+    monkeypatch.setattr(sys, "argv", ["bd-metrics", "--url", server.url, "--token", "mock", "--dir", str(outputDir), "--json"] + list(extraArgs))
+    bte.main()
+    report, = Path(outputDir).glob("triageReport_bd_*.json")
+    return json.loads(report.read_text())
+
+
+def test_main_collects_mock_instance(mock_server, monkeypatch, tmp_path):
+    instance, server = mock_server
+    totals = run_main(monkeypatch, server, tmp_path, "--workers", "4")
+    assert totals["ProjectTotalCount"] == 60
+    assert totals["ProjectTotalVersionCount"] == 120
+    assert totals["Total"] == instance.totalVulnerableComponents()
+
+
+def test_project_group_matches_all_projects(mock_server, monkeypatch, tmp_path):
+    instance, server = mock_server
+    allProjects = run_main(monkeypatch, server, tmp_path / "all")
+    grouped = run_main(monkeypatch, server, tmp_path / "group", "--project-group", "benchmark")
+    assert grouped["ProjectTotalCount"] == 60
+    assert grouped["Total"] == allProjects["Total"]
+
+
+def test_metrics_file_records_endpoints_and_cache(mock_server, monkeypatch, tmp_path):
+    instance, server = mock_server
+    run_main(monkeypatch, server, tmp_path / "cold", "--cache", "--metrics-file", "metrics.json")
+    cold = json.loads((tmp_path / "cold" / "metrics.json").read_text())
+    assert cold["run"]["success"] is True
+    assert cold["run"]["projects"] == 60
+    assert cold["endpoints"]["versions"]["requests"] == 60
+    assert cold["endpoints"]["snippet-counts"]["requests"] == 120
+    assert cold["endpoints"]["vulnerable-bom-components"]["requests"] > 120
+    assert cold["endpoints"]["vulnerable-bom-components"]["latencySeconds"]["p99"] > 0
+    assert cold["cache"]["project"] == {"hits": 0, "misses": 60}
+    assert cold["cache"]["result"] == {"hits": 0, "misses": 1}
+    prom = (tmp_path / "cold" / "metrics.prom").read_text()
+    assert 'bd_metrics_requests_total{endpoint="policy-rules",status="200"} 120' in prom
+    assert 'bd_metrics_request_duration_seconds_count{endpoint="versions"} 60' in prom
+
+    (tmp_path / "warm").mkdir()
+    (tmp_path / "warm" / "bd_remediation_db.json").write_text((tmp_path / "cold" / "bd_remediation_db.json").read_text())
+    run_main(monkeypatch, server, tmp_path / "warm", "--cache", "--metrics-file", "metrics.json")
+    warm = json.loads((tmp_path / "warm" / "metrics.json").read_text())
+    # Nothing has changed, the aggregated results of the cold run are taken as they are
+    assert warm["cache"] == {"result": {"hits": 1, "misses": 0}}
+    assert "versions" not in warm["endpoints"]
+
+
+def test_profile_writes_stats_and_allocations_per_phase(monkeypatch, tmp_path):
+    import pstats
+    # Tracing every allocation is slow, so profile a small instance
+    with MockBlackDuckServer(MockInstance(projects=5, versions=2, components=20)) as server:
+        run_main(monkeypatch, server, tmp_path, "--profile", "--html")
+    profileDir, = tmp_path.glob("profile_*")
+    phases = sorted(path.name for path in profileDir.glob("*.pstats"))
+    assert phases == ["01_collection.pstats", "02_render_report.pstats", "03_json.pstats"]
+    assert pstats.Stats(str(profileDir / "01_collection.pstats")).total_calls > 0
+    allocations = (profileDir / "02_render_report_allocations.txt").read_text()
+    assert "Peak traced memory" in allocations and "cumulative" in allocations
+    assert "render_report" in (profileDir / "summary.txt").read_text()
+
+
+def test_compressed_reports_match_uncompressed(monkeypatch, tmp_path):
+    import gzip
+    with MockBlackDuckServer(MockInstance(projects=8, versions=2, components=30)) as server:
+        totals = run_main(monkeypatch, server, tmp_path / "plain", "--html", "--dashboard")
+        run_main(monkeypatch, server, tmp_path / "compressed", "--html", "--dashboard", "--compress")
+    report, = (tmp_path / "plain").glob("triageReport_bd_*.json")
+    assert report.read_text() == json.dumps(totals, indent=3)
+    for pattern in ("triageReport_bd_*.html", "dashboard_bd_*.html"):
+        plain, = (tmp_path / "plain").glob(pattern)
+        compressed, = (tmp_path / "compressed").glob(pattern + ".gz")
+        # Only the report time may differ between the runs
+        plainLines = [line for line in plain.read_text(encoding="utf-8").splitlines() if "Generated" not in line]
+        compressedLines = [line for line in gzip.decompress(compressed.read_bytes()).decode("utf-8").splitlines() if "Generated" not in line]
+        assert plainLines == compressedLines
+        assert any("project-00007" in line for line in plainLines)
+
+
+@pytest.mark.parametrize("reportWorkers", ["1", "2"])
+def test_project_groups_write_one_report_per_group(mock_server, monkeypatch, tmp_path, reportWorkers):
+    instance, server = mock_server
+    allProjects = run_main(monkeypatch, server, tmp_path / "all")
+    outputDir = tmp_path / "groups"
+    outputDir.mkdir()
+    monkeypatch.setattr(sys, "argv", ["bd-metrics", "--url", server.url, "--token", "mock", "--dir", str(outputDir), "--json", "--html",
+                                      "--project-groups", "group-0, group-1", "--report-workers", reportWorkers, "--metrics-file", "metrics.json"])
+    bte.main()
+    # The union is collected once
+    assert json.loads((outputDir / "metrics.json").read_text())["endpoints"]["versions"]["requests"] == 60
+    groups = {}
+    for group in ("group-0", "group-1"):
+        report, = outputDir.glob(f"triageReport_bd_{group}_*.json")
+        groups[group] = json.loads(report.read_text())
+        html, = outputDir.glob(f"triageReport_bd_{group}_*.html")
+        assert group in html.read_text(encoding="utf-8")
+    assert [groups[group]["ProjectTotalCount"] for group in groups] == [50, 10]
+    assert groups["group-0"]["Total"] + groups["group-1"]["Total"] == allProjects["Total"]
+    assert groups["group-1"]["projects"] == allProjects["projects"][50:]
+
+
+@pytest.mark.parametrize("backend", ["tinydb", "sqlite"])
+def test_incremental_lists_only_updated_projects(mock_server, monkeypatch, tmp_path, backend):
+    instance, server = mock_server
+    options = ["--cache", "--incremental", "--cache-backend", backend, "--metrics-file", "metrics.json"]
+    full = run_main(monkeypatch, server, tmp_path / "first", *options)
+    firstMetrics = json.loads((tmp_path / "first" / "metrics.json").read_text())
+    assert firstMetrics["endpoints"]["projects"]["requests"] == 1
+
+    for cacheFile in (tmp_path / "first").glob("bd_remediation_db.*"):
+        (tmp_path / "second").mkdir(exist_ok=True)
+        (tmp_path / "second" / cacheFile.name).write_bytes(cacheFile.read_bytes())
+    instance.touch(7, "2026-02-01T00:00:00.000Z")
+    incremental = run_main(monkeypatch, server, tmp_path / "second", *options)
+    metrics = json.loads((tmp_path / "second" / "metrics.json").read_text())
+    # One listing page with the touched project and the first unchanged one, only the touched project is collected again
+    assert metrics["endpoints"]["projects"]["requests"] == 1
+    assert metrics["cache"]["project"] == {"hits": 59, "misses": 1}
+    assert metrics["endpoints"]["versions"]["requests"] == 1
+    assert incremental["projects"][7]["updatedAt"] == "2026-02-01T00:00:00.000Z"
+    for project in incremental["projects"]:
+        project.pop("updatedAt")
+    for project in full["projects"]:
+        project.pop("updatedAt")
+    assert incremental == full
+
+    # A deleted project cannot be seen in the updated projects, all projects are listed again
+    for cacheFile in (tmp_path / "second").glob("bd_remediation_db.*"):
+        (tmp_path / "third").mkdir(exist_ok=True)
+        (tmp_path / "third" / cacheFile.name).write_bytes(cacheFile.read_bytes())
+    instance.projectCount = 59
+    afterDelete = run_main(monkeypatch, server, tmp_path / "third", *options)
+    assert afterDelete["ProjectTotalCount"] == 59
+    assert json.loads((tmp_path / "third" / "metrics.json").read_text())["endpoints"]["projects"]["requests"] == 2
+
+
+def test_version_filters_are_applied_by_the_server(monkeypatch, tmp_path):
+    instance = MockInstance(projects=30, versions=4, components=20, seed=5)
+    filters = ["--phaseCategories", "RELEASED,ARCHIVED", "--distributionCategories", "EXTERNAL,SAAS", "--filter-stats", "--metrics-file", "metrics.json"]
+    with MockBlackDuckServer(instance) as server:
+        versions = [version for projectIndex in range(30) for version in instance.versions(server.url, projectIndex)]
+        phaseKept = [version for version in versions if version["phase"] in ("RELEASED", "ARCHIVED")]
+        kept = [version for version in phaseKept if version["distribution"] in ("EXTERNAL", "SAAS")]
+        expectedRun = {"versions_listed": 120, "versions_kept": len(kept), "versions_eliminated_by_phase": 120 - len(phaseKept),
+                       "versions_eliminated_by_distribution": len(phaseKept) - len(kept)}
+
+        filtered = run_main(monkeypatch, server, tmp_path / "filtered", "--cache", *filters)
+        assert filtered["ProjectTotalVersionCount"] == len(kept)
+        metrics = json.loads((tmp_path / "filtered" / "metrics.json").read_text())
+        assert metrics["run"].items() >= expectedRun.items()
+        # Only the kept versions are collected
+        assert metrics["endpoints"]["snippet-counts"]["requests"] == len(kept)
+
+        # Cached projects collected without filters are filtered client-side, with the same result
+        run_main(monkeypatch, server, tmp_path / "all", "--cache")
+        (tmp_path / "cached").mkdir()
+        (tmp_path / "cached" / "bd_remediation_db.json").write_text((tmp_path / "all" / "bd_remediation_db.json").read_text())
+        cached = run_main(monkeypatch, server, tmp_path / "cached", "--cache", *filters)
+        metrics = json.loads((tmp_path / "cached" / "metrics.json").read_text())
+        assert metrics["run"].items() >= expectedRun.items()
+        assert "versions" not in metrics["endpoints"]
+        assert cached["Total"] == filtered["Total"]
+        assert [project for project in cached["projects"] if project["projectVersionCount"]] == \
+            [project for project in filtered["projects"] if project.get("projectVersionCount")]
+
+
+def test_cached_projects_are_not_reused_under_other_filters(monkeypatch, tmp_path):
+    with MockBlackDuckServer(MockInstance(projects=20, versions=4, components=20, seed=7)) as server:
+        released = run_main(monkeypatch, server, tmp_path / "released", "--cache", "--phaseCategories", "RELEASED")
+        (tmp_path / "all").mkdir()
+        (tmp_path / "all" / "bd_remediation_db.json").write_text((tmp_path / "released" / "bd_remediation_db.json").read_text())
+        allVersions = run_main(monkeypatch, server, tmp_path / "all", "--cache", "--metrics-file", "metrics.json")
+        metrics = json.loads((tmp_path / "all" / "metrics.json").read_text())
+        # Records collected with only the released versions cannot give the other phases
+        assert metrics["cache"]["project"] == {"hits": 0, "misses": 20}
+        assert allVersions["ProjectTotalVersionCount"] == 80 > released["ProjectTotalVersionCount"]
+
+        # The same run again takes the results of the previous one, the released run keeps its own
+        again = run_main(monkeypatch, server, tmp_path / "all", "--cache", "--metrics-file", "metrics.json")
+        assert json.loads((tmp_path / "all" / "metrics.json").read_text())["cache"] == {"result": {"hits": 1, "misses": 0}}
+        assert again["projects"] == allVersions["projects"]
+        releasedAgain = run_main(monkeypatch, server, tmp_path / "all", "--cache", "--phaseCategories", "RELEASED", "--metrics-file", "metrics.json")
+        assert json.loads((tmp_path / "all" / "metrics.json").read_text())["cache"] == {"result": {"hits": 1, "misses": 0}}
+        assert releasedAgain["Total"] == released["Total"]
+
+
+def test_csv_fact_tables_add_up_to_the_totals(monkeypatch, tmp_path):
+    import csv
+    with MockBlackDuckServer(MockInstance(projects=8, versions=2, components=30)) as server:
+        totals = run_main(monkeypatch, server, tmp_path, "--csv")
+
+    def column_sum(table, column):
+        path, = tmp_path.glob(f"triageReport_bd_*_{table}.csv")
+        with open(path, newline="", encoding="utf-8") as f:
+            return sum(int(row[column]) for row in csv.DictReader(f))
+    assert column_sum("findings", "count") == totals["Total"]
+    assert column_sum("policy_hits", "violationCount") == sum(counts["Total"] for counts in totals["policyViolations"].values())
+    assert column_sum("snippets", "count") == totals["SNIPPET"]["Total"]
+
+
+def test_filter_stats_are_counted_when_nothing_has_changed(monkeypatch, tmp_path, capsys):
+    filters = ["--cache", "--phaseCategories", "RELEASED,ARCHIVED", "--filter-stats", "--metrics-file", "metrics.json"]
+    with MockBlackDuckServer(MockInstance(projects=20, versions=4, components=20, seed=5)) as server:
+        first = run_main(monkeypatch, server, tmp_path, *filters)
+        firstStats = [line for line in capsys.readouterr().out.splitlines() if line.startswith("Version filters:")]
+        firstRun = json.loads((tmp_path / "metrics.json").read_text())["run"]
+        second = run_main(monkeypatch, server, tmp_path, *filters)
+        secondStats = [line for line in capsys.readouterr().out.splitlines() if line.startswith("Version filters:")]
+        secondRun = json.loads((tmp_path / "metrics.json").read_text())["run"]
+    assert firstStats == secondStats and "phase eliminated" in secondStats[0]
+    for key in ("versions_listed", "versions_kept", "versions_eliminated_by_phase"):
+        assert secondRun[key] == firstRun[key]
+    assert second["Total"] == first["Total"]
+
+
+def test_filter_stats_count_resumed_projects(monkeypatch, tmp_path):
+    instance = MockInstance(projects=20, versions=4, components=20, seed=5)
+    filters = ["--resume", "--phaseCategories", "RELEASED,ARCHIVED", "--filter-stats", "--metrics-file", "metrics.json"]
+    with MockBlackDuckServer(instance) as server:
+        versions = [version for projectIndex in range(20) for version in instance.versions(server.url, projectIndex)]
+        kept = [version for version in versions if version["phase"] in ("RELEASED", "ARCHIVED")]
+        # The first run dies in project 10, after projects 0-9 were journaled
+        snippets = bte.get_version_snippets
+        failingVersions = {version["_meta"]["href"] for version in instance.versions(server.url, 10)}
+
+        def failingSnippets(hub, href):
+            if href in failingVersions:
+                raise ConnectionError("network blip")
+            return snippets(hub, href)
+        monkeypatch.setattr(bte, "get_version_snippets", failingSnippets)
+        with pytest.raises(SystemError):
+            run_main(monkeypatch, server, tmp_path, *filters)
+        monkeypatch.setattr(bte, "get_version_snippets", snippets)
+        run_main(monkeypatch, server, tmp_path, *filters)
+    metrics = json.loads((tmp_path / "metrics.json").read_text())
+    assert metrics["cache"]["checkpoint"]["hits"] > 0
+    assert metrics["run"]["versions_listed"] == 80
+    assert metrics["run"]["versions_kept"] == len(kept)
+    assert metrics["run"]["versions_eliminated_by_phase"] == 80 - len(kept)
@@ -0,0 +1,55 @@
+"""Tests for the tidy fact table export."""
+import csv
+import sys
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+# Add src to path for testing
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from blackduck_remediation_metrics.fact_tables import findingRows, policyHitRows, snippetRows, writeFactTables
+
+
+def make_project():
+    version = {"versionID": "v1", "versionName": "1.0", "lastScanDate": "2026-01-15", "isDormant": False,
+               "phase": "RELEASED", "distribution": "EXTERNAL", "snippets": {"unreviewed": 2, "reviewed": 0, "ignored": 1, "Total": 3},
+               "vulnerableComponentCountsByRemediationStatus": {"Total": 4, "NEW": {"Total": 3, "HIGH": 1, "CRITICAL": 2},
+                                                                "PATCHED": {"Total": 1, "LOW": 1}}}
+    unscanned = dict(version, versionID="v2", versionName="2.0", lastScanDate=None, snippets={}, vulnerableComponentCountsByRemediationStatus={})
+    hit = {"versionName": "1.0", "versionID": "v1", "phase": "RELEASED", "distribution": "EXTERNAL", "lastScanDate": "2026-01-10",
+           "isDormant": False, "violationCount": 5, "severity": "MAJOR"}
+    return {"projectID": "p1", "projectName": "Project 1", "projectVersionLevelCounts": [version, unscanned],
+            "policyDetails": {"LICENSE": {"No GPL": {"severity": "MAJOR", "totalCount": 5,
+                                                    "projects": {"p1": {"projectName": "Project 1", "projectID": "p1", "versions": [hit]}}}}}}
+
+
+def test_rows_have_one_count_each():
+    versionColumns = ["p1", "Project 1", "v1", "1.0", "RELEASED", "EXTERNAL", date(2026, 1, 15), False]
+    projects = [make_project(), {"projectID": "p2", "projectName": "Without versions"}]
+    assert list(findingRows(projects)) == [versionColumns + ["NEW", "HIGH", 1], versionColumns + ["NEW", "CRITICAL", 2],
+                                           versionColumns + ["PATCHED", "LOW", 1]]
+    # The version columns come from the version record, not from the policy hit
+    assert list(policyHitRows(projects)) == [versionColumns + ["LICENSE", "No GPL", "MAJOR", 5]]
+    assert list(snippetRows(projects)) == [versionColumns + ["unreviewed", 2], versionColumns + ["ignored", 1]]
+
+
+def test_csv_files(tmp_path):
+    files = writeFactTables([make_project()], str(tmp_path / "report"))
+    assert [Path(file).name for file in files] == ["report_findings.csv", "report_policy_hits.csv", "report_snippets.csv"]
+    with open(files[0], newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0] == {"projectID": "p1", "projectName": "Project 1", "versionID": "v1", "versionName": "1.0", "phase": "RELEASED",
+                       "distribution": "EXTERNAL", "lastScanDate": "2026-01-15", "isDormant": "False", "remediationStatus": "NEW",
+                       "severity": "HIGH", "count": "1"}
+    assert sum(int(row["count"]) for row in rows) == 4
+
+
+def test_parquet_files(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    files = writeFactTables([make_project()], str(tmp_path / "report"), csvFiles=False, parquetFiles=True)
+    findings = pq.read_table(files[0])
+    assert findings.num_rows == 3
+    assert findings.column("lastScanDate").to_pylist()[0] == date(2026, 1, 15)
+    assert pq.read_table(files[1]).column("violationCount").to_pylist() == [5]
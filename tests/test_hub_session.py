@@ -0,0 +1,88 @@
+"""Tests for the shared Black Duck HTTP session."""
+import json
+import sys
+from pathlib import Path
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+
+# Add src to path for testing
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from blackduck_remediation_metrics.hub_session import HubSession
+
+
+class FakeBlackDuck(BaseAdapter):
+    """Transport adapter answering the token and project endpoints, rejecting stale bearer tokens"""
+
+    def __init__(self):
+        super().__init__()
+        self.issued = 0
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        response = Response()
+        response.request = request
+        response.url = request.url
+        if request.url.endswith("/api/tokens/authenticate"):
+            self.issued += 1
+            response.status_code = 200
+            response.headers["X-CSRF-TOKEN"] = "csrf"
+            response._content = json.dumps({"bearerToken": f"bearer-{self.issued}", "expiresInMilliseconds": 7200000}).encode()
+        elif request.headers["Authorization"] != f"Bearer bearer-{self.issued}":
+            response.status_code = 401
+            response._content = b"{}"
+        else:
+            response.status_code = 200
+            response._content = json.dumps({"totalCount": 0, "items": []}).encode()
+        return response
+
+    def close(self):
+        pass
+
+
+def make_session(monkeypatch):
+    adapter = FakeBlackDuck()
+    monkeypatch.setattr("blackduck_remediation_metrics.hub_session.HTTPAdapter", lambda **kwargs: adapter)
+    return HubSession("https://bd.example", "api-token"), adapter
+
+
+def test_session_authenticates_once(monkeypatch):
+    hub, adapter = make_session(monkeypatch)
+    for _ in range(5):
+        assert hub.get_projects(limit=10)["totalCount"] == 0
+    assert adapter.issued == 1
+    assert adapter.requests[-1].headers["Accept"] == "application/vnd.blackducksoftware.project-detail-4+json"
+    assert "limit=10" in adapter.requests[-1].url
+
+
+def test_session_renews_token_on_401(monkeypatch):
+    hub, adapter = make_session(monkeypatch)
+    # Black Duck revoked the token behind our back
+    adapter.issued += 1
+    response = hub.get("https://bd.example/api/projects")
+    assert response.status_code == 200
+    assert hub.token == f"bearer-{adapter.issued}"
+
+
+def test_session_renews_expired_token(monkeypatch):
+    hub, adapter = make_session(monkeypatch)
+    hub.expiresAt = 0
+    hub.get("https://bd.example/api/projects")
+    assert adapter.issued == 2
+
+
+def test_session_records_request_metrics(monkeypatch):
+    from blackduck_remediation_metrics.telemetry import RunMetrics
+    adapter = FakeBlackDuck()
+    monkeypatch.setattr("blackduck_remediation_metrics.hub_session.HTTPAdapter", lambda **kwargs: adapter)
+    metrics = RunMetrics()
+    hub = HubSession("https://bd.example", "api-token", metrics=metrics)
+    adapter.issued += 1
+    hub.get("https://bd.example/api/projects/p1/versions")
+    endpoints = metrics.to_dict()["endpoints"]
+    assert endpoints["authenticate"]["requests"] == 2
+    assert endpoints["versions"]["byStatus"] == {"200": 1, "401": 1}
+    assert endpoints["versions"]["retries"] == 1
+    assert endpoints["versions"]["bytesReceived"] > 0
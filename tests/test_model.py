@@ -0,0 +1,49 @@
+"""Tests for the slotted version and policy hit model."""
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add src to path for testing
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from blackduck_remediation_metrics.model import RunClock, Version, PolicyHit, displayDate, isoDate, latestDate
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+def make_version(**fields):
+    version = {"versionName": "1.0", "phase": "RELEASED", "distribution": "EXTERNAL", "lastScanDate": "2026-02-01T10:00:00.000Z",
+               "settingUpdatedAt": "2026-01-15T08:30:00.000Z", "_meta": {"href": "https://bd.example/api/projects/p1/versions/v1"}}
+    version.update(fields)
+    return {key: value for key, value in version.items() if value is not ...}
+
+
+def test_dormancy_is_decided_against_the_run_clock():
+    clock = RunClock(28, now=NOW)
+    assert not Version(make_version(), clock).isDormant
+    assert Version(make_version(lastScanDate="2026-01-31T10:00:00.000Z"), clock).isDormant
+    # Never scanned versions are dormant, a scan date without a value is not
+    assert Version(make_version(lastScanDate=...), clock).isDormant
+    assert not Version(make_version(lastScanDate=None), clock).isDormant
+    assert not Version(make_version(lastScanDate=...), RunClock(0, now=NOW)).isDormant
+
+
+def test_version_and_policy_hit_dicts():
+    version = Version(make_version(phase=...), RunClock(30, now=NOW))
+    assert version.to_dict() == {"versionID": "v1", "versionName": "1.0", "lastScanDate": "2026-02-01", "isDormant": False,
+                                 "phase": "-", "distribution": "EXTERNAL"}
+    assert PolicyHit(version, 3, "MAJOR").to_dict() == {"versionName": "1.0", "versionID": "v1", "phase": "UNKNOWN",
+                                                        "distribution": "EXTERNAL", "lastScanDate": "2026-01-15",
+                                                        "isDormant": False, "violationCount": 3, "severity": "MAJOR"}
+
+
+def test_iso_dates_are_formatted_for_display_once_per_day():
+    assert displayDate(None) == "-"
+    assert displayDate("2026-01-02") == "January 02, 2026"
+    assert displayDate("2026-01-02") is displayDate("2026-01-02")
+    # Display dates of records from earlier versions are read as ISO dates
+    assert isoDate("January 02, 2026") == "2026-01-02"
+    assert isoDate("2026-01-02") == "2026-01-02"
+    assert isoDate("-") is None
+    assert latestDate(["2026-01-02", None, "2025-12-31"]) == "2026-01-02"
+    assert latestDate([None]) is None
@@ -0,0 +1,77 @@
+"""Tests for the pooled Playwright PDF service, against a fake browser."""
+import asyncio
+import sys
+from pathlib import Path
+
+# Add src to path for testing
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from blackduck_remediation_metrics import pdf_service
+
+
+class FakePage:
+    def __init__(self, browser):
+        self.browser = browser
+        self.content = None
+
+    async def emulate_media(self, media):
+        assert media == "print"
+
+    async def set_content(self, html, wait_until, timeout):
+        self.content = html
+        self.browser.open += 1
+        self.browser.maxOpen = max(self.browser.maxOpen, self.browser.open)
+        # Let the other documents start meanwhile
+        await asyncio.sleep(0.01)
+
+    async def wait_for_function(self, expression, timeout):
+        assert expression == pdf_service.CHARTS_RENDERED_SIGNAL
+
+    async def pdf(self, path, **options):
+        Path(path).write_text(self.content)
+
+    async def close(self):
+        self.browser.open -= 1
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.launches = 0
+        self.open = 0
+        self.maxOpen = 0
+        self.closed = False
+
+    async def new_page(self):
+        return FakePage(self)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePlaywright:
+    def __init__(self, browser):
+        self.browser = browser
+        self.chromium = self
+
+    async def launch(self, **options):
+        self.browser.launches += 1
+        return self.browser
+
+    async def start(self):
+        return self
+
+    async def stop(self):
+        pass
+
+
+def test_documents_print_in_parallel_pages_of_one_browser(monkeypatch, tmp_path):
+    browser = FakeBrowser()
+    monkeypatch.setattr(pdf_service, "PLAYWRIGHT_AVAILABLE", True)
+    monkeypatch.setattr(pdf_service, "async_playwright", lambda: FakePlaywright(browser), raising=False)
+    documents = [(f"<html>{i}</html>", str(tmp_path / f"report_{i}.pdf")) for i in range(10)]
+    with pdf_service.PdfService(maxPages=3) as service:
+        service.renderAll(documents)
+        service.render("<html>last</html>", str(tmp_path / "last.pdf"))
+    assert browser.launches == 1 and browser.closed
+    assert browser.maxOpen == 3 and browser.open == 0
+    assert [Path(path).read_text() for _, path in documents] == [html for html, _ in documents]
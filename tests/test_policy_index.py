@@ -0,0 +1,49 @@
+"""Tests for the flat policy hit index."""
+import sys
+from pathlib import Path
+
+# Add src to path for testing
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from blackduck_remediation_metrics.policy_index import PolicyIndex, BREAKDOWN_CATEGORIES
+
+
+def make_hit(versionID, violationCount):
+    return {"versionName": versionID, "versionID": versionID, "violationCount": violationCount, "severity": "MAJOR"}
+
+
+def make_project(projectId, policies):
+    details = {}
+    for category, policyName, hits in policies:
+        details.setdefault(category, {})[policyName] = {
+            "severity": "MAJOR", "totalCount": sum(hit["violationCount"] for hit in hits),
+            "projects": {projectId: {"projectName": "Project " + projectId, "projectID": projectId, "versions": hits}}}
+    return {"projectID": projectId, "policyDetails": details}
+
+
+def test_details_merge_the_projects_in_order():
+    first = make_project("p1", [("SECURITY", "No High", [make_hit("v1", 2), make_hit("v2", 1)]),
+                                ("LICENSE", "No GPL", [make_hit("v1", 4)])])
+    second = make_project("p2", [("SECURITY", "No High", [make_hit("v3", 5)]),
+                                 ("CUSTOM", "Custom rule", [make_hit("v3", 1)])])
+    index = PolicyIndex([first, second, {"projectID": "p3"}])
+    assert len(index) == 5
+    details = index.details()
+    assert list(details) == ["SECURITY", "LICENSE", "CUSTOM"]
+    noHigh = details["SECURITY"]["No High"]
+    assert noHigh["totalCount"] == 8
+    assert list(noHigh["projects"]) == ["p1", "p2"]
+    assert [hit["versionID"] for hit in noHigh["projects"]["p1"]["versions"]] == ["v1", "v2"]
+    # The hits are the records of the project trees, which are left as they were
+    assert noHigh["projects"]["p2"]["versions"][0] is second["policyDetails"]["SECURITY"]["No High"]["projects"]["p2"]["versions"][0]
+    assert noHigh["projects"]["p1"]["versions"] is not first["policyDetails"]["SECURITY"]["No High"]["projects"]["p1"]["versions"]
+    assert first["policyDetails"]["SECURITY"]["No High"]["totalCount"] == 3
+    assert index.breakdown() == {"COMPONENT": {}, "LICENSE": {"No GPL": 4}, "SECURITY": {"No High": 8},
+                                 "OPERATIONAL": {}, "UNCATEGORIZED": {}, "CUSTOM": {"Custom rule": 1}}
+
+
+def test_empty_index():
+    index = PolicyIndex()
+    assert len(index) == 0
+    assert index.details() == {}
+    assert list(index.breakdown()) == BREAKDOWN_CATEGORIES
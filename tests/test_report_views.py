@@ -0,0 +1,102 @@
+"""Tests for the template environment and the view models of the reports."""
+import sys
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+# Add src to path for testing
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from blackduck_remediation_metrics import blackduck_triage_extract as bte
+from blackduck_remediation_metrics.counters import RemediationCounts, PolicyCounts, LevelTotals
+from blackduck_remediation_metrics.report_views import templateEnvironment, reportView, dashboardView, dashboardPayload
+
+
+def make_project(name, findings, policyViolations=0):
+    """Project level counts with one version holding the given (status, severity) findings"""
+    vulnerabilities = RemediationCounts()
+    vulnerabilities.count_labels([status for status, _ in findings], [severity for _, severity in findings])
+    policies = PolicyCounts()
+    policies.count("LICENSE", "MAJOR", policyViolations)
+    version = {"versionName": "1.0", "vulnerableComponentCountsByRemediationStatus": vulnerabilities.to_dict(),
+               "policyViolations": policies.to_dict(), "snippets": {"unreviewed": 0, "reviewed": 0, "ignored": 0, "Total": 0}}
+    project = LevelTotals.from_versions([version]).write_to({"projectName": name})
+    project["projectVersionLevelCounts"] = [version]
+    return project
+
+
+def make_totals(projects):
+    totals = LevelTotals()
+    for project in projects:
+        totals.add(LevelTotals.from_level(project))
+    levelCount = totals.write_to({})
+    levelCount["projects"] = projects
+    return levelCount
+
+
+def test_report_view_sums_severities_and_hides_empty_rows():
+    projects = [make_project("a", [("NEW", "HIGH"), ("PATCHED", "HIGH"), ("NONE", "LOW")], policyViolations=2),
+                make_project("b", []),
+                make_project("c", [("AFFECTED", "CRITICAL")])]
+    totals = make_totals(projects)
+    report = reportView(totals)
+    # Components without a remediation status are not part of the severity totals
+    assert report["severityTotals"]["HIGH"] == 2 and report["severityTotals"]["LOW"] == 0
+    assert report["policyTotals"]["Total"] == 2
+    assert [(project["projectName"], severities["HIGH"], severities["CRITICAL"]) for project, severities in report["vulnerabilityRows"]] \
+        == [("a", 2, 0), ("c", 0, 1)]
+    assert [project["projectName"] for project, _ in report["policyRows"]] == ["a"]
+    assert [project["projectName"] for project, _ in report["statusRows"]["NEW"]] == ["a"]
+    assert report["statusRows"]["IGNORED"] == []
+    shown = reportView(totals, showEmpty=True)
+    assert [project["projectName"] for project, versions in shown["statusRows"]["IGNORED"] if versions] == ["a", "b", "c"]
+
+
+def test_dashboard_view_orders_by_findings_and_counts_managed():
+    projects = [make_project("a", [("NEW", "HIGH")]),
+                make_project("b", [("NEW", "LOW"), ("PATCHED", "LOW"), ("IGNORED", "LOW")], policyViolations=1)]
+    dashboard = dashboardView(make_totals(projects))
+    assert [(project["projectName"], row) for project, row in dashboard["projectRows"]] == \
+        [("b", {"total": 4, "managed": 2, "policyViolations": 1}), ("a", {"total": 1, "managed": 0, "policyViolations": 0})]
+
+
+def test_dashboard_payload_is_columnar_with_interned_strings():
+    totals = make_totals([make_project("a", [("NEW", "HIGH"), ("PATCHED", "LOW")], policyViolations=3)])
+    version = {"versionName": "1.0"}
+    totals["policyDetails"] = {"LICENSE": {"GPL": {"severity": "MAJOR", "totalCount": 3, "projects": {"p1": {"versions": [version, version]}}},
+                                           "AGPL": {"severity": "MAJOR", "totalCount": 1, "projects": {"p1": {"versions": [version]},
+                                                                                                        "p2": {"versions": [version]}}}}}
+    payload = dashboardPayload(totals, dashboardView(totals)["projectRows"])
+    assert payload["strings"] == ["LICENSE", "MAJOR"]
+    assert payload["policies"] == {"name": ["GPL", "AGPL"], "category": [0, 0], "severity": [1, 1], "totalCount": [3, 1],
+                                   "projectCount": [1, 2], "versionCount": [2, 2]}
+    newCounts = dict(zip(payload["severities"], payload["vulnerabilities"][payload["statuses"].index("NEW")]))
+    assert newCounts == totals["NEW"]
+    assert dict(zip(payload["snippetKeys"], payload["snippets"])) == totals["SNIPPET"]
+    # Only the instance level counts and the project table columns, no project or version records
+    assert payload["projects"] == {"name": ["a"], "dormant": [0], "new": [1], "critical": [0], "high": [1], "medium": [0],
+                                   "low": [0], "managed": [1], "policyViolations": [3], "lastScan": ["-"], "total": [5]}
+
+
+def test_report_charts_are_inline_svg():
+    totals = make_totals([make_project("a", [("NEW", "HIGH"), ("PATCHED", "LOW")], policyViolations=3)])
+    totals["policyDetails"] = {"LICENSE": {"<GPL> & co": {"severity": "MAJOR", "totalCount": 3, "projects": {}}}}
+    charts = reportView(totals)["charts"]
+    assert charts["snippetChart"] is None
+    svgNamespace = "{http://www.w3.org/2000/svg}"
+    for chartId in ["severityChart", "remediationChart", "severityByStatusChart", "policyChart", "policySeverityChart"]:
+        root = ET.fromstring(str(charts[chartId]))
+        assert root.tag == svgNamespace + "svg"
+    # One bar per status with findings, policy names are escaped
+    bars = ET.fromstring(str(charts["remediationChart"])).findall(svgNamespace + "rect")
+    assert [bar.find(svgNamespace + "title").text for bar in bars] == ["NEW - Count: 1", "PATCHED - Count: 1"]
+    assert "&lt;GPL&gt; &amp; co" in charts["policySeverityChart"]
+    # Rendered as markup, not escaped again by the template
+    html = templateEnvironment(bte.templatesDir).from_string("{{ chart }}").render(chart=charts["severityChart"])
+    assert html.startswith("<svg")
+
+
+def test_reports_share_one_environment_with_bytecode_cache():
+    environment = templateEnvironment(bte.templatesDir)
+    assert templateEnvironment(bte.templatesDir) is environment
+    assert environment.bytecode_cache is not None
+    assert environment.autoescape
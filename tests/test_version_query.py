@@ -0,0 +1,27 @@
+"""Tests for the version listing query planner."""
+import sys
+from pathlib import Path
+
+# Add src to path for testing
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from blackduck_remediation_metrics.version_query import VersionQuery, FilterStats, PHASES, DISTRIBUTIONS
+
+
+def test_every_predicate_is_a_repeated_parameter():
+    query = VersionQuery(["RELEASED", "ARCHIVED"], ["EXTERNAL"], "1.0")
+    assert query.parameters() == {"filter": ["phase:RELEASED", "phase:ARCHIVED", "distribution:EXTERNAL"], "q": ["versionName:1.0"]}
+    assert query.stages() == [{}, {"filter": ["phase:RELEASED", "phase:ARCHIVED"]},
+                              {"filter": ["phase:RELEASED", "phase:ARCHIVED", "distribution:EXTERNAL"]}, query.parameters()]
+
+
+def test_predicates_selecting_every_value_are_pruned():
+    assert VersionQuery(PHASES, DISTRIBUTIONS).parameters() == {}
+    assert VersionQuery(PHASES, ["SAAS"]).parameters() == {"filter": ["distribution:SAAS"]}
+
+
+def test_cached_versions_are_counted_by_the_first_predicate_they_fail():
+    stats = FilterStats(VersionQuery(["RELEASED"], ["EXTERNAL"]))
+    stats.countCached([{"phase": "RELEASED", "distribution": "EXTERNAL"}, {"phase": "PLANNING", "distribution": "SAAS"},
+                       {"phase": "released", "distribution": "SAAS"}])
+    assert stats.to_dict() == {"listed": 3, "eliminated": {"phase": 1, "distribution": 1}, "kept": 1}